@@ -0,0 +1,199 @@
+'''
+Verifies every proof file of directories or globs without asking anything, for grading many files at once
+
+Prints one JSON object for each proof on its own line as soon as its file is verified:
+{"file": ..., "proof": ..., "valid": true or false, "line": first invalid line or null,
+ "parseTime": seconds to parse the file, "verifyTime": seconds to verify the proof, "cached": true or false}
+
+With a result store (--store or the LemmaStore environment variable) a file with the same text and included
+files as a file verified before is not parsed or verified again, its results are "cached"
+
+A file that can not be read or parsed is one line with "proof": null and "error": the message, a proof 
+that can not be verified has "error" too, and so does a path that matches no proof files
+
+Exits with 0 if every proof is valid, 1 if a proof is not valid and 2 if there was an error
+
+Usage:
+python batch.py [-j processes] [--store database] path [path ...]
+'''
+import sys
+import os
+import glob
+import json
+import time
+import argparse
+import itertools
+import multiprocessing
+
+import parsers
+import verifier
+import store
+
+# The exit statuses
+VALID, INVALID, ERROR = 0, 1, 2
+
+def findProofFiles(paths, unmatched = None):
+    '''
+    Finds the proof files of files, directories and globs
+
+    @param paths - A list of the names of files, directories (every .prf file in them and their subdirectories
+                   is used) or globs of files and directories
+    @param unmatched - A list to add each path that matches no files to, e.g. a mistyped name
+    @return - A list of the files, each only once, in the order of paths and sorted within each path
+    '''
+    files = []
+    for path in paths:
+        # A glob is expanded first, so each directory it matches is searched the same as a named directory
+        found = []
+        for match in ([path] if os.path.exists(path) else sorted(glob.glob(path))):
+            if os.path.isdir(match):
+                for directory, subdirectories, names in os.walk(match):
+                    found.extend(os.path.join(directory, name) for name in names if name.endswith('.prf'))
+            elif os.path.isfile(match):
+                found.append(match)
+
+        if len(found) == 0 and unmatched is not None:
+            unmatched.append(path)
+
+        for filename in sorted(found):
+            if filename not in files:
+                files.append(filename)
+    return files
+
+# The result store of this process, see openStore
+resultStore = None
+
+def openStore(filename):
+    '''
+    Opens the result store used by verifyFile in this process
+
+    @param filename - The name of the database, None to not use a store
+    '''
+    global resultStore
+    resultStore = None if filename is None else store.ResultStore(filename)
+
+def verifyFile(filename):
+    '''
+    Parses a proof file and verifies each of its proofs once, after the proofs they use, or gets their
+    results from the result store
+
+    @param filename - The name of the file
+    @return - A list of the result of each proof, see the module doc
+    '''
+    start = time.time()
+
+    key = None
+    if resultStore is not None:
+        try:
+            key = store.sourceKey(filename)
+        except (IOError, ValueError):
+            # The file or a file it includes can not be read, the error is found while parsing it
+            key = None
+
+        stored = None if key is None else resultStore.get(key)
+        if stored is not None:
+            lookupTime = time.time() - start
+            return [dict(result, file = filename, parseTime = lookupTime, verifyTime = 0.0, cached = True)
+                    for result in stored]
+
+    # Any error in one file is reported and the rest of the files are still verified
+    # The file is opened here, the parser would take a name it can not open as the text of a proof
+    try:
+        with open(filename) as f:
+            proofs = parsers.defaultProofParser(f)
+        levels = verifier.dependencyLevels(verifier.dependencyGraph(proofs))
+    except Exception as e:
+        return [{'file': filename, 'proof': None, 'valid': False, 'line': None, 'error': str(e),
+                 'parseTime': time.time() - start, 'verifyTime': 0.0, 'cached': False}]
+    parseTime = time.time() - start
+
+    results = []
+    for name in itertools.chain(*levels):
+        result = {'file': filename, 'proof': name, 'valid': False, 'line': None, 'parseTime': parseTime, 'cached': False}
+
+        # Number the lines starting at 1, the same as main
+        proofs[name].setNumbering(lambda x: x + 1)
+
+        start = time.time()
+        try:
+            valid = proofs[name].verify()
+            result['valid'] = valid is True
+            if valid is not True:
+                result['line'] = valid
+        except Exception as e:
+            result['error'] = str(e)
+        result['verifyTime'] = time.time() - start
+
+        results.append(result)
+
+    # Only results without errors are kept, an error may not happen again
+    if key is not None and not any('error' in result for result in results):
+        resultStore.put(key, [{'proof': r['proof'], 'valid': r['valid'], 'line': r['line']} for r in results])
+    return results
+
+def run(paths, processes = None, out = sys.stdout, storeFile = None):
+    '''
+    Verifies every proof file of paths and writes the result of each proof as a JSON line
+
+    @param paths - A list of files, directories and globs, see findProofFiles
+    @param processes - The number of files verified at the same time, defaults to the number of cpus
+    @param out - The file to write the results to
+    @param storeFile - The name of the result store database, None to verify every file
+    @return - The exit status
+    '''
+    unmatched = []
+    files = findProofFiles(paths, unmatched)
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+
+    # A path that matches nothing is an error, so a mistyped path is not taken as every proof being valid
+    status = VALID
+    for path in unmatched:
+        result = {'file': path, 'proof': None, 'valid': False, 'line': None, 'error': 'No proof files match %s' % path,
+                  'parseTime': 0.0, 'verifyTime': 0.0, 'cached': False}
+        out.write(json.dumps(result, sort_keys = True) + '\n')
+        status = ERROR
+    out.flush()
+
+    # Each process opens the store itsself, a database connection can not be shared with a forked process
+    pool = None
+    if processes > 1 and len(files) > 1:
+        pool = multiprocessing.Pool(processes, openStore, (storeFile,))
+        results = pool.imap(verifyFile, files)
+    else:
+        openStore(storeFile)
+        results = itertools.imap(verifyFile, files)
+
+    try:
+        # The results are written in the order of the files as soon as each file is done
+        for fileResults in results:
+            for result in fileResults:
+                out.write(json.dumps(result, sort_keys = True) + '\n')
+                if 'error' in result:
+                    status = ERROR
+                elif not result['valid'] and status == VALID:
+                    status = INVALID
+            out.flush()
+
+        if pool is not None:
+            pool.close()
+    except:
+        if pool is not None:
+            pool.terminate()
+        raise
+    finally:
+        if pool is not None:
+            pool.join()
+
+    return status
+
+if __name__ == '__main__':
+    argParser = argparse.ArgumentParser(description = 'Verify every proof of many proof files')
+    argParser.add_argument('paths', nargs = '+', help = 'proof files, directories or globs')
+    argParser.add_argument('-j', '--processes', type = int, default = None,
+                           help = 'the number of files to verify at the same time (defaults to the number of cpus)')
+    argParser.add_argument('--store', default = os.environ.get('LemmaStore'),
+                           help = 'a database of results, files verified before are not verified again')
+    args = argParser.parse_args()
+
+    sys.exit(run(args.paths, args.processes, storeFile = args.store))
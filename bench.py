@@ -0,0 +1,891 @@
+'''
+Benchmarks for the sentence representation
+
+Usage:
+python bench.py memory [directory]
+python bench.py deep [depth]
+python bench.py parse [terms]
+python bench.py parsecache [directory]
+python bench.py includes [directory]
+python bench.py stream [count]
+python bench.py lemmas [count]
+python bench.py lemmafile [count]
+python bench.py verifyall [directory] [processes]
+python bench.py incremental [count]
+python bench.py lines [count] [processes]
+python bench.py store [directory]
+python bench.py validcache [copies] [directory]
+python bench.py bindings [directory]
+python bench.py justify [directory]
+python bench.py references [directory]
+python bench.py premises [directory]
+'''
+import sys
+import os
+import glob
+import time
+import shutil
+import tempfile
+
+# Includes such as '$Lemma/Rules/F Rules.inf' are relative to the examples
+examples = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'Examples')
+os.environ.setdefault('Lemma', examples)
+
+import parsers
+import sentence2 as sentence
+import util
+import matcher
+
+# inference imports proof, so it has to be imported first
+import inference
+import proof
+import lemma
+import verifier
+import batch
+
+def parseCorpus(directory):
+    '''
+    Parses every proof file in a directory
+
+    @param directory - The directory containing the proof files
+    @return - A list of (file, proofs) of the files that could be parsed and a list of the files that could not
+    '''
+    parsed = []
+    skipped = []
+    for filename in sorted(glob.glob(os.path.join(directory, '*.prf'))):
+        try:
+            parsed.append((filename, parsers.defaultProofParser(filename)))
+        except (parsers.LineError, IOError):
+            skipped.append(filename)
+    return parsed, skipped
+
+def nodeBytes(nodes):
+    '''
+    Counts the bytes used by sentence nodes
+
+    Anything shared between nodes (e.g. the same extra data) is only counted once.
+    Names are interned strings so they are not counted.
+
+    @param nodes - An iterable of sentences
+    @return - The total number of bytes
+    '''
+    seen = set([])
+
+    def size(obj):
+        # Only count each object once
+        if obj is None or id(obj) in seen:
+            return 0
+        seen.add(id(obj))
+        return sys.getsizeof(obj)
+
+    total = 0
+    for node in nodes:
+        total += size(node)
+
+        # Nodes with slots do not have a __dict__
+        total += size(getattr(node, '__dict__', None))
+
+        # Atoms store their name as _data, only count the tuples of compound sentences
+        if isinstance(node._data, tuple):
+            total += size(node._data)
+
+        # The extra data and anything it holds
+        extra = getattr(node, 'extraData', None)
+        total += size(extra)
+        if isinstance(extra, dict):
+            for value in extra.values():
+                if isinstance(value, (dict, list, tuple)):
+                    total += size(value)
+
+        total += size(getattr(node, '_terms', None))
+
+    return total
+
+def memory(directory = None):
+    '''
+    Prints the number of bytes per sentence node after parsing a directory of proofs
+
+    @param directory - The directory to parse, defaults to Examples/Math
+    '''
+    if directory is None:
+        directory = os.path.join(examples, 'Math')
+
+    start = time.time()
+    parsed, skipped = parseCorpus(directory)
+    elapsed = time.time() - start
+
+    nodes = sentence.sf._nodes.values()
+    total = nodeBytes(nodes)
+
+    print 'Parsed %d files in %.2fs, skipped %d' % (len(parsed), elapsed, len(skipped))
+    for filename in skipped:
+        print '    skipped %s' % os.path.basename(filename)
+    print '%-20s%d' % ('nodes', len(nodes))
+    print '%-20s%d' % ('bytes', total)
+    print '%-20s%.1f' % ('bytes per node', float(total) / max(len(nodes), 1))
+
+def deep(depth = 10000):
+    '''
+    Parses, prints and matches sentences that are much deeper than the recursion limit, e.g. s(s(...s(0)...))
+
+    @param depth - The number of operators around the innermost literal, defaults to 10000
+    '''
+    depth = int(depth)
+    string = 's(' * depth + '0' + ')' * depth
+    zero = parsers.prefixSentenceParser('0')
+    one = parsers.prefixSentenceParser('1')
+
+    def step(name, function):
+        # Times function and prints how long it took
+        start = time.time()
+        result = function()
+        print '%-20s%.3fs' % (name, time.time() - start)
+        return result
+
+    print 'depth %d, recursion limit %d' % (depth, sys.getrecursionlimit())
+
+    sen = step('parse', lambda: parsers.prefixSentenceParser(string))
+    step('print', lambda: str(sen))
+    step('contains', lambda: zero in sen)
+    step('subSentences', sen.subSentences)
+    step('terms', sen.terms)
+
+    pattern = step('generalize', sen.generalize)
+    step('mapInto', lambda: pattern.mapInto(sen))
+    step('subsitute', lambda: sen.subsitute({zero: one}))
+    step('subsitute variants', lambda: sen.subsitute({zero: one}, False))
+
+    twice = parsers.prefixSentenceParser('=(%s,%s)' % (string, string))
+    same = parsers.prefixSentenceParser('=(@a,@a)')
+    step('mapInto shared', lambda: same.mapInto(twice))
+
+    operator = parsers.prefixSentenceParser('@P[0]')
+    step('mapInto operator', lambda: operator.mapInto(sen))
+
+def parse(terms = 5000):
+    '''
+    Parses long equational sentences such as =(+(+(s(0), *(0, ?x0)), *(s(0), ?x1)), ...) of growing length, 
+    the time for each character should stay about the same
+
+    @param terms - The number of terms on each side of the longest sentence, defaults to 5000
+    '''
+    terms = int(terms)
+
+    def numeral(n):
+        return 's(' * n + '0' + ')' * n
+
+    print '%-12s%-12s%-12s%s' % ('terms', 'chars', 'time', 'us/char')
+    for count in sorted(set([terms // 100, terms // 10, terms])):
+        side = numeral(3)
+        for i in range(count):
+            side = '+(%s, *(%s, ?x%d))' % (side, numeral(i % 5), i)
+        string = '=(%s, %s)' % (side, side)
+
+        start = time.time()
+        parsers.prefixSentenceParser(string)
+        elapsed = time.time() - start
+        print '%-12d%-12d%-12s%.3f' % (count, len(string), '%.3fs' % elapsed, elapsed * 1e6 / len(string))
+
+def parseCache(directory = None):
+    '''
+    Parses every proof file of a directory without and with the parse cache, and prints how often a 
+    sentence had already been parsed
+
+    @param directory - The directory to parse, defaults to Examples/Math
+    '''
+    if directory is None:
+        directory = os.path.join(examples, 'Math')
+
+    info = parsers.parseCacheInfo()
+
+    def run(maxSize):
+        parsers.parseCache.clear()
+        parsers.setParseCacheSize(maxSize)
+        start = time.time()
+        parsed, skipped = parseCorpus(directory)
+        return time.time() - start, parsers.parseCacheInfo(), len(parsed)
+
+    try:
+        offTime, offInfo, files = run(0)
+        onTime, onInfo, files = run(info['maxSize'])
+    finally:
+        parsers.setParseCacheSize(info['maxSize'])
+
+    print 'Parsed %d files' % files
+    print '%-20s%-12s%-12s%-12s%s' % ('', 'hits', 'misses', 'hit rate', 'time')
+    print '%-20s%-12s%-12s%-12s%.3fs' % ('no cache', '-', '-', '-', offTime)
+    print '%-20s%-12d%-12d%-12s%.3fs' % ('cache of %s' % onInfo['maxSize'], onInfo['hits'], onInfo['misses'], 
+                                          '%.1f%%' % (onInfo['hitRate'] * 100), onTime)
+
+def includes(directory = None):
+    '''
+    Parses every proof file of a directory with the included rule files parsed from their text, then 
+    compiled into an empty cache directory, then loaded from that cache directory
+
+    @param directory - The directory to parse, defaults to Examples/F Lemmas
+    '''
+    if directory is None:
+        directory = os.path.join(examples, 'F Lemmas')
+
+    enabled, cacheDir = parsers.includeCache, parsers.includeCacheDir
+    tempDir = tempfile.mkdtemp()
+
+    def run(enabled):
+        # Sentences are parsed again every run
+        parsers.parseCache.clear()
+        parsers.setIncludeCache(enabled, tempDir)
+        start = time.time()
+        parsed, skipped = parseCorpus(directory)
+        return time.time() - start, len(parsed)
+
+    try:
+        # Every run finds the sentences already made by this one
+        run(False)
+
+        textTime, files = run(False)
+        coldTime, files = run(True)
+        warmTime, files = run(True)
+    finally:
+        parsers.setIncludeCache(enabled, cacheDir)
+        shutil.rmtree(tempDir)
+
+    print 'Parsed %d files' % files
+    print '%-20s%.3fs' % ('text', textTime)
+    print '%-20s%.3fs' % ('compiling', coldTime)
+    print '%-20s%.3fs' % ('compiled', warmTime)
+
+def stream(count = 2000):
+    '''
+    Parses a file of many proofs with iterProofParser, and prints how long it took to get the first 
+    proof and every proof
+
+    @param count - The number of proofs in the file, defaults to 2000
+    '''
+    count = int(count)
+
+    handle, filename = tempfile.mkstemp(suffix = '.prf')
+    with os.fdopen(handle, 'w') as f:
+        f.write('include $Lemma/Rules/F Rules.inf\n')
+        for i in range(count):
+            f.write('proof\nProof %d\n1\tA\n2\tB\n3\tand(A, B)\tAnd Intro\t1,2\n4\tand(B, A)\tAnd Intro\t2,1\ndone\n\n' % i)
+
+    try:
+        start = time.time()
+        proofs = parsers.iterProofParser(filename)
+        name, first = next(proofs)
+        firstTime = time.time() - start
+        rest = len(list(proofs))
+        allTime = time.time() - start
+    finally:
+        os.remove(filename)
+
+    print 'Parsed %d proofs' % (rest + 1)
+    print '%-20s%.3fs' % ('first proof', firstTime)
+    print '%-20s%.3fs' % ('every proof', allTime)
+
+def lemmas(count = 50):
+    '''
+    Verifies a proof that uses a lemma as an inference rule many times, with the lemma verified every 
+    time it is used and with its remembered result
+
+    @param count - The number of times the lemma is used, defaults to 50
+    '''
+    count = int(count)
+
+    handle, filename = tempfile.mkstemp(suffix = '.prf')
+    with os.fdopen(handle, 'w') as f:
+        f.write('include $Lemma/F Lemmas/DeMorgans And Not.prf\n')
+        f.write('proof\nMain\n')
+        for i in range(count):
+            f.write('%d\tand(not(P%d), not(Q%d))\n' % (2 * i, i, i))
+            f.write('%d\tnot(or(P%d, Q%d))\tDeMorgans And Not\t%d\n' % (2 * i + 1, i, i, 2 * i))
+        f.write('done\n')
+
+    verificationKey = proof.Proof.verificationKey
+
+    def run(remember):
+        proofs = parsers.defaultProofParser(filename)
+        if not remember:
+            # A key that is never the same verifies every time
+            proof.Proof.verificationKey = lambda self: object()
+        try:
+            start = time.time()
+            result = proofs['Main'].verify()
+            return result, time.time() - start
+        finally:
+            proof.Proof.verificationKey = verificationKey
+
+    try:
+        everyResult, everyTime = run(False)
+        onceResult, onceTime = run(True)
+    finally:
+        os.remove(filename)
+
+    print 'Verified a proof using a lemma %d times' % count
+    print '%-20s%-12s%s' % ('', 'result', 'time')
+    print '%-20s%-12s%.3fs' % ('verify every use', everyResult, everyTime)
+    print '%-20s%-12s%.3fs' % ('remembered', onceResult, onceTime)
+
+def lemmaFile(count = 50):
+    '''
+    Parses and verifies a proof that uses a lemma many times, including the proof of the lemma and
+    including the lemma compiled into a lemma file
+
+    @param count - The number of times the lemma is used, defaults to 50
+    '''
+    count = int(count)
+
+    source = os.path.join(examples, 'F Lemmas', 'DeMorgans And Not.prf')
+    directory = tempfile.mkdtemp()
+    try:
+        compiled = os.path.join(directory, 'DeMorgans.lem')
+        lemma.writeLemmas([lemma.compileLemma(p) for p in parsers.defaultProofParser(source).values()], compiled)
+
+        def run(include):
+            filename = os.path.join(directory, 'Main.prf')
+            with open(filename, 'w') as f:
+                f.write('include %s\n' % include)
+                f.write('proof\nMain\n')
+                for i in range(count):
+                    f.write('%d\tand(not(P%d), not(Q%d))\n' % (2 * i, i, i))
+                    f.write('%d\tnot(or(P%d, Q%d))\tDeMorgans And Not\t%d\n' % (2 * i + 1, i, i, 2 * i))
+                f.write('done\n')
+
+            start = time.time()
+            result = parsers.defaultProofParser(filename)['Main'].verify()
+            return result, time.time() - start
+
+        # The first include of the lemma file compiles it, the same as including it before
+        run(compiled)
+        proofResult, proofTime = run(source)
+        lemmaResult, lemmaTime = run(compiled)
+    finally:
+        shutil.rmtree(directory)
+
+    print 'Parsed and verified a proof using a lemma %d times' % count
+    print '%-20s%-12s%s' % ('', 'result', 'time')
+    print '%-20s%-12s%.3fs' % ('proof', proofResult, proofTime)
+    print '%-20s%-12s%.3fs' % ('lemma file', lemmaResult, lemmaTime)
+
+def verifyAll(directory = None, processes = None):
+    '''
+    Verifies every proof of each proof file in a directory one at a time in the order of the dict, 
+    in the order of the dependency graph, and with the levels of the graph verified in parallel
+
+    @param directory - The directory of proof files, defaults to Examples/F Lemmas
+    @param processes - The number of processes to verify in parallel with, defaults to the number of cpus
+    '''
+    if directory is None:
+        directory = os.path.join(examples, 'F Lemmas')
+    if processes is None:
+        processes = verifier.multiprocessing.cpu_count()
+    processes = int(processes)
+
+    def run(verify):
+        parsed, skipped = parseCorpus(directory)
+        start = time.time()
+        results = [verify(proofs) for filename, proofs in parsed]
+        return results, time.time() - start, parsed
+
+    inOrder, orderTime, parsed = run(lambda proofs: dict((name, proofs[name].verify()) for name in proofs))
+    topological, topologicalTime, parsed = run(lambda proofs: verifier.verifyAll(proofs, 1))
+    # Every file is verified in parallel, even the small ones
+    parallelLines = verifier.parallelLines
+    verifier.parallelLines = 0
+    try:
+        parallel, parallelTime, parsed = run(lambda proofs: verifier.verifyAll(proofs, processes))
+    finally:
+        verifier.parallelLines = parallelLines
+
+    print 'Verified %d proofs of %d files' % (sum(len(proofs) for filename, proofs in parsed), len(parsed))
+    print '%-30s%.3fs' % ('one at a time', orderTime)
+    print '%-30s%.3fs' % ('dependency order', topologicalTime)
+    print '%-30s%.3fs' % ('parallel (%d processes)' % processes, parallelTime)
+
+def incremental(count = 200):
+    '''
+    Changes a line near the end of a long proof and verifies it again, checking every line and only 
+    the lines the change affects
+
+    @param count - The number of times a lemma is used in the proof, it has twice as many lines
+    '''
+    count = int(count)
+
+    handle, filename = tempfile.mkstemp(suffix = '.prf')
+    with os.fdopen(handle, 'w') as f:
+        f.write('include $Lemma/F Lemmas/DeMorgans And Not.prf\n')
+        f.write('proof\nMain\n')
+        for i in range(count):
+            f.write('%d\tand(not(P%d), not(Q%d))\tAssumption\n' % (2 * i, i, i))
+            f.write('%d\tnot(or(P%d, Q%d))\tDeMorgans And Not\t%d\n' % (2 * i + 1, i, i, 2 * i))
+        f.write('done\n')
+
+    try:
+        prf = parsers.defaultProofParser(filename)['Main']
+    finally:
+        os.remove(filename)
+    prf.verify()
+
+    edits = 100
+    def run(everyLine):
+        start = time.time()
+        for i in range(edits):
+            # An edit that keeps the proof valid, e.g. typing the same sentence again
+            edited = prf[-2]
+            edited.setSentence(edited.getSentence())
+            if everyLine:
+                for l in prf:
+                    l.recheck()
+            result = prf.verify()
+        return result, (time.time() - start) / edits
+
+    everyResult, everyTime = run(True)
+    changedResult, changedTime = run(False)
+
+    print 'Edited a proof of %d lines %d times' % (len(prf), edits)
+    print '%-20s%-12s%s' % ('', 'result', 'time per edit')
+    print '%-20s%-12s%.5fs' % ('every line', everyResult, everyTime)
+    print '%-20s%-12s%.5fs' % ('changed lines', changedResult, changedTime)
+
+def lines(count = 200, processes = None):
+    '''
+    Verifies a long proof checking one line at a time and checking the lines in parallel, and finds every 
+    invalid line of it
+
+    @param count - The number of times a lemma is used in the proof, it has twice as many lines
+    @param processes - The number of processes to check the lines with, defaults to the number of cpus
+    '''
+    count = int(count)
+    if processes is None:
+        processes = verifier.multiprocessing.cpu_count()
+    processes = int(processes)
+
+    # Every tenth use of the lemma is wrong
+    handle, filename = tempfile.mkstemp(suffix = '.prf')
+    with os.fdopen(handle, 'w') as f:
+        f.write('include $Lemma/F Lemmas/DeMorgans And Not.prf\n')
+        f.write('proof\nMain\n')
+        for i in range(count):
+            f.write('%d\tand(not(P%d), not(Q%d))\tAssumption\n' % (2 * i, i, i))
+            f.write('%d\tnot(or(P%d, %s%d))\tDeMorgans And Not\t%d\n' % (2 * i + 1, i, 'R' if i % 10 == 9 else 'Q', i, 2 * i))
+        f.write('done\n')
+
+    def run(processes, allErrors):
+        prf = parsers.defaultProofParser(filename)['Main']
+        prf.setProcesses(processes)
+        start = time.time()
+        result = prf.getErrors() if allErrors else prf.verify()
+        return result, time.time() - start
+
+    try:
+        firstOne, firstOneTime = run(1, False)
+        firstParallel, firstParallelTime = run(processes, False)
+        allOne, allOneTime = run(1, True)
+        allParallel, allParallelTime = run(processes, True)
+    finally:
+        os.remove(filename)
+
+    print 'Verified a proof of %d lines, %d of them invalid' % (2 * count, len(allOne))
+    print '%-30s%-12s%s' % ('', 'first', 'time')
+    print '%-30s%-12s%.3fs' % ('first error, one at a time', firstOne, firstOneTime)
+    print '%-30s%-12s%.3fs' % ('first error, %d processes' % processes, firstParallel, firstParallelTime)
+    print '%-30s%-12s%.3fs' % ('every error, one at a time', allOne[0], allOneTime)
+    print '%-30s%-12s%.3fs' % ('every error, %d processes' % processes, allParallel[0], allParallelTime)
+
+def resultStore(directory = None):
+    '''
+    Verifies every proof file of a directory without a result store, with an empty store and again with 
+    the results in the store
+
+    @param directory - The directory of proof files, defaults to Examples/F Lemmas
+    '''
+    if directory is None:
+        directory = os.path.join(examples, 'F Lemmas')
+    files = batch.findProofFiles([directory])
+
+    storeDirectory = tempfile.mkdtemp()
+    def run(storeFile):
+        batch.openStore(storeFile)
+        start = time.time()
+        results = [batch.verifyFile(filename) for filename in files]
+        elapsed = time.time() - start
+
+        # Only what was found, not how long it took or where it came from
+        found = [[(r['proof'], r['valid'], r['line']) for r in fileResults] for fileResults in results]
+        return found, sum(r['cached'] for fileResults in results for r in fileResults), elapsed
+
+    try:
+        noneFound, noneCached, noneTime = run(None)
+        emptyFound, emptyCached, emptyTime = run(os.path.join(storeDirectory, 'results.db'))
+        fullFound, fullCached, fullTime = run(os.path.join(storeDirectory, 'results.db'))
+    finally:
+        batch.openStore(None)
+        shutil.rmtree(storeDirectory)
+
+    print 'Verified %d proofs of %d files' % (sum(len(found) for found in noneFound), len(files))
+    print '%-20s%-12s%s' % ('', 'cached', 'time')
+    print '%-20s%-12d%.3fs' % ('no store', noneCached, noneTime)
+    print '%-20s%-12d%.3fs' % ('empty store', emptyCached, emptyTime)
+    print '%-20s%-12d%.3fs' % ('full store', fullCached, fullTime)
+
+def validCache(copies = 20, directory = None):
+    '''
+    Verifies many copies of the proof files of a directory, like many students handing in the same 
+    assignment, without and with the isValid cache, and with the cache saved and loaded again
+
+    @param copies - The number of copies of each file, defaults to 20
+    @param directory - The directory of proof files, defaults to Examples/F Lemmas
+    '''
+    copies = int(copies)
+    if directory is None:
+        directory = os.path.join(examples, 'F Lemmas')
+
+    # Each copy is parsed on its own, so no proof or rule is shared between copies
+    parsed = []
+    for i in range(copies):
+        parsed.extend(parseCorpus(directory)[0])
+
+    maxSize = inference.validCacheInfo()['maxSize']
+
+    def run(maxSize):
+        inference.setValidCacheSize(maxSize)
+        inference.validCache.hits = inference.validCache.misses = 0
+
+        # Check every line again, a line that was checked before is not
+        for filename, proofs in parsed:
+            for prf in proofs.values():
+                for l in prf:
+                    l.recheck()
+                prf.changed()
+
+        start = time.time()
+        results = [[proofs[name].verify() for name in sorted(proofs)] for filename, proofs in parsed]
+        return results, time.time() - start, inference.validCacheInfo()
+
+    handle, cacheFile = tempfile.mkstemp(suffix = '.json')
+    os.close(handle)
+    try:
+        offResults, offTime, offInfo = run(0)
+        inference.validCache.clear()
+        onResults, onTime, onInfo = run(maxSize)
+
+        # Another process would start with only what was saved
+        inference.saveValidCache(cacheFile)
+        inference.validCache.clear()
+        inference.loadValidCache(cacheFile)
+        loadedResults, loadedTime, loadedInfo = run(maxSize)
+    finally:
+        inference.setValidCacheSize(maxSize)
+        os.remove(cacheFile)
+
+    print 'Verified %d copies of %d files' % (copies, len(parsed) / max(copies, 1))
+    print '%-20s%-12s%-12s%s' % ('', 'hits', 'misses', 'time')
+    print '%-20s%-12s%-12s%.3fs' % ('no cache', '-', '-', offTime)
+    print '%-20s%-12d%-12d%.3fs' % ('cache', onInfo['hits'], onInfo['misses'], onTime)
+    print '%-20s%-12d%-12d%.3fs' % ('loaded cache', loadedInfo['hits'], loadedInfo['misses'], loadedTime)
+
+def mergeSearch(sen, other):
+    '''
+    Yields the mappings of sen into other the way the matcher did before util.Bindings, by
+    copying the mapping with util.mapMerge for every choice
+    '''
+    if sen.arity() != other.arity():
+        return
+
+    pairs = zip(sen, other)
+
+    def mapArguments(index, result):
+        if index == len(pairs):
+            yield result
+            return
+
+        m, n = pairs[index]
+        if sentence.matchesByArgument(m):
+            mappings = mergeSearch(m, n)
+        else:
+            mappings = m.iterMappings(n)
+
+        for mapping in mappings:
+            if not mapping:
+                continue
+            newResult = util.mapMerge(result, mapping)
+            if len(newResult) > 0:
+                for res in mapArguments(index + 1, newResult):
+                    yield res
+
+    for result in mapArguments(0, {}):
+        yield result
+
+def bindings(directory = None):
+    '''
+    Verifies a directory of proofs, then matches every pair of sentences that was matched again with the 
+    old dict merging search and with the util.Bindings search, and prints how many dicts each made
+
+    @param directory - The directory to verify, defaults to Examples/Math
+    '''
+    if directory is None:
+        directory = os.path.join(examples, 'Math')
+
+    # Remember every compound sentence matched while verifying
+    pairs = []
+    iterMappings = sentence.Sentence._iterMappings
+    def recordMappings(self, other, replaceAll = True):
+        pairs.append((self, other))
+        return iterMappings(self, other, replaceAll)
+
+    sentence.Sentence._iterMappings = recordMappings
+    try:
+        parsed, skipped = parseCorpus(directory)
+        for filename, proofs in parsed:
+            for name in proofs:
+                proofs[name].verify()
+    finally:
+        sentence.Sentence._iterMappings = iterMappings
+
+    # Count the dicts made by merging or by the bindings
+    # Operators match their argument with the bindings in both searches, so those are counted too
+    counts = [0]
+
+    mapMerge = util.mapMerge
+    def countMerge(mappingA, mappingB):
+        merge = mapMerge(mappingA, mappingB)
+        if merge is not mappingA and merge is not mappingB:
+            counts[0] += 1
+        return merge
+
+    Bindings = util.Bindings
+    class CountBindings(Bindings):
+        def __init__(self, mapping = None):
+            counts[0] += 1
+            Bindings.__init__(self, mapping)
+
+        def toDict(self):
+            counts[0] += 1
+            return Bindings.toDict(self)
+
+    def run(search):
+        # Match every pair with search, without any remembered results
+        sentence.matchCache.clear()
+        counts[0] = 0
+        start = time.time()
+        results = [list(search(sen, other)) for sen, other in pairs]
+        return results, counts[0], time.time() - start
+
+    util.mapMerge = countMerge
+    util.Bindings = CountBindings
+    try:
+        merged, mergeDicts, mergeTime = run(mergeSearch)
+        bound, boundDicts, boundTime = run(iterMappings)
+    finally:
+        util.mapMerge = mapMerge
+        util.Bindings = Bindings
+
+    print 'Verified %d files, skipped %d, matched %d pairs' % (len(parsed), len(skipped), len(pairs))
+    print '%-20s%-12s%s' % ('', 'dicts', 'time')
+    print '%-20s%-12d%.3fs' % ('mapMerge', mergeDicts, mergeTime)
+    print '%-20s%-12d%.3fs' % ('Bindings', boundDicts, boundTime)
+
+def justify(directory = None):
+    '''
+    Justifies every line of a directory of proofs with the rules they use, by trying every rule 
+    and by only trying the candidates of a proof.RuleIndex
+
+    @param directory - The directory to verify, defaults to Examples/Math
+    '''
+    if directory is None:
+        directory = os.path.join(examples, 'Math')
+
+    parsed, skipped = parseCorpus(directory)
+
+    # Every rule used in the directory, proofs are only used by later proofs
+    rules = []
+    lines = []
+    for filename, proofs in parsed:
+        for name in sorted(proofs):
+            proofs[name].verify()
+            for inf in proofs[name].getInferences().values():
+                if inf not in rules:
+                    rules.append(inf)
+            for l in proofs[name]:
+                if l.getSentence() is not None and l.getInference() is not None:
+                    lines.append((proofs[name], l))
+
+    index = proof.RuleIndex(rules)
+
+    # Rules such as assumptions would justify anything, so only the rules the index can use are tried
+    # and only on the lines that use one of them
+    usable = index.getRules()
+    lines = [(p, l) for p, l in lines if any(l.getInference() is rule for rule in usable)]
+
+    tried = [0]
+    def first(candidates, p, l):
+        for rule in candidates:
+            if rule is not p:
+                tried[0] += 1
+                if rule.isValid(l.getSentence(), l.getSuppprt()):
+                    return rule
+
+    def run(candidates):
+        tried[0] = 0
+        start = time.time()
+        found = [first(candidates(l), p, l) for p, l in lines]
+        return found, tried[0], time.time() - start
+
+    every, everyTried, everyTime = run(lambda l: usable)
+    indexed, indexTried, indexTime = run(lambda l: index.candidates(l.getSentence()))
+
+    print 'Justified %d lines of %d files with %d rules, skipped %d files' % (len(lines), len(parsed), len(usable), len(skipped))
+    print '%-20s%-12s%-12s%s' % ('', 'tried', 'justified', 'time')
+    print '%-20s%-12d%-12d%.3fs' % ('every rule', everyTried, len([r for r in every if r is not None]), everyTime)
+    print '%-20s%-12d%-12d%.3fs' % ('RuleIndex', indexTried, len([r for r in indexed if r is not None]), indexTime)
+
+def references(directory = None):
+    '''
+    Verifies a directory of proofs with every premise trying every reference line, then with each 
+    premise only trying the lines of a matcher.ReferenceIndex with the same main operator and arity
+
+    @param directory - The directory to verify, defaults to Examples/F Lemmas
+    '''
+    if directory is None:
+        directory = os.path.join(examples, 'F Lemmas')
+
+    tried = [0]
+    candidates = matcher.ReferenceIndex.candidates
+    def everyLine(self, premise):
+        tried[0] += len(self.references)
+        return self.references
+
+    def indexedLines(self, premise):
+        found = candidates(self, premise)
+        tried[0] += len(found)
+        return found
+
+    def run(lookup):
+        # Verify without any remembered matches
+        sentence.matchCache.clear()
+        tried[0] = 0
+        matcher.ReferenceIndex.candidates = lookup
+        try:
+            start = time.time()
+            parsed, skipped = parseCorpus(directory)
+            results = [[proofs[name].verify() for name in sorted(proofs)] for filename, proofs in parsed]
+            return results, tried[0], time.time() - start, len(parsed), len(skipped)
+        finally:
+            matcher.ReferenceIndex.candidates = candidates
+
+    every, everyTried, everyTime, files, skipped = run(everyLine)
+    indexed, indexTried, indexTime, files, skipped = run(indexedLines)
+
+    print 'Verified %d files, skipped %d' % (files, skipped)
+    print '%-20s%-12s%s' % ('', 'lines tried', 'time')
+    print '%-20s%-12d%.3fs' % ('every line', everyTried, everyTime)
+    print '%-20s%-12d%.3fs' % ('ReferenceIndex', indexTried, indexTime)
+
+def queueSearch(bindings, premiseQueue, references, counts):
+    '''
+    The search makeMappingHelper used to do, the premises are mapped in the order they are popped 
+    from premiseQueue and a premise is only found to have no mapping when it is reached
+
+    @param counts - A list whose first item counts the backtracks
+    @return - True if there is a mapping of the premises
+    '''
+    try:
+        curPrem = premiseQueue.pop()
+    except IndexError:
+        return True
+
+    for curLine in references.candidates(curPrem):
+        for mapping in curPrem.iterMappings(curLine.getSentence(), False):
+            if 'extra' in curPrem.extraData and 'newVars' in curPrem.extraData['extra']:
+                newVars = curPrem.extraData['extra']['newVars']
+                if not curLine.isNew([mapping[v] for v in newVars]):
+                    continue
+
+            mark = bindings.mark()
+            if not bindings.merge(mapping):
+                continue
+
+            if queueSearch(bindings, premiseQueue, references, counts):
+                return True
+
+            bindings.undo(mark)
+            counts[0] += 1
+
+    counts[0] += 1
+    premiseQueue.append(curPrem)
+    return False
+
+def premises(directory = None):
+    '''
+    Verifies a directory of proofs, then maps the premises of every rule application again with the old 
+    search in the order of the premise set and with makeMapping, and prints the backtracks each took
+
+    @param directory - The directory to verify, defaults to Examples/F Lemmas
+    '''
+    if directory is None:
+        directory = os.path.join(examples, 'F Lemmas')
+
+    # Remember every application of a rule while verifying
+    calls = []
+    makeMapping = proof.Proof.makeMapping.im_func
+    def recordMapping(self, conclusionMap, premises, references, exact = True, options = None):
+        calls.append((self, conclusionMap, list(premises), references, exact))
+        return makeMapping(self, conclusionMap, premises, references, exact, options)
+
+    proof.Proof.makeMapping = recordMapping
+    try:
+        parsed, skipped = parseCorpus(directory)
+        for filename, proofs in parsed:
+            for name in proofs:
+                proofs[name].verify()
+    finally:
+        proof.Proof.makeMapping = makeMapping
+
+    # Only the applications with premises search for anything
+    calls = [c for c in calls if len(c[2]) > 0 and (not c[4] or len(c[2]) == len(c[3]))]
+
+    def run(search):
+        sentence.matchCache.clear()
+        results = []
+        backtracks = []
+        start = time.time()
+        for rule, conclusionMap, prems, references, exact in calls:
+            if not isinstance(references, matcher.ReferenceIndex):
+                references = matcher.ReferenceIndex(references)
+            found, count = search(rule, conclusionMap, prems, references)
+            results.append(found)
+            backtracks.append(count)
+        return results, backtracks, time.time() - start
+
+    def oldSearch(rule, conclusionMap, prems, references):
+        # The premises were in the order of a set, so order them by hash
+        counts = [0]
+        bindings = util.Bindings(conclusionMap)
+        found = queueSearch(bindings, list(set(prems)), references, counts)
+        return found, counts[0]
+
+    def newSearch(rule, conclusionMap, prems, references):
+        found = len(makeMapping(rule, conclusionMap, prems, references, False)) > 0
+        return found, rule.getBacktracks()
+
+    old, oldBacktracks, oldTime = run(oldSearch)
+    new, newBacktracks, newTime = run(newSearch)
+
+    print 'Verified %d files, skipped %d, mapped %d rule applications' % (len(parsed), len(skipped), len(calls))
+    print '%-20s%-12s%-12s%s' % ('', 'backtracks', 'most', 'time')
+    print '%-20s%-12d%-12d%.3fs' % ('premise set', sum(oldBacktracks), max(oldBacktracks or [0]), oldTime)
+    print '%-20s%-12d%-12d%.3fs' % ('makeMapping', sum(newBacktracks), max(newBacktracks or [0]), newTime)
+
+benchmarks = {'memory': memory, 'deep': deep, 'parse': parse, 'parsecache': parseCache, 'includes': includes, 'stream': stream, 'lemmas': lemmas, 'lemmafile': lemmaFile, 'verifyall': verifyAll, 'incremental': incremental, 'lines': lines, 'store': resultStore, 'validcache': validCache, 'bindings': bindings, 'justify': justify, 'references': references, 
+              'premises': premises}
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] not in benchmarks:
+        print 'Usage: %s {%s} [args]' % (sys.argv[0], ','.join(sorted(benchmarks)))
+        sys.exit(1)
+
+    # The other benchmarks compare ways of checking a line, which the isValid cache would skip after the first
+    if sys.argv[1] != 'validcache':
+        inference.setValidCacheSize(0)
+
+    benchmarks[sys.argv[1]](*sys.argv[2:])
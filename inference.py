@@ -1,5 +1,122 @@
+import json
+
 import proof
 import printers
+import matcher
+import parsers
+import util
+
+# The version of how inference rules and proofs are checked, results from another version are not used
+# Change it whenever a change to matching or verifying can change what is valid
+VERIFIER_VERSION = 1
+
+# Remembers the results of isValid, keyed by (rule, sentence, support sentences), see Inference.isValid
+validCache = util.LRUCache(100000)
+
+def supportKey(sentences):
+    '''
+    Gets the support sentences of a step in the keys of validCache
+
+    The order of the references does not matter, but how many times a sentence is cited may, so the key is
+    how many times each sentence is cited.  It does not use the ids of the sentences, which are only the
+    same within one process, so a key loaded by loadValidCache is the same as the key made here.
+
+    @param sentences - The sentences of the references, None for a line without a sentence
+    @return - A frozenset of (sentence, count) of each sentence
+    '''
+    counts = {}
+    for sen in sentences:
+        counts[sen] = counts.get(sen, 0) + 1
+    return frozenset(counts.items())
+
+def setValidCacheSize(maxSize):
+    '''
+    Sets the largest number of isValid results to remember
+
+    @param maxSize - The number of results, 0 to not remember any or None for no limit
+    '''
+    validCache.resize(maxSize)
+
+def validCacheInfo():
+    '''
+    Gets the statistics of the isValid cache
+
+    @return - A dict with the 'hits', 'misses', 'hitRate', 'evictions', 'size' and 'maxSize' of the cache
+    '''
+    return validCache.info()
+
+def saveValidCache(filename):
+    '''
+    Writes the remembered isValid results to a file as JSON, so another process can load them
+
+    Each sentence is written once as its parts, see parsers.encodeSentence, and each result is
+    [rule class name, conclusion, [premise, ...], sentence, [support sentence, ...], valid] with the
+    index of each sentence
+
+    @param filename - The name of the file
+    '''
+    sentences = []
+    index = {}
+    def number(sen):
+        if sen is None:
+            return None
+        if sen._id not in index:
+            index[sen._id] = len(sentences)
+            sentences.append(parsers.encodeSentence(sen))
+        return index[sen._id]
+
+    results = []
+    for (ruleKey, sen, support), valid in validCache.items():
+        kind, conclusion, premises = ruleKey
+        results.append([kind, number(conclusion), [number(p) for p in premises], number(sen),
+                        [number(s) for s, count in support for n in range(count)], valid])
+
+    data = {'verifier': VERIFIER_VERSION, 'parser': parsers.PARSER_VERSION, 'sentences': sentences, 'results': results}
+    with open(filename, 'w') as f:
+        json.dump(data, f)
+
+def loadValidCache(filename):
+    '''
+    Adds the isValid results written by saveValidCache to the ones remembered now
+
+    A file written by another version of the verifier or parsers is ignored, its results may not be right now
+
+    @param filename - The name of the file
+    @return - True if the results were added, False if the file is from another version
+    @raise ValueError - If the file is not written by saveValidCache
+    '''
+    with open(filename) as f:
+        data = json.load(f)
+
+    if not isinstance(data, dict):
+        raise ValueError('%s is not an isValid cache' % filename)
+    if data.get('verifier') != VERIFIER_VERSION or data.get('parser') != parsers.PARSER_VERSION:
+        return False
+    if not isinstance(data.get('sentences'), list) or not isinstance(data.get('results'), list):
+        raise ValueError('%s is not an isValid cache' % filename)
+
+    sentences = [parsers.decodeSentence(nodes) for nodes in data['sentences']]
+    def sentence(n, optional = True):
+        if n is None and optional:
+            return None
+        if type(n) is not int or not 0 <= n < len(sentences):
+            raise ValueError('%s is not an isValid cache' % filename)
+        return sentences[n]
+
+    loaded = []
+    for result in data['results']:
+        if not isinstance(result, list) or len(result) != 6 or result[0] not in ('Inference', 'Lemma') or \
+           not isinstance(result[2], list) or not isinstance(result[4], list) or type(result[5]) is not bool:
+            raise ValueError('%s is not an isValid cache' % filename)
+
+        kind, conclusion, premises, sen, support, valid = result
+        ruleKey = (str(kind), sentence(conclusion, False), frozenset([sentence(p, False) for p in premises]))
+        loaded.append(((ruleKey, sentence(sen), supportKey([sentence(s) for s in support])), valid))
+
+    # Nothing is added unless the whole file is right
+    for key, valid in loaded:
+        validCache[key] = valid
+    return True
 
 class InferenceIterator:
     '''
@@ -61,6 +178,35 @@ class Inference(proof.Proof):
         if self._newVars is None:
             self._newVars = set([])
 
+        # The number of backtracks of the last makeMapping
+        self._backtracks = 0
+
+        # The compiled matchers of the conclusion and premises, made by compile
+        self._conclusionMatcher = None
+        self._premiseMatchers = None
+
+        # What the rule is in the keys of validCache, made by compile
+        self._ruleKey = None
+
+    def compile(self):
+        '''
+        Compiles the conclusion and each premise into a matcher.Matcher, so they are not looked at 
+        again every time this inference is used
+
+        isValid compiles the inference the first time it is used if this has not been called
+        '''
+        if self._conclusion is not None:
+            self._conclusionMatcher = matcher.compilePattern(self._conclusion)
+
+        # The premises are a set, so the matchers are put in the same order every time with the most selective first
+        self._premiseMatchers = [matcher.compilePattern(p) for p in matcher.orderPremises(self._premises)]
+
+        # Two rules with the same conclusion and premises give the same results, even from different files
+        # A premise with new variables depends on more than the sentences of the lines, so it is not remembered
+        self._ruleKey = (self.__class__.__name__, self._conclusion, frozenset(self._premises))
+        if self._newVars or any('extra' in p.extraData and 'newVars' in p.extraData['extra'] for p in self._premises):
+            self._ruleKey = None
+
     def __iter__(self):
         # Returns an iterator of itself
         return InferenceIterator(self)
@@ -94,25 +240,54 @@ class Inference(proof.Proof):
     def isValid(self, sen, ref):
         '''
         Checks wheather the sentence is a valid conclusion of the references using this inference rule 
+
+        The result is remembered in validCache by the rule, the sentence and the sentences of the references, 
+        so the same step in any proof is only checked once
         '''
         # A inference with no conclusion isalways true i.e. from anything you can derive nothing
         if self._conclusion is None:
             return True
 
-        # Create a mapping of variables from the conclusion to the sentence
-        for conclusionMap in self._conclusion.mapInto(sen): #, False):
+        if self._premiseMatchers is None:
+            self.compile()
+
+        # Put all of the sentences into a list
+        refList = []
+        for r in ref:
+            try:
+                refList.append(r())
+            except ReferenceError:
+                return False
+
+        if self._ruleKey is None:
+            return self.checkValid(sen, refList)
+
+        key = (self._ruleKey, sen, supportKey([l.getSentence() for l in refList]))
+        valid = validCache.get(key)
+        if valid is None:
+            valid = self.checkValid(sen, refList)
+            validCache[key] = valid
+        return valid
+
+    def checkValid(self, sen, refList):
+        '''
+        Checks wheather the sentence is a valid conclusion of the reference lines using this inference rule, 
+        without using validCache
+
+        @param sen - The sentence
+        @param refList - A list of the reference lines
+        '''
+        # The references are the same for every mapping of the conclusion, so they are only indexed 
+        # and the premises mapped into them once
+        references = matcher.ReferenceIndex(refList)
+        options = self.premiseOptions(self._premiseMatchers, references)
+
+        # Create a mapping of variables from the conclusion to the sentence, stopping at the first one that works
+        for conclusionMap in self._conclusionMatcher.iterMappings(sen): #, False):
             if len(conclusionMap) == 0:
                 # If there is no mapping, then this inference is not valid
                 return False
     
-            # Put all of the sentences into a list
-            refList = []
-            for r in ref:
-                try:
-                    refList.append(r())
-                except ReferenceError:
-                    return False
-    
             # If we have variables that we need to be new
             #if self._newVars is not None:
                 #for l in [r() for r in ref]:
@@ -122,7 +297,7 @@ class Inference(proof.Proof):
                             #return False
     
             # For each premise we need it to match at least one reference
-            mapping = self.makeMapping(conclusionMap, self._premises, refList, False)
+            mapping = self.makeMapping(conclusionMap, self._premiseMatchers, references, False, options)
             
             # Return True if a mapping exists
             if len(mapping) > 0:
@@ -0,0 +1,143 @@
+import sys
+
+# inference imports proof, so it has to be imported first
+import inference
+import line
+import matcher
+import parsers
+import printers
+
+class Lemma(inference.Inference):
+    '''
+    An inference rule made from a valid proof, the generalized premises of the proof are its premises
+    and a generalized line of the proof is its conclusion
+
+    A lemma proves the same sentences as the proof does when the proof is used as an inference rule,
+    without having the proof to verify or looking at any other line than its conclusion
+
+    e.g.
+    proof
+    DeMorgans And Not
+    1	and(not(P), not(Q))	Assumption
+    2	|-(or(P, Q), Contradiction)	DeMorgans And Not - Sub 1	1
+    3	not(or(P, Q))	Not Intro	2
+    done
+
+    is the lemma
+
+    lemma
+    DeMorgans And Not
+    and(not(@P),not(@Q))
+    not(or(@P,@Q))
+    done
+    '''
+
+    def __init__(self, name, conclusion = None, premises = None, printer = None, newVars = None):
+        if printer is None:
+            printer = printers.defaultLemmaPrinter
+        inference.Inference.__init__(self, name, conclusion, premises, printer, newVars)
+
+    def checkValid(self, sen, refLines):
+        '''
+        Checks wheather the sentence is a valid conclusion of the reference lines using this lemma,
+        the same way Proof.isValid does for the proof it was made from
+        '''
+        refLines = list(refLines)
+
+        if sen.op() == '|-':
+            # Add the subproof assumption to the reference list
+            if str(sen.args()[0]) != '':
+                assumption = line.Line(self, False)
+                assumption.setSentence(sen.args()[0])
+                refLines.append(assumption)
+
+            # We are trying to prove the second part
+            sen = sen.args()[1]
+
+        # The references are the same for every mapping of the conclusion, so they are only indexed 
+        # and the premises mapped into them once
+        references = matcher.ReferenceIndex(refLines)
+        options = self.premiseOptions(self._premiseMatchers, references)
+
+        # Every premise has to be used once, the same as a proof
+        for conclusionMap in self._conclusionMatcher.iterMappings(sen):
+            mapping = self.makeMapping(conclusionMap, self._premiseMatchers, references, options = options)
+            if len(mapping) > 0:
+                return True
+        return False
+
+def compileLemma(prf, index = -1):
+    '''
+    Compiles a proof into a lemma
+
+    Only one line of the proof is the conclusion of the lemma, a proof used as an inference rule
+    can prove any of its lines
+
+    @param prf - The proof to compile
+    @param index - The index of the line to use as the conclusion, defaults to the last line
+    @return - A compiled Lemma with the name of the proof, or None if the proof is not valid
+    '''
+    if len(prf) == 0 or prf.verify() is not True:
+        return None
+
+    premises = [p.generalize() for p in prf.getPremises()]
+    conclusion = prf[index].getSentence().generalize()
+
+    lem = Lemma(prf.name, conclusion, premises)
+    lem.compile()
+    return lem
+
+def writeLemmas(lemmas, filename):
+    '''
+    Writes lemmas to a lemma file, which can be included in a proof file
+
+    @param lemmas - An iterable of Lemmas
+    @param filename - The name of the file to write
+    '''
+    with open(filename, 'w') as f:
+        f.write('\n\n'.join(str(lem) for lem in lemmas) + '\n')
+
+def readLemmas(filename):
+    '''
+    Reads the lemmas of a lemma file, using its compiled form if it is in the include cache, see parsers.setIncludeCache
+
+    @param filename - The name of the lemma file
+    @return - A list of the lemmas in the order of the file
+    '''
+    with open(filename) as f:
+        text = f.read()
+
+    steps = parsers.loadInclude(filename, text)
+    if steps is None or any(kind != 'inference' for kind, value in steps):
+        raise parsers.LineError('%s is not a lemma file' % filename)
+    return [value for kind, value in steps]
+
+if __name__ == '__main__':
+    # Usage: python lemma.py proofFile [lemmaFile]
+    # Exits with 0 if every proof was compiled, 1 if a proof is not valid and 2 if there was an error, the same as batch.py
+    if len(sys.argv) not in (2, 3):
+        sys.stderr.write('Usage: %s proofFile [lemmaFile]\n' % sys.argv[0])
+        sys.exit(2)
+
+    try:
+        with open(sys.argv[1]) as f:
+            proofs = parsers.defaultProofParser(f)
+    except (IOError, parsers.LineError) as e:
+        sys.stderr.write('%s\n' % e)
+        sys.exit(2)
+
+    status = 0
+    lemmas = []
+    for name in sorted(proofs):
+        lem = compileLemma(proofs[name])
+        if lem is None:
+            sys.stderr.write('%s is not valid\n' % name)
+            status = 1
+        else:
+            lemmas.append(lem)
+
+    if len(sys.argv) > 2:
+        writeLemmas(lemmas, sys.argv[2])
+    else:
+        sys.stdout.write('\n\n'.join(str(lem) for lem in lemmas) + '\n')
+    sys.exit(status)
@@ -8,19 +8,37 @@ class Line:
     A line of a Proof
     '''
 
-    def __init__(self, proof):
+    def __init__(self, proof, inProof = True):
+        '''
+        @param proof - The proof this line belongs to
+        @param inProof - False if the line is not one of the lines of the proof, so changing it does not change the proof
+        '''
         # The proof that this line is in as a weak ref
         self._proof = weakref.ref(proof)
 
+        # If changing this line changes the proof
+        self._inProof = inProof
+
         # The sentence at this line
         self._sentence = None
 
         # The inference rule used at this line
         self._inference = None
 
+        # The rule found for this line when it has no inference rule (???), it is found again when the line changes
+        self._justifiedBy = None
+
         # A set of weak refs to the lines that support this line
         self._support = set([])
 
+        # The lines this line supports, they are checked again when this line changes
+        self._dependents = weakref.WeakSet()
+
+        # If this line was valid the last time it was checked, None if it has not been checked since it changed
+        # and what it was checked with, see Proof.verifyLines
+        self._valid = None
+        self._validKey = None
+
         # The current line number. Used for printing
         self._num = None
 
@@ -96,8 +114,8 @@ class Line:
         return ret
 
     def __hash__(self):
-        # The hash is the hash of its string reprenstation
-        return hash(str(self))
+        # Lines are only equal to themselves, so the hash does not depend on what is in the line
+        return id(self)
 
     def __contains__(self, item):
         # This checks weather item was assumed in this line
@@ -114,12 +132,34 @@ class Line:
 
         return False	
 
+    def changed(self):
+        '''
+        Marks the line as changed, so it and its proof are verified again
+        '''
+        self._num = None
+        self.recheck()
+
+        proof = self._proof()
+        if self._inProof and proof is not None:
+            proof.changed()
+
+    def recheck(self):
+        '''
+        Forgets if this line and the lines it supports are valid, and the rules found for them, so they are 
+        checked again the next time the proof is verified
+        '''
+        self._valid = None
+        self._justifiedBy = None
+        for dependent in self._dependents:
+            dependent._valid = None
+            dependent._justifiedBy = None
+
     def setSentence(self, sen):
         '''
         Set the sentence of this line
         '''
         # Reset the line number since the line has chaged. Used for verification caching
-        self._num = None
+        self.changed()
 
         # set the sentence
         self._sentence = sen
@@ -137,7 +177,7 @@ class Line:
         Set the inference rule that this line uses
         '''
         # Reset the line number since the line has chaged. Used for verification caching
-        self._num = None
+        self.changed()
         self._inference = inf
 
     def getInference(self):
@@ -146,26 +186,40 @@ class Line:
         '''		
         return self._inference
 
+    def getJustification(self):
+        '''
+        Get the inference rule this line was checked with, its own rule or the rule found for it if it has none (???)
+        '''
+        if self._inference is None:
+            return self._justifiedBy
+        return self._inference
+
     def addSupport(self, line):
         '''
         Adds another line as a supporting line
         '''
         # Reset the line number since the line has chaged. Used for verification caching
-        self._num = None
+        self.changed()
 
         # Add the lines as a weak reference
         self._support.add(weakref.ref(line))
+        line._dependents.add(self)
 
     def discardSuppprt(self, line):
         '''
         Removes another line as a supporting line
         '''		
         # Reset the line number since the line has chaged. Used for verification caching
-        self._num = None
+        self.changed()
 
-        # discard the line from the set
+        # discard the line from the set, it can be given as a line or a weak ref to one
+        if not isinstance(line, weakref.ref):
+            line = weakref.ref(line)
         self._support.discard(line)
 
+        if line() is not None:
+            line()._dependents.discard(self)
+
     def getSuppprt(self):
         '''
         Returns the set of support steps
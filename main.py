@@ -2,6 +2,7 @@ import sys
 import os.path
 
 import parsers
+import verifier
 
 filename = ''
 if len(sys.argv) > 1:
@@ -32,13 +33,16 @@ try:
     # Set the line numbering to start at 1 (instead of the default 0)
     [tstPrf[i].setNumbering(lambda x: x+1) for i in tstPrf]
 
+    # Verify every proof once, after the proofs it uses
+    results = verifier.verifyAll(tstPrf)
+
     validTracker = set([])
     for proof in tstPrf:
         # Print each proof that was parsed
         print tstPrf[proof]
 
         # Check that it is valid
-        valid = tstPrf[proof].verify()
+        valid = results[proof]
         if valid is True:
             validTracker.add(proof)
             # If it is valid, print it
@@ -0,0 +1,341 @@
+import sentence2 as sentence
+
+# The kinds of steps of a compiled pattern
+STRUCT, LITERAL, VARIABLE, WFF = range(4)
+
+class Matcher(object):
+    '''
+    A pattern compiled into a matcher, so the pattern is not looked at again every time it is matched
+
+    A first order pattern (one without any operators such as @P[?x]) has only one way to match, so it
+    is matched in one pass over the sentence.  The placeholders (@ and ?) each get a slot that holds
+    what they are bound to.  Other patterns are matched with mapInto.
+
+    A Matcher can be used instead of its pattern as a premise of Proof.makeMapping
+
+    e.g.
+    m = compilePattern('and(@A, ?x)')
+    m.mapInto('and(or(P,Q), a)') -> [{and: and, @A: or(P,Q), ?x: a}]
+    '''
+
+    def __init__(self, pattern):
+        '''
+        @param pattern - The sentence to compile
+        '''
+        self.pattern = pattern
+
+        # The extra data of the pattern e.g. new variables
+        self.extraData = pattern.extraData
+
+        # Atoms are matched on their own, only sentences with arguments need the same arity and main operator
+        self.compound = not isinstance(pattern, sentence.Wff)
+
+        # The main operator if it is a literal, otherwise None
+        self.head = pattern.op() if self.compound and isinstance(pattern.op(), sentence.Literal) else None
+        self.arity = pattern.arity()
+
+        # Each placeholder of the pattern, in the order they appear
+        self.slots = []
+
+        # The literals of the pattern, each maps into itsself
+        self.literals = {}
+
+        # The steps of a first order pattern, in the order of the sentence (op first)
+        # Each step is (kind, slot or literal or arity)
+        self.steps = []
+
+        # A pattern is first order if it does not have any operators
+        self.firstOrder = True
+
+        slotIds = {}
+        stack = [pattern]
+        while stack:
+            sen = stack.pop()
+            if isinstance(sen, sentence.Operator):
+                self.firstOrder = False
+                break
+
+            if isinstance(sen, sentence.Literal):
+                self.literals[sen] = sen
+                self.steps.append((LITERAL, sen))
+            elif isinstance(sen, sentence.Wff):
+                if sen not in slotIds:
+                    slotIds[sen] = len(self.slots)
+                    self.slots.append(sen)
+                kind = VARIABLE if isinstance(sen, sentence.Variable) else WFF
+                self.steps.append((kind, slotIds[sen]))
+            else:
+                self.steps.append((STRUCT, sen.arity()))
+                stack.extend(reversed(sen._data))
+
+        self.slots = tuple(self.slots)
+        self.steps = tuple(self.steps)
+
+    def __repr__(self):
+        return 'Matcher(%r)' % (self.pattern,)
+
+    def iterMappings(self, other, replaceAll = True):
+        '''
+        Yields the same mappings as self.pattern.iterMappings(other, replaceAll)
+        '''
+        if other is None:
+            return iter(())
+
+        if not self.firstOrder:
+            return self.pattern.iterMappings(other, replaceAll)
+
+        # Quick checks of the main operator before looking at the rest of the sentence
+        if self.compound and (other.arity() != self.arity or (self.head is not None and other.op() != self.head)):
+            return iter(())
+
+        mapping = self.match(other)
+        if mapping is None:
+            return iter(())
+        return iter((mapping,))
+
+    def mapInto(self, other, replaceAll = True):
+        '''
+        The same as self.pattern.mapInto(other, replaceAll)
+        '''
+        return list(self.iterMappings(other, replaceAll))
+
+    def match(self, other):
+        '''
+        Matches a first order pattern in one pass
+
+        @return - The mapping of the pattern into other, or None if there is none
+        '''
+        values = [None] * len(self.slots)
+
+        # The parts of other that are left to match, the next one is last
+        targets = [other]
+
+        for kind, data in self.steps:
+            target = targets.pop()
+
+            if kind == STRUCT:
+                if target.arity() != data:
+                    return None
+                targets.extend(reversed(sentence.parts(target)))
+                continue
+
+            if kind == LITERAL:
+                # A literal can only map into itsself
+                if data != target:
+                    return None
+                continue
+
+            # A Variable can only map into atomic terms
+            if kind == VARIABLE and not (len(target.args()) == 0 and
+                                         (not isinstance(target, sentence.Wff) or isinstance(target, sentence.Variable))):
+                return None
+
+            # A placeholder that is already bound keeps the more general sentence, like util.mapMerge
+            current = values[data]
+            if current is None:
+                values[data] = target
+            elif target != current:
+                if target <= current:
+                    values[data] = target
+                elif not current <= target:
+                    return None
+
+        mapping = dict(self.literals)
+        mapping.update(zip(self.slots, values))
+        return mapping
+
+def compilePattern(pattern):
+    '''
+    Compiles a pattern into a Matcher
+
+    @param pattern - A sentence
+    @return - A Matcher of the pattern
+    '''
+    return Matcher(pattern)
+
+# The key of anything in a pattern that can match any sentence, e.g. a placeholder
+WILDCARD = ('*',)
+
+def patternKeys(pattern):
+    '''
+    Gets the keys of a pattern in a DiscriminationTree, in the order of the sentence (op first)
+
+    Placeholders, operators and anything else that could match more than one shape of sentence is a WILDCARD
+    '''
+    keys = []
+    stack = [pattern]
+    while stack:
+        sen = stack.pop()
+        if isinstance(sen, sentence.Literal):
+            keys.append(sen)
+        elif isinstance(sen, (sentence.Wff, sentence.Operator)) or sen.arity() == 0:
+            keys.append(WILDCARD)
+        else:
+            keys.append(('(', sen.arity()))
+            stack.extend(reversed(sen._data))
+    return keys
+
+def sentenceKeys(sen):
+    '''
+    Gets the keys of a sentence to look up in a DiscriminationTree, and for each key the 
+    index of the key after the part of the sentence it starts
+    '''
+    keys = []
+    ends = []
+    stack = [sen]
+    while stack:
+        item = stack.pop()
+
+        # The end of a compound part
+        if isinstance(item, tuple):
+            ends[item[1]] = len(keys)
+            continue
+
+        index = len(keys)
+        ends.append(index + 1)
+        if isinstance(item, sentence.Wff):
+            keys.append(item)
+        else:
+            keys.append(('(', item.arity()))
+            stack.append(('end', index))
+            stack.extend(reversed(item._data))
+    return keys, ends
+
+def selectivity(pattern):
+    '''
+    Gets how selective a pattern is, a pattern with more literals and more symbols matches fewer sentences
+
+    @param pattern - A sentence or a Matcher
+    @return - (number of literals, number of keys) of the pattern
+    '''
+    if isinstance(pattern, Matcher):
+        pattern = pattern.pattern
+
+    keys = patternKeys(pattern)
+    literals = len([k for k in keys if isinstance(k, sentence.Literal)])
+    return literals, len(keys)
+
+def orderPremises(premises):
+    '''
+    Orders premises so the most selective are first, premises that are as selective are 
+    ordered by how they print so the order is the same every time
+
+    @param premises - An iterable of sentences or Matchers
+    @return - A list of the premises
+    '''
+    def key(premise):
+        literals, size = selectivity(premise)
+        return (-literals, -size, str(premise))
+    return sorted(premises, key = key)
+
+class DiscriminationTree(object):
+    '''
+    An index of patterns by their shape, so only the patterns that could match a sentence are tried
+
+    Each pattern is a path of keys from the root, a sentence follows the paths with the same key
+    and the WILDCARD paths, which skip a whole part of the sentence
+
+    e.g.
+    t = DiscriminationTree()
+    t.add('and(@A, @B)', 1)
+    t.add('or(@A, @B)', 2)
+    t.add('@A', 3)
+    t.candidates('and(P, Q)') -> [1, 3]
+    '''
+
+    def __init__(self):
+        # Each node is a dict of keys to the next node, the values of a pattern are kept under None
+        self._root = {}
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def add(self, pattern, value):
+        '''
+        Adds a value under a pattern
+        '''
+        node = self._root
+        for key in patternKeys(pattern):
+            node = node.setdefault(key, {})
+        node.setdefault(None, []).append(value)
+        self._size += 1
+
+    def candidates(self, sen):
+        '''
+        Gets the values of every pattern that could match sen, some of them may not match
+
+        @return - A list of the values, in the order they were added for each pattern
+        '''
+        keys, ends = sentenceKeys(sen)
+        results = []
+        stack = [(self._root, 0)]
+        while stack:
+            node, index = stack.pop()
+            if index == len(keys):
+                results.extend(node.get(None, ()))
+                continue
+
+            wild = node.get(WILDCARD)
+            if wild is not None:
+                stack.append((wild, ends[index]))
+
+            child = node.get(keys[index])
+            if child is not None:
+                stack.append((child, index + 1))
+        return results
+
+class ReferenceIndex(object):
+    '''
+    The references (lines) a premise can be mapped into, indexed by the main operator and arity 
+    of their sentences, so each premise only looks at the lines with the same shape
+
+    A premise with a literal main operator such as and(@A, @B) only visits the lines with that 
+    operator and arity, one with a placeholder main operator only the lines with that arity, and 
+    a placeholder or an operator such as @P[?x] visits every line.  The lines are always visited 
+    in the order they were given.
+    '''
+
+    def __init__(self, references):
+        '''
+        @param references - A list of references (lines)
+        '''
+        self.references = list(references)
+
+        # (main operator, arity) -> lines, and arity -> lines
+        self._byHead = {}
+        self._byArity = {}
+
+        for ref in self.references:
+            sen = ref.getSentence()
+
+            # An atom (or a blank line) can only be mapped into by a placeholder
+            if sen is None or isinstance(sen, sentence.Wff):
+                continue
+
+            self._byHead.setdefault((sen.op(), sen.arity()), []).append(ref)
+            self._byArity.setdefault(sen.arity(), []).append(ref)
+
+    def __len__(self):
+        return len(self.references)
+
+    def __iter__(self):
+        return iter(self.references)
+
+    def candidates(self, premise):
+        '''
+        Gets the references premise could be mapped into, some of them may not match
+
+        @param premise - A sentence or a Matcher
+        @return - A list of the references
+        '''
+        if isinstance(premise, Matcher):
+            premise = premise.pattern
+
+        # Only sentences matched part by part need the same arity and main operator
+        if not sentence.matchesByArgument(premise) or premise.arity() == 0:
+            return self.references
+
+        if isinstance(premise.op(), sentence.Literal):
+            return self._byHead.get((premise.op(), premise.arity()), ())
+        return self._byArity.get(premise.arity(), ())
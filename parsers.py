@@ -1,46 +1,164 @@
+import re
+import os
+import json
+import hashlib
+
 import sentence2 as sentence
+import util
 
 sf = sentence.sf
 
-def prefixSentenceParser(string, symbols = None):
+# The symbols used when none are given
+defaultSymbols = {'variable': '?', 'wff': '@', 'openParen': '(', 'closeParen': ')', 'openOpParen': '[', 
+                  'closeOpParen': ']', 'seperator': ',', 'newVar': '$'}
+
+class SymbolConfig(util.FrozenDict):
     '''
-    Parses a sentence from its prefix form
+    An immutable set of symbols used to parse and print sentences
 
-    @param string - A string representation of a sentence
-    @param symbols - A dict of symbols to use.  Valid keys are: 'variable', 'wff', 'openParen', 'closeParen', 'seperator'
+    There is only one SymbolConfig for each set of symbols, so every sentence parsed the same way shares it
+    '''
 
-    @return - A sentence parsed from the string
+    def __reduce__(self):
+        # Unpickle into the shared SymbolConfig
+        return (sharedSymbolConfig, (dict(self),))
+
+# All the SymbolConfigs that have been made, each maps to itsself
+_symbolConfigs = {}
+
+def symbolConfig(symbols = None, **changes):
     '''
+    Gets the shared SymbolConfig for a set of symbols
 
-    if symbols is None:
-        symbols = {}
+    @param symbols - A dict of symbols to use, any that are missing are taken from defaultSymbols
+    @param changes - Symbols to replace, e.g. extra = {'newVars': (...)}
+    @return - The SymbolConfig with those symbols
+    '''
+    # A complete config can be used as is
+    if not changes and type(symbols) is SymbolConfig and 'extra' not in symbols:
+        return symbols
 
-    if 'variable' not in symbols:
-        symbols['variable'] = '?'
+    config = dict(defaultSymbols)
+    if symbols is not None:
+        config.update(symbols)
 
-    if 'wff' not in symbols:
-        symbols['wff'] = '@'    
+        # Extra data belongs to a single sentence, so it is not passed on
+        if 'extra' not in changes:
+            config.pop('extra', None)
 
-    if 'openParen' not in symbols:
-        symbols['openParen'] = '('   
+    config.update(changes)
+    return sharedSymbolConfig(config)
 
-    if 'closeParen' not in symbols:
-        symbols['closeParen'] = ')'
-        
-    if 'openOpParen' not in symbols:
-        symbols['openOpParen'] = '['   
-       
-    if 'closeOpParen' not in symbols:
-        symbols['closeOpParen'] = ']'    
-
-    if 'seperator' not in symbols:
-        symbols['seperator'] = ','
-        
-    if 'newVar' not in symbols:
-        symbols['newVar'] = '$'
+def sharedSymbolConfig(config):
+    '''
+    Gets the shared SymbolConfig of a dict with every symbol
+
+    @param config - A dict of every symbol, and the extra data if there is any
+    @return - The SymbolConfig with those symbols
+    '''
+    config = SymbolConfig(config)
+    return _symbolConfigs.setdefault(config, config)
+
+# Remembers the sentence parsed from each string, keyed by (string without whitespace, SymbolConfig)
+parseCache = util.LRUCache(20000)
+
+def setParseCacheSize(maxSize):
+    '''
+    Sets the largest number of parsed sentences to remember
+
+    @param maxSize - The number of sentences, 0 to not remember any or None for no limit
+    '''
+    parseCache.resize(maxSize)
+
+def parseCacheInfo():
+    '''
+    Gets the statistics of the prefixSentenceParser cache
+
+    @return - A dict with the 'hits', 'misses', 'hitRate', 'evictions', 'size' and 'maxSize' of the cache
+    '''
+    return parseCache.info()
+
+class SentenceTokens(object):
+    '''
+    The parens and commas of a sentence, found in one pass over the string
+
+    The names in the sentence are the parts of the string between the tokens, so they are not tokens of their own
+    '''
+
+    def __init__(self, string, symbols):
+        '''
+        @param string - A sentence without any whitespace
+        @param symbols - The SymbolConfig of the sentence
+        '''
+        # The position in the string and the character of each token
+        self.positions = []
+        self.chars = []
+
+        # Maps each open paren to a dict of the index of each of its tokens to the index of the matching close paren
+        self.matches = {symbols['openParen']: {}, symbols['openOpParen']: {}}
+
+        # Maps the position after each token (and the start) to the index of the next token
+        self.first = {0: 0}
+
+        parens = [(symbols['openParen'], symbols['closeParen']), (symbols['openOpParen'], symbols['closeOpParen'])]
+        opened = [[] for p in parens]
+
+        # The first unmatched close paren of each kind
+        errors = [None for p in parens]
+
+        for match in tokenPattern(symbols).finditer(string):
+            index = len(self.positions)
+            char = match.group()
+            self.positions.append(match.start())
+            self.chars.append(char)
+            self.first[match.end()] = index + 1
+
+            for kind, (openSymbol, closeSymbol) in enumerate(parens):
+                if char == openSymbol:
+                    opened[kind].append(index)
+                elif char == closeSymbol:
+                    if len(opened[kind]) == 0:
+                        if errors[kind] is None:
+                            errors[kind] = closeSymbol
+                        continue
+                    self.matches[openSymbol][opened[kind].pop()] = index
+
+        for error in errors:
+            if error is not None:
+                raise sentence.InvalidSentenceError('Unmatched Close Parenthesis' + error)
+
+# The regular expression that finds the tokens of a sentence for each SymbolConfig
+_tokenPatterns = {}
+
+def tokenPattern(symbols):
+    '''
+    Gets the regular expression that finds the parens and commas of a sentence
+
+    @param symbols - A SymbolConfig
+    '''
+    pattern = _tokenPatterns.get(symbols)
+    if pattern is None:
+        chars = [symbols['openParen'], symbols['closeParen'], symbols['openOpParen'], symbols['closeOpParen'], ',']
+        pattern = re.compile('|'.join([re.escape(c) for c in chars]))
+        _tokenPatterns[symbols] = pattern
+    return pattern
 
+def prefixSentenceParser(string, symbols = None):
+    '''
+    Parses a sentence from its prefix form
 
-    def init(string):
+    @param string - A string representation of a sentence
+    @param symbols - A dict of symbols to use.  Valid keys are: 'variable', 'wff', 'openParen', 'closeParen', 
+                     'openOpParen', 'closeOpParen', 'seperator', 'newVar'
+
+    @return - A sentence parsed from the string
+    '''
+
+    # Fill in the default symbols, the result is shared so it is never changed
+    symbols = symbolConfig(symbols)
+
+
+    def init(string, symbols):
         # ForAll[?x](...)
         #if symbols['openOpParen'] in string and symbols['openParen'] != symbols['openOpParen']:
             #newSymbols = dict(symbols)
@@ -62,143 +180,15 @@ def prefixSentenceParser(string, symbols = None):
             # Otherwise make it a literal
             return sf.generateLiteral(string)
         
-    def findMatch(string, pos, endSymbol, direction = 1):
-        depth = 1
-        startSymbol = string[pos]
-        while depth > 0:
-            pos += direction
-            if string[pos] == startSymbol:
-                depth += 1
-            elif string[pos] == endSymbol:
-                depth -= 1
-        return pos
-            
-    def splitArgs(string, symbols):
-        # A                     -> ['A']
-        # (A)                   -> ['A']
-        # (not(A))              -> ['not', 'A']
-        # not(A)                -> ['not', 'A']
-        # and(A, B)             -> ['and', 'A', 'B']
-        # and(not(A), B)        -> ['and', 'not(A)', 'B']
-        # and(not(A), or(B, C)) -> ['and', 'not(A)', 'or(B, C)']
-        # P[x]                  -> ['P', 'x']
-        # P[s(x)]               -> ['P', 's(x)']
-        # P[s(x, y)]            -> ['P', 's(x, y)']
-        # ForAll(x, P(x))
-        # ForAll(x, P(s(x)))
-        # ForAll(x, P[x])
-        # ForAll(x, P[s(x)])
-        # ForAll(x, P(x, a))
-        # ForAll(x, P(x, A(a)))
-        # ForAll(x, P(x, A(a, b)))
-        
-        # Remove whitespace
-        string = "".join(string.split())
-        
-        # Find the first paren
-        firstP = string.find(symbols['openParen'])
-        firstOpP = string.find(symbols['openOpParen'])
-        
-        # Find the matching paren
-        try:
-            otherP = findMatch(string, firstP, symbols['closeParen'])
-        except IndexError:
-            otherP = -1
-            
-        try:
-            otherOpP = findMatch(string, firstOpP, symbols['closeOpParen']) 
-        except IndexError:
-            otherOpP = -1        
-        
-        result = []
-        oper = False
-        
-        if firstOpP < 0 or (firstP < firstOpP and firstP >= 0):
-            # A                     -> ['A']
-            # (A)                   -> ['A']
-            # (not(A))              -> ['not', 'A']
-            # not(A)                -> ['not', 'A']
-            # and(A, B)             -> ['and', 'A', 'B']
-            # and(not(A), B)        -> ['and', 'not(A)', 'B']
-            # and(not(A), or(B, C)) -> ['and', 'not(A)', 'or(B, C)']    
-            # |-(@P[?a], @P[s(?a)])
-            # ForAll(x, P(x))
-            # ForAll(x, P(s(x)))
-            # ForAll(x, P[x])
-            # ForAll(x, P[s(x)])
-            # ForAll(x, P(x, a))
-            # ForAll(x, P(x, A(a)))
-            # ForAll(x, P(x, A(a, b)))            
-            
-            if firstP < 0:
-                # A                     -> ['A']
-                return string, [], '', oper
-            
-            elif firstP == 0:
-                # (A)                   -> ['A']
-                # (not(A))              -> ['not', 'A']
-                
-                return splitArgs(string[1:-1], symbols)
-            else:
-                # not(A)                -> ['not', 'A']
-                # and(A, B)             -> ['and', 'A', 'B']
-                # and(not(A), B)        -> ['and', 'not(A)', 'B']
-                # and(not(A), or(B, C)) -> ['and', 'not(A)', 'or(B, C)']   
-                # ForAll(x, P(x))       -> ['ForAll', 'x', 'P(x)']
-                # ForAll(x, P(s(x)))
-                # ForAll(x, P[x])
-                # ForAll(x, P[s(x)])
-                # ForAll(x, P(x, a))
-                # ForAll(x, P(x, A(a)))
-                # ForAll(x, P(x, A(a, b)))     
-                # |-(@P[?a], @P[s(?a)])
-                
-                
-                # take the operator and its parens out of the string, anything after the last paren is extra
-                opStr, string, extra = string[:firstP], string[firstP + 1:otherP], string[otherP + 1:]
-        else:
-            # P[x]                  -> ['P', 'x']
-            # P[s(x)]               -> ['P', 's(x)']
-            # P[s(x, y)]            -> ['P', 's(x, y)']
-            
-            
-            #if otherOpP < firstP:
-                # ForAll(x, P(x))       -> ['ForAll', 'P(x)']
-                # ForAll(x, P(s(x)))
-                # ForAll(x, P[x])
-                # ForAll(x, P[s(x)])
-                # ForAll(x, P(x, a))
-                # ForAll(x, P(x, A(a)))
-                # ForAll(x, P(x, A(a, b)))
-                # ForAll[x](P(x, A(a, b)))   
-            #    opStr, string, extra = string[:firstP], string[firstP + 1:otherP], string[otherP + 1:]
-                
-            #else:
-                # P[x]                  -> ['P', 'x']
-                # P[Q[x]]               -> ['P', 'Q[x]']
-                # P[s(x)]               -> ['P', 's(x)']
-                # P[s(x, y)]            -> ['P', 's(x, y)']                
-            opStr, string, extra = string[:firstOpP], string[firstOpP + 1:otherOpP], string[otherOpP + 1:]
-            oper = True
-                
-        curStr = ''
-        for tok in string.split(','):
-            curStr += tok
-            parenCount = curStr.count(symbols['openParen']) - curStr.count(symbols['closeParen']) + \
-                curStr.count(symbols['openOpParen']) - curStr.count(symbols['closeOpParen'])
-            
-            if parenCount == 0:
-                result.append(curStr)
-                curStr = ''
-            else:
-                curStr += ','
-                
-        return opStr, result, extra, oper
-            
-
     # Remove all the whitespace in the string
     string = "".join(string.split())
 
+    # Sentences are immutable and shared, so a string that has been parsed before gives the same sentence
+    key = (string, symbols)
+    sen = parseCache.get(key)
+    if sen is not None:
+        return sen
+
     # Count the difference in the number of open and close parenthesis
     parenCount = string.count(symbols['openParen']) - string.count(symbols['closeParen'])
     parenOpCount = string.count(symbols['openOpParen']) - string.count(symbols['closeOpParen'])
@@ -212,34 +202,129 @@ def prefixSentenceParser(string, symbols = None):
         raise sentence.InvalidSentenceError('Unmatched Close Parenthesis' + symbols['closeOpParen'])
     elif parenOpCount < 0:
         raise sentence.InvalidSentenceError(symbols['openOpParen'] + 'Unmatched Open Parenthesis')        
-    
-    opStr, argStr, extra, oper = splitArgs(string, symbols)
-    
-    data = dict(symbols)
-    data['extra'] = {}
-    
-    if extra.startswith(symbols['newVar']):
-        data['extra']['newVars'] = [prefixSentenceParser(s) for s in extra.split(symbols['newVar'])[1:]]
-    
-    if oper:
-        
-        data['openParen'] = symbols['openOpParen']
-        data['closeParen'] = symbols['closeOpParen']   
-        
-        op = prefixSentenceParser(opStr, data)
-        args = [prefixSentenceParser(arg, symbols) for arg in argStr]  
-        return sf.generateOperator(op, args, data)
-    
-    if len(argStr) == 0:
-        return init(opStr)
-        
-    op = prefixSentenceParser(opStr, data)
-    try:
-        op = sf.generateSentence(op[0], op[1:])
-    except IndexError:
-        pass
-    args = [prefixSentenceParser(arg, symbols) for arg in argStr]      
-    return sf.generateSentence(op, args, data) 
+
+    # Find the parens and commas in one pass, the names are the parts of the string between them
+    tokens = SentenceTokens(string, symbols)
+    positions, chars, skip = tokens.positions, tokens.chars, tokens.matches
+    openParen, openOpParen = symbols['openParen'], symbols['openOpParen']
+
+    def splitArgs(start, end):
+        # A                     -> ['A']
+        # (A)                   -> ['A']
+        # (not(A))              -> ['not', 'A']
+        # not(A)                -> ['not', 'A']
+        # and(A, B)             -> ['and', 'A', 'B']
+        # and(not(A), B)        -> ['and', 'not(A)', 'B']
+        # and(not(A), or(B, C)) -> ['and', 'not(A)', 'or(B, C)']
+        # P[x]                  -> ['P', 'x']
+        # P[s(x)]               -> ['P', 's(x)']
+        # P[s(x, y)]            -> ['P', 's(x, y)']
+        # |-(@P[?a], @P[s(?a)]) -> ['|-', '@P[?a]', '@P[s(?a)]']
+        #
+        # Returns the (start, end) of the operator, each argument and the extra after the 
+        # last paren, and if the operator uses the operator parens
+
+        # The first token in the part of the string
+        index = tokens.first[start]
+
+        while True:
+            # Find the first paren
+            while index < len(positions) and positions[index] < end and chars[index] not in (openParen, openOpParen):
+                index += 1
+
+            if index == len(positions) or positions[index] >= end:
+                # A                     -> ['A']
+                return (start, end), [], (end, end), False
+
+            # The operator parens are used if they come first
+            oper = chars[index] == openOpParen
+
+            if not oper and positions[index] == start:
+                # (A)                   -> ['A']
+                # (not(A))              -> ['not', 'A']
+                start, end = start + 1, end - 1
+                index += 1
+                continue
+            break
+
+        # not(A)                -> ['not', 'A']
+        # and(A, B)             -> ['and', 'A', 'B']
+        # P[x]                  -> ['P', 'x']
+        # take the operator and its parens out of the string, anything after the last paren is extra
+        close = skip[chars[index]][index]
+        if positions[close] >= end:
+            raise sentence.InvalidSentenceError(chars[index] + 'Unmatched Open Parenthesis')
+        opPos, extraPos = (start, positions[index]), (positions[close] + 1, end)
+
+        # Split the arguments at each comma that is not inside parens, skipping over anything in parens
+        result = []
+        argStart = positions[index] + 1
+        index += 1
+        while index < close:
+            char = chars[index]
+            if char == ',':
+                result.append((argStart, positions[index]))
+                argStart = positions[index] + 1
+            elif char in skip:
+                index = skip[char][index]
+            index += 1
+        result.append((argStart, positions[close]))
+
+        return opPos, result, extraPos, oper
+
+    # The sentences parsed so far
+    values = []
+
+    # An explicit stack of what is left to do, so very deep sentences do not reach the recursion limit
+    # ('parse', start, end) parses a part of the string into a sentence
+    # ('make', oper, count, data) makes a sentence from the last operator and count arguments that were parsed
+    tasks = [('parse', 0, len(string))]
+
+    while tasks:
+        task = tasks.pop()
+
+        if task[0] == 'make':
+            oper, count, data = task[1:]
+            op, args = values[-count - 1], values[-count:]
+            del values[-count - 1:]
+
+            if oper:
+                values.append(sf.generateOperator(op, args, data))
+            else:
+                try:
+                    op = sf.generateSentence(op[0], op[1:])
+                except IndexError:
+                    pass
+                values.append(sf.generateSentence(op, args, data))
+            continue
+
+        start, end = task[1:]
+        opPos, argPos, extraPos, oper = splitArgs(start, end)
+
+        if not oper and len(argPos) == 0:
+            values.append(init(string[opPos[0]:opPos[1]], symbols))
+            continue
+
+        # The symbols the operator is parsed with
+        opData = symbols
+        if oper:
+            opData = symbolConfig(symbols, openParen = symbols['openOpParen'], closeParen = symbols['closeOpParen'])
+
+        # Only sentences with new variables have extra data
+        data = opData
+        extra = string[extraPos[0]:extraPos[1]]
+        if extra.startswith(symbols['newVar']):
+            newVars = tuple([prefixSentenceParser(s) for s in extra.split(symbols['newVar'])[1:]])
+            data = symbolConfig(opData, extra = util.FrozenDict({'newVars': newVars}))
+
+        # The operator is everything before the first paren so it is always a name, then the arguments are parsed in order
+        values.append(init(string[opPos[0]:opPos[1]], opData))
+        tasks.append(('make', oper, len(argPos), data))
+        for pos in reversed(argPos):
+            tasks.append(('parse', pos[0], pos[1]))
+
+    parseCache[key] = values[0]
+    return values[0]
 
 '''
     # find the first open paren
@@ -389,8 +474,347 @@ def defaultInferenceParser(string, sentenceParser = None):
     # Each other line is a sentence of the premises
     premises = [sentenceParser(i) for i in lines]
 
-    return Inference(name, conclusion, premises)
+    # Compile the rule once, since it may be used on every line of a proof
+    inf = Inference(name, conclusion, premises)
+    inf.compile()
+    return inf
+
+def defaultLemmaParser(string, sentenceParser = None):
+    '''
+    Parses a lemma into a Lemma object, a lemma is written the same way as an inference rule
 
+    @param string - A string representation of a lemma
+    @param sentenceParser - A function that parses the sentences in the lemma (Defaults to prefixSentenceParser)
+
+    @return - A lemma parsed from the string
+    '''
+    from lemma import Lemma
+
+    inf = defaultInferenceParser(string, sentenceParser)
+    lem = Lemma(inf.name, inf.getConclusion()[0], inf.getPremises())
+    lem.compile()
+    return lem
+
+
+# The version of the parsers, compiled includes made by another version are not used
+PARSER_VERSION = 3
+
+# If included rule files are compiled instead of parsed from their text
+includeCache = True
+
+# The directory compiled includes are kept in, None does not keep them on disk
+# Only a directory that no one else can write to should be used, a compiled include is used as the rules of its file
+includeCacheDir = os.environ.get('LemmaCache')
+
+def setIncludeCache(enabled = True, directory = None):
+    '''
+    Sets if and where the compiled included rule files are kept
+
+    @param enabled - If False included files are always parsed from their text
+    @param directory - The directory to keep them in, None does not keep them on disk
+    '''
+    global includeCache, includeCacheDir
+    includeCache = enabled
+    includeCacheDir = directory
+
+def compiledIncludePath(text):
+    '''
+    Gets the file a compiled include is kept in, it is named by the hash of the text and the parser version 
+    so a changed file or a new parser never uses an old one
+
+    @param text - The text of the included file
+    @return - The name of the file, or None if compiled includes are not kept on disk
+    '''
+    if includeCacheDir is None:
+        return None
+
+    key = hashlib.sha1('%d\n%s' % (PARSER_VERSION, text)).hexdigest()
+    return os.path.join(includeCacheDir, key + '.json')
+
+# The settings of defaultProofParser that compileInclude parses files with
+includeData = {'include': 'include', 'assign': 'set', 'split': '\t', 'subSplit': ',', 'range': '-', 
+               'comment': '#', 'infDone': 'done'}
+
+def includeTarget(string, data, path):
+    '''
+    Gets the absolute name of the file an include line includes, and the set of its line numbers to keep 
+    or None to keep every line
+
+    @param string - The include line
+    @param data - The settings of the parser, e.g. includeData
+    @param path - The directory of the file the line is in, relative names are in it
+    '''
+    toks = string.split(data['split'])
+    toks = filter(None, toks)
+
+    keepLines = None
+    if len(toks) > 2:
+        keepLines = set([])
+        subToks = [s.strip() for s in toks[2].split(data['subSplit'])]
+        for num in subToks:
+            if data['range'] in num:
+                start, end = [int(s.strip()) for s in num.split(data['range'])]
+                for i in range(start, end + 1):
+                    keepLines.add(i)
+            else:
+                keepLines.add(int(num))
+
+    if len(toks) > 1:
+        # Get the filename to include
+        filename = os.path.normpath(os.path.expandvars(toks[1].strip()))
+    else:
+        filename = os.path.normpath(os.path.expandvars(string[len(data['include']):].strip()))
+
+    # Check if it is a relative path, if it is get the absolute path
+    if not os.path.isabs(filename):
+        filename = os.path.join(path, filename)
+
+    return filename, keepLines
+
+def compileInclude(text):
+    '''
+    Compiles the text of a file that only has inference rules, lemmas and includes into the steps of including it
+
+    @param text - The text of the file
+    @return - A list of ('inference', Inference or Lemma) and ('include', line) in the order of the file, or None 
+              if the file has anything else (e.g. a proof) or can not be parsed
+    '''
+    steps = []
+    state = None
+    curInf = None
+    for line in text.split('\n'):
+        # Ignore everything after the comment symbol and blank lines, the same as defaultProofParser
+        line = line.split('#')[0].strip()
+        if len(line) == 0:
+            continue
+
+        if line.startswith('include'):
+            if state is not None:
+                return None
+            steps.append(('include', line))
+
+        elif state is None:
+            state = line.lower()
+            if state not in ('inference', 'lemma'):
+                return None
+
+        elif line == 'done':
+            parser = defaultLemmaParser if state == 'lemma' else defaultInferenceParser
+            try:
+                steps.append(('inference', parser(curInf)))
+            except sentence.InvalidSentenceError:
+                return None
+            state = None
+            curInf = None
+
+        elif curInf is None:
+            curInf = line
+        else:
+            curInf += '\n' + line
+
+    # The file has to end outside of an inference rule
+    if state is not None:
+        return None
+    return steps
+
+def loadInclude(filename, text):
+    '''
+    Gets the compiled steps of an included file, from its cache file if there is one or by compiling it
+
+    @param filename - The name of the included file
+    @param text - The text of the included file
+    @return - The result of compileInclude
+    '''
+    path = compiledIncludePath(text)
+    if path is not None:
+        try:
+            with open(path) as f:
+                return decodeSteps(json.load(f))
+        except Exception:
+            # There is no cache file or it is not a compiled include of this version, so it is made again
+            pass
+
+    steps = compileInclude(text)
+    if steps is None or path is None:
+        return steps
+
+    # Write to a temporary file first, so other parsers never read half of a cache file
+    try:
+        encoded = json.dumps(encodeSteps(steps))
+        if not os.path.isdir(includeCacheDir):
+            os.makedirs(includeCacheDir, 0700)
+        temp = '%s.%d.tmp' % (path, os.getpid())
+        with open(temp, 'w') as f:
+            f.write(encoded)
+        os.rename(temp, path)
+    except (IOError, OSError, ValueError, UnicodeError):
+        # The cache is only used to be faster, the compiled steps can still be used
+        pass
+
+    return steps
+
+# The kinds of sentences in a compiled include, the only classes loading one can make
+nodeKinds = {'Wff': sentence.Wff, 'Variable': sentence.Variable, 'Literal': sentence.Literal, 
+             'Sentence': sentence.Sentence, 'Operator': sentence.Operator}
+
+def encodeSteps(steps):
+    '''
+    Writes the result of compileInclude as JSON data, each sentence is the list of its parts from encodeSentence
+
+    e.g.
+    {"version": 3, "steps": [["include", "include\tF Rules.inf"], 
+                             ["inference", "And Elim Left", conclusion, [premise, ...]]]}
+
+    @param steps - The result of compileInclude
+    @return - The data, which decodeSteps makes the steps again from
+    @raise ValueError - If a step can not be written, e.g. an inference rule has new variables
+    '''
+    from lemma import Lemma
+
+    encoded = []
+    for kind, value in steps:
+        if kind == 'include':
+            encoded.append(['include', value])
+            continue
+
+        if value._newVars:
+            raise ValueError('%s has new variables' % value.name)
+        conclusion = value.getConclusion()[0]
+        encoded.append(['lemma' if isinstance(value, Lemma) else 'inference', value.name, 
+                        None if conclusion is None else encodeSentence(conclusion), 
+                        [encodeSentence(p) for p in value.getPremises()]])
+    return {'version': PARSER_VERSION, 'steps': encoded}
+
+def decodeSteps(data):
+    '''
+    Makes the result of compileInclude again from the data of encodeSteps, checking the data is well formed
+    so nothing but rules and include lines can be made from it
+
+    @param data - The loaded JSON data
+    @return - The compiled steps
+    @raise ValueError - If the data is not from encodeSteps of this version of the parsers
+    '''
+    from inference import Inference
+    from lemma import Lemma
+
+    if not isinstance(data, dict) or data.get('version') != PARSER_VERSION or not isinstance(data.get('steps'), list):
+        raise ValueError('Not a compiled include of parser version %d' % PARSER_VERSION)
+
+    steps = []
+    for step in data['steps']:
+        if isinstance(step, list) and len(step) == 2 and step[0] == 'include':
+            steps.append(('include', decodeString(step[1])))
+        elif isinstance(step, list) and len(step) == 4 and step[0] in ('inference', 'lemma') and isinstance(step[3], list):
+            name = decodeString(step[1])
+            conclusion = None if step[2] is None else decodeSentence(step[2])
+            premises = [decodeSentence(p) for p in step[3]]
+
+            inf = (Lemma if step[0] == 'lemma' else Inference)(name, conclusion, premises)
+            inf.compile()
+            steps.append(('inference', inf))
+        else:
+            raise ValueError('Not a compiled step: %r' % (step,))
+    return steps
+
+def encodeSentence(sen):
+    '''
+    Writes a sentence as JSON data, a list of its distinct parts each after its own parts, see 
+    sentence.flattenSentence
+
+    e.g.
+    and(@A,@B) -> [["Wff", "and", "", data], ["Wff", "A", "@", data], ["Wff", "B", "@", data], ["Sentence", [0, 1, 2], data]]
+
+    @param sen - The sentence
+    @return - The list of parts
+    '''
+    nodes = []
+    for node in sentence.flattenSentence(sen):
+        kind = node[0].__name__
+        if nodeKinds.get(kind) is not node[0]:
+            raise ValueError('Can not write a %s' % kind)
+
+        if len(node) == 4:
+            nodes.append([kind, node[1], node[2], encodeData(node[3])])
+        else:
+            nodes.append([kind, list(node[1]), encodeData(node[2])])
+    return nodes
+
+def decodeSentence(nodes):
+    '''
+    Makes a sentence again from the data of encodeSentence
+
+    @param nodes - The list of parts
+    @return - The shared sentence
+    @raise ValueError - If the parts are not well formed
+    '''
+    if not isinstance(nodes, list) or len(nodes) == 0:
+        raise ValueError('Not a sentence: %r' % (nodes,))
+
+    flat = []
+    for node in nodes:
+        if not isinstance(node, list) or len(node) == 0 or node[0] not in nodeKinds:
+            raise ValueError('Not a sentence part: %r' % (node,))
+        kind = nodeKinds[node[0]]
+
+        if issubclass(kind, sentence.Wff) and len(node) == 4:
+            flat.append((kind, decodeString(node[1]), decodeString(node[2]), decodeData(node[3])))
+        elif not issubclass(kind, sentence.Wff) and len(node) == 3 and isinstance(node[1], list) and len(node[1]) > 0:
+            # Each part has to be before the parts made from it
+            parts = node[1]
+            if any(type(i) is not int or not 0 <= i < len(flat) for i in parts):
+                raise ValueError('Not a sentence part: %r' % (node,))
+            flat.append((kind, tuple(parts), decodeData(node[2])))
+        else:
+            raise ValueError('Not a sentence part: %r' % (node,))
+
+    return sentence.rebuildSentence(flat)
+
+def encodeData(data):
+    '''
+    Writes the extra data of a sentence, its SymbolConfig, as JSON data
+
+    @return - None if there is no data, otherwise {"symbols": {...}} and "newVars": [sentence, ...] if it has new variables
+    '''
+    if len(data) == 0:
+        return None
+
+    symbols = dict((k, v) for k, v in data.items() if k != 'extra')
+    if not all(isinstance(v, str) for v in symbols.values()):
+        raise ValueError('Can not write the data %r' % (data,))
+
+    encoded = {'symbols': symbols}
+    if 'extra' in data:
+        if data['extra'].keys() != ['newVars']:
+            raise ValueError('Can not write the data %r' % (data,))
+        encoded['newVars'] = [encodeSentence(v) for v in data['extra']['newVars']]
+    return encoded
+
+def decodeData(data):
+    '''
+    Makes the extra data of a sentence again from the data of encodeData
+
+    @return - The shared SymbolConfig, or None if there is no data
+    '''
+    if data is None:
+        return None
+    if not isinstance(data, dict) or not isinstance(data.get('symbols'), dict) or \
+       any(k not in ('symbols', 'newVars') for k in data):
+        raise ValueError('Not sentence data: %r' % (data,))
+
+    config = dict((decodeString(k), decodeString(v)) for k, v in data['symbols'].items())
+    if 'newVars' in data:
+        if not isinstance(data['newVars'], list):
+            raise ValueError('Not sentence data: %r' % (data,))
+        config['extra'] = util.FrozenDict({'newVars': tuple([decodeSentence(v) for v in data['newVars']])})
+    return sharedSymbolConfig(config)
+
+def decodeString(value):
+    '''
+    Gets a str from a string of JSON data, which are loaded as unicode
+    '''
+    if not isinstance(value, basestring):
+        raise ValueError('Not a string: %r' % (value,))
+    return value.encode('utf-8')
 
 def defaultProofParser(string, sentenceParser = None, inferenceParser = None):
     '''
@@ -401,74 +825,137 @@ def defaultProofParser(string, sentenceParser = None, inferenceParser = None):
     @param inferenceParser - The parser to use to parse inferences.  Defaults to defaultInferenceParser
     @return - A dict of all the proofs parsed from the given input
     '''
-    import os
+    return dict(iterProofParser(string, sentenceParser, inferenceParser))
+
+def iterProofParser(string, sentenceParser = None, inferenceParser = None):
+    '''
+    Takes a string or file and parses it into proofs, one at a time as they are read
+
+    Files are read one line at a time, so each proof can be used while the rest of the file is still being read
+
+    @param string - The string to parse, file to use, or name of file to use
+    @param sentenceParser - The parser to use to parse sentences.  Defaults to prefixSentenceParser
+    @param inferenceParser - The parser to use to parse inferences.  Defaults to defaultInferenceParser
+    @return - A generator of (name, Proof) of each proof, as soon as its done line is read
+    '''
 
     # Path is used as the currnt working directory for imports
     path = os.path.dirname(os.path.realpath(__file__))
     filename = None	
 
+    # The lines of the input, read as they are needed
+    source = None
+
     # Try to open the string as if it was a file
+    opened = False
     try:
-        with open(string) as f:
-            path = os.path.dirname(os.path.realpath(string))
-            filename = os.path.join(path, string)
-            string = f.read()
-
-
+        source = open(string)
+        opened = True
+        path = os.path.dirname(os.path.realpath(string))
+        filename = os.path.join(path, string)
     except:
         # string is not a name of a file
         pass
 
-    # Try to read a file if it is a file
-    try:
-        string = string.read()
-        path = os.path.dirname(os.path.realpath(string.name))
-        filename = os.path.join(path, string.name)
+    if source is None:
+        if hasattr(string, 'read'):
+            # string is a file
+            source = string
+            if hasattr(string, 'name'):
+                path = os.path.dirname(os.path.realpath(string.name))
+                filename = os.path.join(path, string.name)
+        else:
+            source = string.split('\n')
 
-    except:
-        # string is not a file
-        pass
+    # Input without a file name, e.g. a string or StringIO, includes files relative to the current directory
+    inputName = filename
+    if inputName is None:
+        path = os.getcwd()
+        inputName = '<stream>' if hasattr(string, 'read') else '<string>'
 
     # Set the default parders
     if sentenceParser is None: sentenceParser = prefixSentenceParser
     if inferenceParser is None: inferenceParser = defaultInferenceParser
 
+    def compiledInferences(filename, text, imported):
+        '''
+        Gets the inference rules of a file of only inference rules and includes of such files, in the order 
+        they are defined, from the compiled files
+
+        @param imported - The files already included, the included files are added to it
+        @return - A list of the Inferences, or None if any of the files has anything else
+        '''
+        steps = loadInclude(filename, text)
+        if steps is None:
+            return None
+        imported.add(filename)
+
+        infs = []
+        for kind, value in steps:
+            if kind == 'inference':
+                infs.append(value)
+                continue
+
+            nested, keepLines = includeTarget(value, data, os.path.dirname(os.path.realpath(filename)))
+            if keepLines is not None:
+                return None
+            if nested in imported:
+                continue
+
+            try:
+                with open(nested) as f:
+                    nestedText = f.read()
+            except IOError:
+                # Let the error be found while parsing the text
+                return None
+
+            nestedInfs = compiledInferences(nested, nestedText, imported)
+            if nestedInfs is None:
+                return None
+            infs.extend(nestedInfs)
+        return infs
+
+    def includeCompiled(filename, text, data):
+        '''
+        Includes a file of only inference rules from its compiled form, without parsing its text again
+
+        @return - True if the file was included, False if its text has to be parsed
+        '''
+        # The compiled files are only made with the default parsers and settings, outside of anything else
+        if not includeCache or sentenceParser is not prefixSentenceParser or inferenceParser is not defaultInferenceParser:
+            return False
+        if data['state'] not in (None, '') or any(data[k] != v for k, v in includeData.items()):
+            return False
+
+        imported = set(data['imported'])
+        infs = compiledInferences(filename, text, imported)
+        if infs is None:
+            return False
+
+        # Add them the same way inf does
+        for inf in infs:
+            data['infs'][inf.name] = inf
+            data['ruleIndex'].add(inf)
+        data['imported'] = imported
+        return True
+
     def include(string, data):
-        toks = string.split(data['split'])
-        toks = filter(None, toks)
-    
-        keepLines = None
-        if len(toks) > 2:
-            keepLines = set([])
-            subToks = [s.strip() for s in toks[2].split(data['subSplit'])]
-            for num in subToks:
-                if data['range'] in num:
-                    start, end = [int(s.strip()) for s in num.split(data['range'])]
-                    for i in range(start, end + 1):
-                        keepLines.add(i)
-                else:
-                    keepLines.add(int(num))
-    
-        if len(toks) > 1:
-            # Get the filename to include
-            filename = os.path.normpath(os.path.expandvars(toks[1].strip()))
-        else:
-            filename = os.path.normpath(os.path.expandvars(string[len(data['include']):].strip()))
-    
-        # Check if it is a relative path, if it is get the absolute path
-        if not os.path.isabs(filename):
-            filename = os.path.join(data['path'], filename)
+        filename, keepLines = includeTarget(string, data, data['path'])
     
         # Check to see that we have not already included this file
         if filename not in data['imported'] or keepLines is not None:
             with open(filename) as f:
-                # Add all the new lines to the beginning of the queue
-                # e.g. q = [o1,o2,o3,o4] file = '1\n2\n3\n4\n5 -> [1,2,3,4,5,o1,o2,o3,o4]
-                lines = f.read().split('\n')
-                for n, line in enumerate(reversed(lines)):
-                    lineNum = len(lines) - n
-                    if keepLines is None or lineNum in keepLines:
-                        data['queue'].appendleft((line, lineNum, filename))
+                text = f.read()
+
+            # A file of only inference rules is added from its compiled form
+            if keepLines is None and includeCompiled(filename, text, data):
+                return
+
+            # The lines of the file are read before the rest of the lines
+            # e.g. [o1,o2,o3,o4] file = '1\n2\n3\n4\n5 -> [1,2,3,4,5,o1,o2,o3,o4]
+            lines = [(line, n + 1, filename) for n, line in enumerate(text.split('\n'))
+                     if keepLines is None or n + 1 in keepLines]
+            data['sources'].append(iter(lines))
     
             # Add as an included file
             data['imported'].add(filename)        
@@ -501,11 +988,15 @@ def defaultProofParser(string, sentenceParser = None, inferenceParser = None):
 
         # Check to see if we are done
         if string == data['infDone']:
-            # Use the data from the previous lines to parse the proof
-            inf = inferenceParser(data['curInf'], sentenceParser)
+            # Use the data from the previous lines to parse the proof, a lemma is parsed into a Lemma
+            if data['state'] == 'lemma':
+                inf = defaultLemmaParser(data['curInf'], sentenceParser)
+            else:
+                inf = inferenceParser(data['curInf'], sentenceParser)
 
             # Add it to the data
             data['infs'][inf.name] = inf
+            data['ruleIndex'].add(inf)
 
             # Reset 'curInf'
             data['curInf'] = None
@@ -535,6 +1026,9 @@ def defaultProofParser(string, sentenceParser = None, inferenceParser = None):
             # Set state to default
             data['state'] = None
 
+            # The proof is finished, so it can be used
+            data['finished'] = data['curProof']
+
             # Reset the current proof
             data['curProof'] = None
             return			
@@ -553,6 +1047,7 @@ def defaultProofParser(string, sentenceParser = None, inferenceParser = None):
 
             # Add it as an infrence rule too
             data['infs'][name] = data['proofs'][name]
+            data['ruleIndex'].add(data['proofs'][name])
 
             # Create a dict to store the lines
             data['curLines'] = {}
@@ -591,7 +1086,10 @@ def defaultProofParser(string, sentenceParser = None, inferenceParser = None):
         if len(toks) == 2:
             # If there are exactly two parts, then this line is an assumption
             curProof[-1] += data['infs']['Assumption']
-        if len(toks) >= 3:
+        if len(toks) >= 3 and toks[2] == data['autoJustify']:
+            # The rule is found when the proof is verified, from the rules defined so far
+            curProof.setRuleIndex(data['ruleIndex'])
+        elif len(toks) >= 3:
             # If there are at least 3 parts then the third part is the name of the inference rule to use
             try:
                 curProof[-1] += data['infs'][toks[2]]
@@ -608,52 +1106,71 @@ def defaultProofParser(string, sentenceParser = None, inferenceParser = None):
 
 
     # Finite state machine states
-    fsm = {None:init, '':init, 'inference':inf, 'proof':prf}
+    fsm = {None:init, '':init, 'inference':inf, 'lemma':inf, 'proof':prf}
 
-    from collections import deque
+    def readLines(source, filename):
+        # Reads the lines of the input as they are needed
+        for n, line in enumerate(source):
+            yield line.rstrip('\n'), n, filename
 
-    # Create a queue for all of the lines to process
-    # An element should be a 3-tuple of (string, line number, filename)
-    linequeue = deque()
+    # A stack of the sources of lines to process, the lines of an included file are processed first
+    # Each source is an iterator of 3-tuples of (string, line number, filename)
+    sources = [readLines(source, inputName)]
 
-    # Add all of the lines from the given input
-    for n, line in enumerate(string.split('\n')):
-        linequeue.append((line, n, filename))
+    # inference imports proof, so it has to be imported first
+    import inference
+    from proof import RuleIndex
 
     # Create the data, used to keep track of the state of the fsm
-    data = {'queue':linequeue, 'proofs':{}, 'infs':{'Assumption':defaultInferenceParser('Assumption\n@A')}, 
-            'state': None, 'include':'include', 'assign':'set', 'split':'\t', 'subSplit':',', 'path':path, 'imported':set([filename]), 'proofDone': 'done', 
-            'infDone': 'done', 'proofSplit': '\t', 'supportSplit': ',', 'comment': '#', 'range':'-'}
+    data = {'sources':sources, 'proofs':{}, 'infs':{'Assumption':defaultInferenceParser('Assumption\n@A')}, 
+            'state': None, 'include':'include', 'assign':'set', 'split':'\t', 'subSplit':',', 'path':path, 'imported':set([inputName]), 'proofDone': 'done', 
+            'infDone': 'done', 'proofSplit': '\t', 'supportSplit': ',', 'comment': '#', 'range':'-', 'autoJustify': '???',
+            'ruleIndex': RuleIndex(), 'finished': None}
 
     from sentence import InvalidSentenceError
 
-    while len(data['queue']) > 0:
-        # Grab the next line off of the queue
-        line, n, filename = data['queue'].popleft()
+    try:
+        while len(data['sources']) > 0:
+            # Grab the next line
+            try:
+                line, n, filename = next(data['sources'][-1])
+            except StopIteration:
+                # Go back to the lines that included this source
+                data['sources'].pop()
+                continue
 
-        # Retrieve the current path
-        data['path'] = os.path.dirname(os.path.realpath(filename))
+            # Retrieve the current path, the input may not be a file
+            data['path'] = path if filename == inputName else os.path.dirname(os.path.realpath(filename))
 
-        try:
-            # Ignore everything after the comment symbol for commenting
-            line = line.split(data['comment'])[0].strip()
-
-            # Ignore the line if it is blank
-            if len(line) != 0:
-                # Check to see if this is an 'include' statement
-                if line.startswith(data['include']):
-                    include(line, data)
-                else:
-                    # Run the function corrosponding to the state of the FSM
-                    fsm[data['state']](line, data)
-
-        except (sentence.InvalidSentenceError, LineError) as e:
-            # Raise an error to tell the user that there is a parsing error
-            e.message = 'Error in "%s", line %d:\t%s' % (filename, n+1, e.message)
-            raise LineError(e.message)
-
-    # Return all the proofs parsed
-    return data['proofs']
+            try:
+                # Ignore everything after the comment symbol for commenting
+                line = line.split(data['comment'])[0].strip()
+
+                # Ignore the line if it is blank
+                if len(line) != 0:
+                    # Check to see if this is an 'include' statement
+                    if line.startswith(data['include']):
+                        include(line, data)
+                    else:
+                        # Run the function corrosponding to the state of the FSM
+                        fsm[data['state']](line, data)
+
+            except (sentence.InvalidSentenceError, LineError) as e:
+                # Raise an error to tell the user that there is a parsing error
+                e.message = 'Error in "%s", line %d:\t%s' % (filename, n+1, e.message)
+                raise LineError(e.message)
+
+            # Give each proof as soon as it is finished
+            if data['finished'] is not None:
+                name, data['finished'] = data['finished'], None
+                yield name, data['proofs'][name]
+
+        # A proof without a done line is finished by the end of the input
+        if data.get('curProof') is not None:
+            yield data['curProof'], data['proofs'][data['curProof']]
+    finally:
+        if opened:
+            source.close()
 
 class LineError(Exception):
     '''
@@ -755,3 +1272,14 @@ if __name__ == '__main__':
     sen10 = prefixSentenceParser('@P[s(@x)]')
     
     print sen10
+
+    # A file without a name includes files relative to the current directory
+    import StringIO
+    examples = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'Examples')
+    stream = StringIO.StringIO('include\t%s\n\nproof\nAnd\n1\tand(A,B)\tAssumption\n2\tA\tAnd Elim Left\t1\ndone\n\n'
+                               'proof\nOr\n1\tA\tAssumption\n2\tor(A,B)\tOr Intro Left\t1\ndone\n' % 
+                               os.path.join(examples, 'Rules', 'F Rules.inf'))
+    streamProofs = defaultProofParser(stream)
+
+    print formatStr % (sorted(streamProofs), "['And', 'Or']")
+    print formatStr % ([streamProofs[name].verify() for name in sorted(streamProofs)], '[True, True]')
@@ -97,3 +97,12 @@ def defaultInferencePrinter(inf):
 
     # Add 'done' to the last line
     return res + 'done'
+
+def defaultLemmaPrinter(lem):
+    '''
+    A printer that prints a lemma the same way as an inference, starting with the word 'lemma'
+
+    @param lem - The lemma to print
+    @return - The string reprentation of the lemma
+    '''
+    return 'lemma' + defaultInferencePrinter(lem)[len('inference'):]
@@ -7,44 +7,68 @@ def prefixSentencePrinter(sen, symbols = None):
     @return - The prefix representation of this string
     '''	
 
-    if symbols is None:
-        symbols = {}
+    # The pieces of the string, joined once at the end
+    pieces = []
+
+    # An explicit stack of what is left to print, so very deep sentences do not reach the recursion limit
+    # Each item is a sentence and the symbols to print it with, or a string and None
+    stack = [(sen, _printSymbols(symbols))]
+
+    while stack:
+        item, itemSymbols = stack.pop()
+
+        # Seperators and parens are added as they are
+        if itemSymbols is None:
+            pieces.append(item)
+            continue
+
+        try:
+            op = item.op()
+            args = item.args()
+        except AttributeError:
+            pieces.append(str(item))
+            continue
+
+        # The operator of an atom is itsself, so just print it
+        if op is item:
+            pieces.append(str(item))
+            continue
+
+        # A sentence used as an operator is printed with its own symbols, as str would
+        try:
+            opItem = (op, _printSymbols(op.extraData)) if op.op() is not op else (str(op), None)
+        except AttributeError:
+            opItem = (str(op), None)
 
-    if 'seperator' not in symbols:
-        symbols['seperator'] = ','
-
-    if 'openParen' not in symbols:
-        symbols['openParen'] = '('
-
-    if 'closeParen' not in symbols:
-        symbols['closeParen'] = ')'    
-
-    try:
         # If the arity is 0, then just print the operator
-        if sen.arity() == 0:
-            return str(sen.op())
-
-        # Otherwise, print the operator
-        string = str(sen.op())
-
-        # Followed by an open paren
-        string += symbols['openParen']
-        first = True
-
-        # Then by its arguments
-        for arg in sen.args():
-            string += prefixSentencePrinter(arg) + symbols['seperator']
-
-        # Remove the extra comma
-        string = string[:-1]
-
-        # Followed by a close paren
-        string += symbols['closeParen']
-
-        return string
-
-    except AttributeError:
-        return str(sen)
+        if len(args) == 0:
+            stack.append(opItem)
+            continue
+
+        # Otherwise print the operator, an open paren, the arguments seperated and a close paren
+        # The arguments are printed with the default symbols
+        stack.append((itemSymbols['closeParen'], None))
+        for n in range(len(args) - 1, -1, -1):
+            stack.append((args[n], _defaultSymbols))
+            if n > 0:
+                stack.append((itemSymbols['seperator'], None))
+        stack.append((itemSymbols['openParen'], None))
+        stack.append(opItem)
+
+    return ''.join(pieces)
+
+# The symbols used when none are given
+_defaultSymbols = {'seperator': ',', 'openParen': '(', 'closeParen': ')'}
+
+def _printSymbols(symbols):
+    '''
+    Start with the default symbols, and use any given ones instead.  symbols may be shared so it is not changed
+    '''
+    if not symbols:
+        return _defaultSymbols
+    defaults = dict(_defaultSymbols)
+    defaults.update(symbols)
+    return defaults
 
 def infixSentencePrinter(sen):
     '''
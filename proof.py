@@ -1,10 +1,9 @@
-from collections import deque
-
 import inference
 import sentence2 as sentence
 import line
 import util
 import printers
+import matcher
 
 class Proof:
     '''
@@ -45,17 +44,50 @@ class Proof:
             # Use the default numbering scheme
             self._numbering = lambda x: x
 
+        # The RuleIndex that lines without an inference rule are justified with, and how many of its rules can be used
+        self._ruleIndex = None
+        self._ruleIndexSize = 0
+
+        # The number of backtracks of the last makeMapping
+        self._backtracks = 0
+
+        # The number of times the proof has changed, and the (key, first invalid line) of the last verify
+        # The key is the versions of this proof and the proofs it uses as rules, see verificationKey
+        self._version = 0
+        self._verified = None
+
+        # The proofs used as inference rules by the last verify
+        self._dependencies = []
+
+        # The number of processes that check the lines at the same time, see setProcesses
+        self._processes = 1
+
     def name(self):
         '''
         Gets the name of the proof as a string
         '''
         return self.name
 
+    def changed(self):
+        '''
+        Marks the proof as changed, so it is verified again the next time verify is called
+        '''
+        self._version += 1
+
+    def getVersion(self):
+        '''
+        Gets the version of the proof, it goes up every time a line of the proof is changed, added or removed
+
+        @return - The version number
+        '''
+        return self._version
+
     def addLine(self):
         '''
         Add an empty line to the end of the proof
         '''
         self._lines.append(line.Line(self))
+        self.changed()
 
     def addLines(self, amount = 1):
         '''
@@ -68,20 +100,25 @@ class Proof:
         '''
         Inserts an empty line before the **index** line of the proof
         '''
-        self._lines.insert(index, None)
+        self._lines.insert(index, line.Line(self))
+        self.changed()
 
     def insertLines(self, index = -1, amount = 1):
         '''
         Adds an **amount** of empty lines before **index**
         '''
         for i in range(amount):
-            self._lines.insert(index + i, None)
+            self._lines.insert(index + i, line.Line(self))
+        self.changed()
 
     def removeLine(self, index = -1):
         '''
         Deletes the line at **index** from the prooff
         '''
+        # The lines that cite it are no longer valid
+        self._lines[index].recheck()
         del self._lines[index]
+        self.changed()
 
     def removeLines(self, index = -1, amount = 1):
         '''
@@ -107,27 +144,27 @@ class Proof:
     # def removeSentence
     # def removeSentences
 
-    def setInference(inf, index = -1):
+    def setInference(self, inf, index = -1):
         '''
         Set the inference rule for the line at **index**
 
         @param inf - The inference rule to add
         @param index - The line number to set the infrence of
         '''
-        self._lines += inf
+        self._lines[index] += inf
 
     # TODO:
     # def addInference
     # def getInference
     # def removeInference
 
-    def addSupport(ref, index = -1):
+    def addSupport(self, ref, index = -1):
         '''
         Adds a support to the line at **index**
 
         @param ref - Either a line number or a line object
         '''
-        self._lines += inf
+        self._lines[index] += ref
 
     # TODO:
     # def addReference
@@ -138,64 +175,248 @@ class Proof:
         '''
         Verifies that the current proof is valid, i.e. each line validly follows from the previous lines
 
+        The result is remembered until this proof or a proof it uses as an inference rule changes, so a 
+        proof used as a rule many times is only verified once
+
         @return - True if the proof is valid, otherwise the line number of the first invalid line
         '''
+        if not self.isVerified():
+            self.remember(self.verifyLines())
 
-        # Assume there are no errors
-        err_line = None
+        err_line = self._verified[1]
 
-        # Go through each line and check that it is valid
-        for line_num, line in enumerate(self._lines):			
+        # If there are no errors, return True
+        if err_line is None:
+            return True
+
+        # Return err_line, so the user can debug
+        return self._numbering(err_line)
+
+    def isVerified(self):
+        '''
+        Checks if the result of the last verify can still be used
+
+        @return - True if neither this proof nor a proof it used as an inference rule changed since then
+        '''
+        return self._verified is not None and self._verified[0] == self.verificationKey()
+
+    def remember(self, err_line):
+        '''
+        Remembers the result of verifyLines as the result of verify
+
+        @param err_line - None if the proof is valid, otherwise the index of the first invalid line
+        '''
+        # Only proofs can change, inference rules are never changed once they are made
+        # A line without an inference rule depends on every proof that could justify it, not only the one
+        # found, since a proof that did not work before may work after it changes
+        self._dependencies = self.getProofs()
+        self._verified = (self.verificationKey(), err_line)
+
+    def getProofs(self):
+        '''
+        Gets the proofs this proof could use as an inference rule, i.e. the proofs used by its lines 
+        and, if a line has no inference rule, every proof in its rule index it can use
+
+        @return - A list of the proofs in the order they are first used
+        '''
+        proofs = []
+        for l in self._lines:
+            inf = l.getInference()
+            if inf is None and l.getSentence() is not None and self._ruleIndex is not None:
+                proofs.extend(self._ruleIndex.getProofs(self._ruleIndexSize))
+            elif inf is not None and not isinstance(inf, inference.Inference):
+                proofs.append(inf)
+
+        found = []
+        for p in proofs:
+            if p is not self and not any(p is f for f in found):
+                found.append(p)
+        return found
+
+    def verificationKey(self):
+        '''
+        Gets the versions of this proof and every proof it could use as an inference rule the last time it was verified
+
+        @return - A tuple that changes when any of those proofs change
+        '''
+        return (self._version,) + tuple([p.verificationKey() for p in self._dependencies])
+
+    def verifyLines(self, allErrors = False):
+        '''
+        Verifies each line of the proof without using the remembered result of the proof
 
-            # inf is the inference rule used
+        A line is only checked again if it, a line it cites or the proof it uses as an inference rule 
+        changed since it was last checked, so after an edit only the lines it affects are checked
+
+        @param allErrors - If True every line is checked, otherwise the lines after the first invalid line are not
+        @return - None if the proof is valid, otherwise the index of the first invalid line
+                  If allErrors is True, a list of the indexes of every invalid line
+        '''
+        # The index of each line, a line can only cite the lines before it
+        positions = dict((id(l), n) for n, l in enumerate(self._lines))
+
+        # The proofs in the rule index a line without an inference rule can be justified with, found once
+        justifyProofs = []
+
+        def checkKey(line):
+            # The versions of the proofs the result of line depends on, the line is checked again when they change
             inf = line.getInference()
+            if inf is None:
+                if self._ruleIndex is None:
+                    return None
+                if not justifyProofs:
+                    justifyProofs.append(self._ruleIndex.getProofs(self._ruleIndexSize))
+                return tuple([p.verificationKey() for p in justifyProofs[0]])
+            if isinstance(inf, inference.Inference):
+                return None
+            return inf.verificationKey()
+
+        # Check the lines in other processes first, each line only depends on the lines before it and not on 
+        # if they are valid.  The results are used in order below, so the same rules are found as checking 
+        # them one at a time
+        checked = {}
+        if self._processes > 1:
+            stale = [n for n, l in enumerate(self._lines) if l._valid is None or l._validKey != checkKey(l)]
+            if len(stale) > 1:
+                import verifier
+                checked = verifier.checkLines(self, stale, positions, self._processes)
+
+        # Assume there are no errors
+        errors = []
 
-            # sen is the sentence at this line
-            sen = line.getSentence()
-
-            # if there is no rule, then this line is not valid, unless the sentence is also None (this is to allow empty lines)
-            if inf is None and sen is not None:
-                err_line = line_num
-                break
-
-            # sup is the set of support steps
-            sup = line.getSuppprt()
-
-            # Check each reference (which is a weakref to a line)
-            for ref in sup:
-                try:
-                    if ref()._num is None:
-                        # This implies that ref refers to a line later in the proof (or itself), not an earlier one
-                        err_line = line_num
-                        break
-                except ReferenceError:
-                    # This implies that the line no longer exists 
-                    err_line = line_num
+        # Go through each line and check that it is valid
+        for line_num, line in enumerate(self._lines):
+            if line._valid is None or line._validKey != checkKey(line):
+                if line_num in checked:
+                    valid, rule = checked[line_num]
+
+                    # The rule found in the other process for a line without one
+                    line._justifiedBy = None if rule is None else self._ruleIndex.getRule(rule)
+                    line._valid = valid
+                else:
+                    line._valid = self.checkLine(line, line_num, positions)
+
+                # The versions of the proofs the line was checked with
+                line._validKey = checkKey(line)
+
+            if not line._valid:
+                errors.append(line_num)
+                if not allErrors:
                     break
 
-            # This is used to check if there was an error in the previous for loop
-            if err_line is not None:
-                break
+        # Number the lines if the proof is valid, otherwise set all the line numbers to None
+        for line_num, line in enumerate(self._lines):
+            line._num = line_num if len(errors) == 0 else None
 
-            # Check that the sentence is a valid conclusion of the support steps using thie given inference rule
-            if not inf.isValid(sen, sup):
-                err_line = line_num
-                break
+        if allErrors:
+            return errors
 
-            # Assign this line a line number since it is valid
-            line._num = line_num
+        # If there are no errors, return None
+        if len(errors) == 0:
+            return None
+        return errors[0]
 
+    def getErrors(self):
+        '''
+        Verifies every line of the proof, instead of stopping at the first invalid line
 
-        # If there are no errors, return True
-        if err_line is None:		
+        @return - A list of the line numbers of every invalid line, empty if the proof is valid
+        '''
+        errors = self.verifyLines(True)
+        self.remember(errors[0] if len(errors) > 0 else None)
+        return [self._numbering(n) for n in errors]
+
+    def setProcesses(self, processes):
+        '''
+        Sets the number of processes that check the lines of this proof at the same time when it is verified
+
+        Starting the processes takes time, so it is only faster for proofs with lines that are slow to check
+
+        @param processes - The number of processes, 1 checks the lines one at a time
+        '''
+        self._processes = processes
+
+    def checkLine(self, line, line_num, positions):
+        '''
+        Checks that a line validly follows from the lines it cites, for a line without an inference rule
+        the first rule in the rule index that works is kept in the line's _justifiedBy
+
+        @param line - The line to check
+        @param line_num - The index of the line
+        @param positions - A dict of the id of each line of the proof to its index
+        @return - True if the line is valid
+        '''
+        # inf is the inference rule used
+        inf = line.getInference()
+
+        # sen is the sentence at this line
+        sen = line.getSentence()
+
+        # if there is no rule, then this line is not valid, unless the sentence is also None (this is to allow empty lines)
+        # or a rule can be found for it in the rule index
+        if inf is None and sen is not None and self._ruleIndex is None:
+            return False
+
+        # sup is the set of support steps
+        sup = line.getSuppprt()
+
+        # Check each reference (which is a weakref to a line)
+        for ref in sup:
+            refLine = ref()
+            if refLine is None:
+                # This implies that the line no longer exists 
+                return False
+
+            position = positions.get(id(refLine))
+            if position is None and refLine._num is None or position is not None and position >= line_num:
+                # This implies that ref refers to a line later in the proof (or itself), not an earlier one
+                return False
+
+        # An empty line is valid
+        if inf is None and sen is None:
             return True
 
-        # Since this is an invalid proof, first set all the line numbers to None
-        for line in self._lines:
-            line._num = None
+        if inf is None:
+            # Find a rule for this line, the line keeps no rule so it is found again when the line changes
+            line._justifiedBy = self.justify(sen, sup)
 
-        # Then return err_line, so the user can debug
-        return self._numbering(err_line)
+            # justify already checked that the line is valid
+            return line._justifiedBy is not None
+
+        # Check that the sentence is a valid conclusion of the support steps using thie given inference rule
+        return inf.isValid(sen, sup)
+
+    def setRuleIndex(self, index):
+        '''
+        Sets the rules used to justify lines without an inference rule (???)
+
+        Only the rules in the index now can be used, so a proof cannot be justified by itsself or a later proof
+
+        @param index - A RuleIndex
+        '''
+        self._ruleIndex = index
+        self._ruleIndexSize = len(index)
+
+        # The lines without a rule may be justified with other rules now
+        for l in self._lines:
+            l.recheck()
+        self.changed()
+
+    def justify(self, sen, ref):
+        '''
+        Finds an inference rule or proof in the rule index that sen validly follows from
+
+        @param sen - The sentence to justify
+        @param ref - A set of weak refs to the reference lines
+        @return - The first rule that works, or None if there is none
+        '''
+        if self._ruleIndex is None:
+            return None
+
+        for rule in self._ruleIndex.candidates(sen, self._ruleIndexSize):
+            if rule is not self and rule.isValid(sen, ref):
+                return rule
+        return None
 
     def isValid(self, sen, ref, newVars = None):
         '''
@@ -224,11 +445,14 @@ class Proof:
         for prem in premises:
             genPrem.add(prem.generalize())
 
+        # Try the most selective premises first, in the same order every time
+        genPrem = matcher.orderPremises(genPrem)
+
         # TODO: Use other symbols for subproof
         if sen.op() == '|-':
             # Add the subproof assumption to the reference list
             if str(sen.args()[0]) != '':
-                assumption = line.Line(self)
+                assumption = line.Line(self, False)
                 assumption.setSentence(sen.args()[0])
                 refLines.append(assumption)
 
@@ -243,6 +467,11 @@ class Proof:
                         #if var in s:
                             #return False	
 
+        # Index the references once for every line that is tried as the conclusion, the premises map into
+        # the references the same way whichever line it is, so their mappings are only found once too
+        refLines = matcher.ReferenceIndex(refLines)
+        options = self.premiseOptions(genPrem, refLines)
+
         prevSens = []
         metaSen = None
         for s in self:
@@ -250,24 +479,29 @@ class Proof:
             curSen = s.getSentence().generalize()
 
             # Check if the current sentence can map into the conclusion
-            for conclusionMap in curSen.mapInto(sen):
+            for conclusionMap in curSen.iterMappings(sen):
                 # Try to map the assumptions to the refSenList
-                mapping = self.makeMapping(conclusionMap, genPrem, refLines)
+                mapping = self.makeMapping(conclusionMap, genPrem, refLines, options = options)
                 if len(mapping) > 0:
                     # If there is a mapping then we are done
                     return True
         return False
 
-    def makeMapping(self, conclusionMap, premises, references, exact = True):
+    def makeMapping(self, conclusionMap, premises, references, exact = True, options = None):
         '''
         Try to map all of the premises into the references in any combination while being constrained by the current conclusionMap
 
         @param conclusionMap - The current mapping of variables into references
-        @param premises - A list of premises
-        @param references - A list of references (lines) to be mapped into
+        @param premises - A list of premises, mapped in that order
+        @param references - A list or matcher.ReferenceIndex of references (lines) to be mapped into
+        @param options - The premiseOptions of premises and references, so mappings found for another 
+                         conclusionMap are not found again.  Defaults to new ones
 
         @return - A map of subsitutions of variables in premises that will make premises match all the references
         '''
+        # The number of times the search had to go back, see getBacktracks
+        self._backtracks = 0
+
         # If there are no premises, there is nothing else to map
         if premises is None or len(premises) == 0:
             return conclusionMap
@@ -276,60 +510,110 @@ class Proof:
         if (exact and len(premises) != len(references)):
             return {}
 
-        # Add all the premises to the queue
-        premiseQueue = deque(premises)
+        if options is None:
+            options = self.premiseOptions(premises, references)
 
         # Call the makeMappingHelper that will recursively find a mapping
-        return self.makeMappingHelper(conclusionMap, premiseQueue, references)	
-
+        # The mapping is kept in one set of bindings that is undone on backtrack instead of being copied
+        bindings = util.Bindings(conclusionMap)
+        if self.makeMappingHelper(bindings, options):
+            return bindings.toDict()
+        return {}
 
-    def makeMappingHelper(self, conclusionMap, premiseQueue, references):
+    def premiseOptions(self, premises, references):
         '''
-        Try to map all of the premises into the references in any combination while being constrained by the current conclusionMap
-        @param conclusionMap - The current mapping of variables into references
-        @param premiseQueue - A queue of the premises
-        @param references - A list of references (lines) to be mapped into
-        @return - A map of subsitutions of variables in premises that will make premises match all the references
-        '''	
+        Gets the mappings of each premise into the references for makeMapping
 
-        try:
-            # Get the first premise
-            curPrem = premiseQueue.pop()
-        except IndexError:
-            # Base case, the queue is empty
-            return conclusionMap
+        Nothing is mapped until makeMapping needs it, and each mapping is kept once it is found, so the 
+        same options can be used for every conclusionMap of the same premises and references
 
-        for curLine in references:
-            
-            # Try find a mapping of curPrem into curLine
-            for mapping in curPrem.mapInto(curLine.getSentence(), False):
+        @param premises - A list of premises
+        @param references - A list or matcher.ReferenceIndex of references (lines) to be mapped into
+        @return - A list of a util.LazyList of the mappings of each premise, see iterPremiseMappings
+        '''
+        # Index the references by their main operator so each premise only tries the lines it could match
+        if not isinstance(references, matcher.ReferenceIndex):
+            references = matcher.ReferenceIndex(references)
+        return [util.LazyList(self.iterPremiseMappings(p, references)) for p in premises]
 
-                if 'extra' in curPrem.extraData and 'newVars' in curPrem.extraData['extra']:
-                    newVars = curPrem.extraData['extra']['newVars']
-                    if not curLine.isNew([mapping[v] for v in newVars]):
-                        continue                
+    def iterPremiseMappings(self, premise, references):
+        '''
+        Finds each mapping of a premise into any of the references, one at a time as they are needed
 
-                # try to merge this mapping into conclusionMap
-                merge = util.mapMerge(conclusionMap, mapping)
-    
-                if len(merge) == 0:
-                    continue
-                
-                # If the merge is successful recursively call makeMappingHelper for the merged map, and the remainder of the premiseQueue
-                remainder = self.makeMappingHelper(merge, premiseQueue, references)
-    
-                if len(remainder) == 0:
+        @param premise - A sentence or a matcher.Matcher
+        @param references - A matcher.ReferenceIndex of references (lines) to be mapped into
+        @return - A generator of the mappings, in the order of the references
+        '''
+        newVars = None
+        if 'extra' in premise.extraData and 'newVars' in premise.extraData['extra']:
+            newVars = premise.extraData['extra']['newVars']
+
+        # Only the lines with the same main operator and arity as premise can match it
+        for curLine in references.candidates(premise):
+            for mapping in premise.iterMappings(curLine.getSentence(), False):
+                if newVars is not None and not curLine.isNew([mapping[v] for v in newVars]):
                     continue
-                
-                # If we can map the remaining premises, this is a valid mapping, return it
-                return remainder
+                yield mapping
+
+    def premiseMappings(self, premise, references):
+        '''
+        Gets every mapping of a premise into any of the references
+
+        @param premise - A sentence or a matcher.Matcher
+        @param references - A matcher.ReferenceIndex of references (lines) to be mapped into
+        @return - A list of the mappings, in the order of the references
+        '''
+        return list(self.iterPremiseMappings(premise, references))
+
+    def makeMappingHelper(self, bindings, options):
+        '''
+        Try to map all of the premises into the references in any combination while being constrained by the current bindings
 
-        # If we get here then curPrem can't map inro any of the references  
-        # Put the curPrem back into the queue in case we are still in the recursion
-        premiseQueue.append(curPrem)
+        The premises are mapped in order, and if any premise has no mapping left that agrees with the 
+        bindings this branch is given up before mapping anything else.  Only as many mappings of each
+        premise are found as it takes to find one that agrees.
+
+        @param bindings - The current util.Bindings of variables into references, on success they hold the whole mapping
+        @param options - A list with the mappings of each premise that is left, see premiseOptions
+        @return - True if there is a mapping of the premises that will make premises match all the references
+        '''
+
+        # Base case, every premise is mapped
+        if len(options) == 0:
+            return True
+
+        # Stop if a premise can't be mapped any more, since then neither can the rest
+        for mappings in options:
+            if not any(bindings.compatible(m) for m in mappings):
+                self._backtracks += 1
+                return False
+
+        rest = options[1:]
+        for mapping in options[0]:
+            # Merge this mapping into the bindings, skipping it if it does not agree with them
+            mark = bindings.mark()
+            if not bindings.merge(mapping):
+                continue
+
+            # Recursively call makeMappingHelper for the remaining premises
+            if self.makeMappingHelper(bindings, rest):
+                # If we can map the remaining premises, this is a valid mapping
+                return True
+
+            # Otherwise undo the merge and try the next mapping
+            bindings.undo(mark)
+            self._backtracks += 1
 
         # There is no valid mapping
-        return {}	
+        return False
+
+    def getBacktracks(self):
+        '''
+        Gets the number of times the last makeMapping went back to try another mapping of a premise
+
+        @return - The number of backtracks
+        '''
+        return self._backtracks
 
     def __len__(self):
         '''
@@ -348,7 +632,18 @@ class Proof:
         '''
         Sets the specified line of the proof
         '''		
+        # The lines that cite the old lines or the new lines are checked again
+        if isinstance(key, slice):
+            lines = self._lines[key] + list(value)
+        elif self._lines[key] is not value:
+            lines = [self._lines[key], value]
+        else:
+            # The line was changed in place (e.g. with +=), which already marked it
+            lines = []
+        for l in lines:
+            l.recheck()
         self._lines[key] = value
+        self.changed()
 
     def __iter__(self):
         '''
@@ -414,7 +709,7 @@ class Proof:
         # Check if s is an assumption
         prems = set([])
         for l in self._lines:
-            inf = l.getInference()
+            inf = l.getJustification()
             # An inference rule is an assumption iff it has no premises, has exactly one conclusion,
             # and its conclusion can be mapped into a variable
             #
@@ -442,6 +737,135 @@ class Proof:
         '''
         return self._inferences
 
+class RuleIndex:
+    '''
+    An index of inference rules and proofs, so a sentence is only checked with the rules whose 
+    conclusion could match it
+
+    Inference rules are indexed by their conclusion and proofs by each of their lines, since any line 
+    of a proof can be used as its conclusion.  Rules are only added, so a proof can use the rules 
+    that were added before it with Proof.setRuleIndex
+    '''
+
+    def __init__(self, rules = None):
+        '''
+        @param rules - An iterable of the first rules to add
+        '''
+        # The inference rules by their conclusion
+        self._conclusions = matcher.DiscriminationTree()
+
+        # The proofs by each of their lines
+        self._lines = matcher.DiscriminationTree()
+
+        # Every rule in the order they were added, and the order of each rule by its id
+        self._rules = []
+        self._order = {}
+
+        # The rules that can be used to justify a sentence
+        self._usable = []
+
+        # The proofs that have not been indexed yet, their lines may not be added until later
+        self._pending = []
+
+        if rules is not None:
+            for rule in rules:
+                self.add(rule)
+
+    def __len__(self):
+        return len(self._rules)
+
+    def __contains__(self, rule):
+        return id(rule) in self._order
+
+    def add(self, rule):
+        '''
+        Adds an inference rule or proof
+        '''
+        if rule in self:
+            return
+        self._order[id(rule)] = len(self._rules)
+        self._rules.append(rule)
+
+        if not isinstance(rule, inference.Inference):
+            self._pending.append(rule)
+            self._usable.append(rule)
+            return
+
+        conclusion = rule._conclusion
+
+        # Rules that would justify any sentence, such as assumptions, are not used
+        if conclusion is None or (len(rule.getPremises()) == 0 and isinstance(conclusion, sentence.Wff) 
+                                  and not isinstance(conclusion, sentence.Literal)):
+            return
+
+        self._conclusions.add(conclusion, rule)
+        self._usable.append(rule)
+
+    def getRules(self):
+        '''
+        Gets the rules that can be used to justify a sentence, i.e. every rule that candidates could return
+
+        @return - A list of the rules in the order they were added
+        '''
+        return list(self._usable)
+
+    def getProofs(self, size = None):
+        '''
+        Gets the proofs that can be used to justify a sentence
+
+        @param size - Only proofs from the first size rules added are used
+        @return - A list of the proofs in the order they were added
+        '''
+        return [rule for rule in self._usable if not isinstance(rule, inference.Inference) and 
+                (size is None or self._order[id(rule)] < size)]
+
+    def position(self, rule):
+        '''
+        Gets the order a rule was added in, the same rule is at the same position of every copy of the index
+
+        @return - The position, see getRule
+        '''
+        return self._order[id(rule)]
+
+    def getRule(self, position):
+        '''
+        Gets the rule added at a position
+
+        @return - The rule
+        '''
+        return self._rules[position]
+
+    def candidates(self, sen, size = None):
+        '''
+        Gets the rules that sen could validly follow from
+
+        @param sen - The sentence to justify
+        @param size - Only rules from the first size rules added are used
+        @return - A list of the rules in the order they were added
+        '''
+        # Index the lines of proofs now that they have been added
+        for rule in self._pending:
+            for l in rule:
+                if l.getSentence() is not None:
+                    self._lines.add(l.getSentence().generalize(), rule)
+        self._pending = []
+
+        rules = self._conclusions.candidates(sen)
+
+        # A proof used on a subproof proves its second part
+        if sen.op() == '|-' and sen.arity() == 2:
+            rules += self._lines.candidates(sen.args()[1])
+        else:
+            rules += self._lines.candidates(sen)
+
+        # Remove the repeated rules and put them in order
+        found = {}
+        for rule in rules:
+            order = self._order[id(rule)]
+            if size is None or order < size:
+                found[order] = rule
+        return [found[order] for order in sorted(found)]
+
 
 if __name__ == '__main__':
     # This area used for debugging
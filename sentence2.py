@@ -1,15 +1,21 @@
 import copy
+import weakref
 
 import util
 from collections import deque
 import printers2 as printers
 
-class Sentence:
+class Sentence(object):
     '''
     A finite sequence of symbols from a given alphabet that is part of a formal language
 
     Contains an operator and some number of arguments
     '''
+
+    # Sentences are immutable and there can be thousands of them, so they do not have a __dict__
+    # __weakref__ lets the SentenceFactory forget sentences that are no longer used
+    __slots__ = ('_data', '_id', '_hash', '_length', '_depth', '_signature', '_terms', 'extraData', '__weakref__')
+
     def __init__(self, op, args, data = None):
         '''
         @param op - The main operator of the sentence
@@ -19,14 +25,19 @@ class Sentence:
         # _data is a list starting with the operator followed by the arguments
         self._data = tuple([op] + list(args))
 
-        # Used to cache the length
-        self._length = None
+        # The integer id of this structure, structurally equal sentences share the same id
+        self._id = sf.nodeId(self)
+
+        # The hash, length, depth and signature are computed from the arguments once
+        self._hash, self._length, self._depth, self._signature = sf.measure(self)
+
+        # Used to cache the terms
         self._terms = None
 
-        # Used to store extra information
+        # Used to store extra information, sentences without any share the same empty data
         self.extraData = data
         if self.extraData is None:
-            self.extraData = {}
+            self.extraData = util.emptyData
 
     def __lt__(self, other):
         '''
@@ -54,16 +65,19 @@ class Sentence:
     def __eq__(self, other):
         '''
         Two sentences are equal iff their operators and all the arguments are
-        equal
+        equal, i.e. they have the same id
         '''
-        return self._data == other._data
+        try:
+            return self._id == other._id
+        except AttributeError:
+            return False
 
     def __ne__(self, other):
         '''
         Two sentences are not equal iff either their operators are not equal 
         or their arguments are not equal
         '''
-        return self._data != other._data
+        return not self == other
 
     def __gt__(self, other):  
         '''
@@ -85,19 +99,12 @@ class Sentence:
         return printers.prefixSentencePrinter(self, self.extraData)
 
     def __hash__(self):
-        return hash(self._data) * hash(type(self))
+        return self._hash
 
     def __len__(self):
         '''
         The length of a sentence is one more than the sum of it's arguments
         '''
-        if self._length is None:
-            # Calculate the length
-            self._length = 1
-            for s in self._data[1:]:
-                # recursively add the length of its arguments
-                self._length += len(s)
-
         return self._length
 
     def __getitem__(self, key):
@@ -107,10 +114,16 @@ class Sentence:
         return SentenceIterator(self)
 
     def __contains__(self, item):
-        for i in self._data:
+        # An explicit stack of the parts left to look at, so very deep sentences do not reach the recursion limit
+        stack = list(self._data)
+        while stack:
+            i = stack.pop()
+
             # If the item is an argument or the item is in the argument, then it is in this
-            if item == i or item in i:
+            if item == i:
                 return True
+            if matchesByArgument(i):
+                stack.extend(i._data)
         return False
 
     def __copy__(self):
@@ -123,44 +136,106 @@ class Sentence:
         # Since Sentences are immutable a deep copy is itsself
         return self
 
+    def __reduce__(self):
+        '''
+        Sentences are pickled as a flat list of their distinct parts, so they are made again through 
+        sf when they are unpickled and very deep sentences do not reach the recursion limit
+        '''
+        return (rebuildSentence, (flattenSentence(self),))
+
     def mapInto(self, other, replaceAll = True):
         '''
         Returns a list of dicts of the smallest mapping of variables to sentences that if substituted 
         into this sentence would make this sentence == other, or [] (empty list) if there is none 
 
+        Since sentences are immutable the results are remembered in matchCache
+
         Examples:
         sen1 = 'and(@a, @b)'
         sen2 = 'and(or(p,q),iff(r,s))'
         sen1.mapInto(sen2) == {'and':'and', @a': 'or(p, q)', '@b':'iff(r,s)'}
         '''
+        return list(self.iterMappings(other, replaceAll))
 
-        # Check that other is not none and the aritys are the same for a quick sanity check
-        if other is None or self.arity() != other.arity():
-            return []
+    def iterMappings(self, other, replaceAll = True):
+        '''
+        Yields the same mappings as mapInto one at a time, so a caller that stops at the first 
+        mapping that works does not pay for the rest
 
-        results = [{}]
-        for m, n in zip(self, other):
-            madeMapping = False
-            newResults = []
-            # For each argument, try to map it into the other argument recursively
-            for mapping in m.mapInto(n):
+        The mappings are only remembered in matchCache once all of them have been yielded
+        '''
+        if other is None:
+            return
+
+        key = (self._id, other._id, replaceAll)
+        results = matchCache.get(key)
+        if results is not None:
+            # The caller may change the mappings, so give it copies
+            for mapping in results:
+                yield dict(mapping)
+            return
+
+        found = []
+        for mapping in self._iterMappings(other, replaceAll):
+            found.append(dict(mapping))
+            yield mapping
+
+        # Every mapping has been found, so they can be remembered
+        matchCache[key] = tuple(found)
+
+    def _iterMappings(self, other, replaceAll = True):
+        '''
+        Yields the mappings of mapInto without using the cache
 
-                # If there is no mapping for a pair of arguments, then there is no maping at all
-                if not mapping: 
-                    continue
-    
-                
-                for res in results:
-                    # Merge the mapping into the results
-                    newResult = util.mapMerge(res, mapping)
-                    if len(newResult) > 0:
-                        newResults.append(newResult)
-                        madeMapping = True
-            results = newResults
-            
-        if not madeMapping:
-            return []
-        return results
+        The arguments are matched with an explicit stack instead of recursion, so very deep 
+        sentences do not reach the recursion limit
+        '''
+
+        # Check that the aritys are the same for a quick sanity check
+        if self.arity() != other.arity():
+            return
+
+        # The mapping so far, each choice is undone on the trail instead of copying the mapping
+        bindings = util.Bindings()
+
+        # The pairs of arguments left to map, as a linked list (pair, rest)
+        pending = splitArguments(pairArguments(self, other, None))
+        if pending is None or pending is False:
+            return
+
+        # Each item of the stack is a point of the search: the mappings left to try for the first
+        # pending pair, the pairs after it and the mark of the bindings before the pair was mapped
+        (m, n), rest = pending
+        stack = [(m.iterMappings(n), rest, bindings.mark())]
+
+        while stack:
+            mappings, rest, mark = stack[-1]
+
+            # Undo the last choice made here
+            bindings.undo(mark)
+
+            mapping = next(mappings, None)
+            if mapping is None:
+                # There are no more choices here, so go back to the last point
+                stack.pop()
+                continue
+
+            # If there is no mapping for a pair of arguments, or it conflicts, then there is no maping here
+            if not mapping or not bindings.merge(mapping):
+                continue
+
+            pending = splitArguments(rest)
+            if pending is False:
+                continue
+
+            # Every pair of arguments has been mapped
+            if pending is None:
+                yield bindings.toDict()
+                continue
+
+            # Each mapping of the next atom or operator is a choice
+            (m, n), rest = pending
+            stack.append((m.iterMappings(n), rest, bindings.mark()))
 
     def applyFunction(self, function, data = None):
         '''
@@ -173,17 +248,33 @@ class Sentence:
         if data is None:
             data = {}
 
-        args = []
-
         # Apply the function to this sentence
         sen = function(self, data)
 
-        for s in sen:
-            # Apply the function recursively to each of the arguments
-            args.append(s.applyFunction(function, data))
+        # An explicit stack instead of recursion, so very deep sentences do not reach the recursion limit
+        # Each item is the parts of a sentence after the function was applied and the new parts so far
+        stack = [(list(sen), [])]
 
-        # Return a new sentence after the function has been applied
-        return sf.generateSentence(args[0], args[1:])
+        while True:
+            sen, args = stack[-1]
+
+            # Every part is done, so make the new sentence and give it to the sentence it is a part of
+            if len(args) == len(sen):
+                stack.pop()
+                newSen = sf.generateSentence(args[0], args[1:])
+                if not stack:
+                    # Return a new sentence after the function has been applied
+                    return newSen
+                stack[-1][1].append(newSen)
+                continue
+
+            s = sen[len(args)]
+            if isinstance(s, Wff):
+                # The function is applied to an atom without looking at its parts
+                args.append(s.applyFunction(function, data))
+            else:
+                # Apply the function to each of the arguments
+                stack.append((list(function(s, data)), []))
 
 
     def subsitute(self, mapping, replaceAll = True):
@@ -204,30 +295,56 @@ class Sentence:
 
         if replaceAll:
             return [self.applyFunction(sub)]
-        
-        
-        results = set([self])
-            
-        for i, s in enumerate(self):
-            try:
-                for sub in s.subsitute(mapping, replaceAll):
-                    if s == sub:
-                        continue
-                    
-                    if i == 0:
-                        newSen = sf.generateSentence(sub, self[1:])
-                    else:
-                        args = list(self[1:])
-                        args[i - 1] = sub
-                        newSen = sf.generateSentence(self[0], args)
-                    results.add(newSen)
-                    results |= set(newSen.subsitute(mapping, replaceAll))
-                    
-            except AttributeError:
-                pass
-            
-            
-        return list(results)
+
+        # Otherwise each part can be subsituted or not, so the variants of a sentence are every 
+        # combination of the variants of its parts
+        # They are found for the deepest sentences first with an explicit stack, so very deep 
+        # sentences do not reach the recursion limit
+        variants = {}
+        stack = [self]
+        while stack:
+            sen = stack[-1]
+            if sen in variants:
+                stack.pop()
+                continue
+
+            # A part that is subsituted can also be left as it is
+            if sen in mapping and sen is not self:
+                variants[sen] = set([sen, mapping[sen]])
+                stack.pop()
+                continue
+
+            if isinstance(sen, Wff):
+                variants[sen] = set([sen])
+                stack.pop()
+                continue
+
+            # Find the variants of the parts first
+            missing = [s for s in sen if s not in variants]
+            if missing:
+                stack.extend(missing)
+                continue
+            stack.pop()
+
+            # Sentences without anything to subsitute are only themselves
+            if all(len(variants[s]) == 1 for s in sen):
+                variants[sen] = set([sen])
+                continue
+
+            combinations = [[]]
+            for s in sen:
+                combinations = [c + [v] for c in combinations for v in variants[s]]
+
+            results = set([])
+            for c in combinations:
+                newSen = sf.generateSentence(c[0], c[1:])
+                if tuple(c) == sen._data:
+                    # Nothing was subsituted
+                    newSen = sen
+                results.add(newSen)
+            variants[sen] = results
+
+        return list(variants[self])
 
     def op(self):
         '''
@@ -247,6 +364,20 @@ class Sentence:
         '''
         return len(self._data) - 1
 
+    def depth(self):
+        '''
+        Gets the depth of the sentence, an atom has a depth of 1
+        '''
+        return self._depth
+
+    def signature(self):
+        '''
+        Gets the number of symbols in this sentence of each kind, including the operators
+
+        @return - A tuple of the number of (Literals, Variables, Wffs)
+        '''
+        return self._signature
+
     def generalize(self):
         '''
         Converts all literals into varibles
@@ -254,24 +385,53 @@ class Sentence:
         @return - a copy of this sentence with all of the literals as variables with the same name
         '''
 
-        retArgs = list(self._data)[1:]
+        # The generalized arguments, found for the deepest arguments first with an explicit stack 
+        # so very deep sentences do not reach the recursion limit
+        # The operators are left as they are
+        generalized = {}
+        stack = [self]
+        while stack:
+            sen = stack[-1]
+            if sen in generalized:
+                stack.pop()
+                continue
 
-        for n, arg in enumerate(retArgs):
-            retArgs[n] = arg.generalize()
+            missing = [arg for arg in sen.args() if not isinstance(arg, Wff) and arg not in generalized]
+            if missing:
+                stack.extend(missing)
+                continue
+            stack.pop()
 
-        return Sentence(self.op(), retArgs)
+            retArgs = [arg.generalize() if isinstance(arg, Wff) else generalized[arg] for arg in sen.args()]
+            generalized[sen] = sf.generateSentence(sen.op(), retArgs)
+
+        return generalized[self]
 
     def terms(self):
         if self._terms is None:
+            # Every atom in this sentence, found with an explicit stack so very deep sentences 
+            # do not reach the recursion limit
             self._terms = set([])
-            for p in self._data:
-                self._terms |= (p.terms())
+            stack = list(self._data)
+            while stack:
+                p = stack.pop()
+                if isinstance(p, Wff):
+                    self._terms.add(p)
+                elif p._terms is not None:
+                    self._terms |= p._terms
+                else:
+                    stack.extend(p._data)
         return self._terms       
 
     def subSentences(self):
+        # This sentence and every argument in it, but not the operators
         res = set([self])
-        for s in self[1:]:
-            res |= s.subSentences()
+        stack = list(self[1:])
+        while stack:
+            s = stack.pop()
+            if s not in res:
+                res.add(s)
+                stack.extend(s.args())
         return res
 
 class Wff(Sentence):
@@ -279,6 +439,8 @@ class Wff(Sentence):
     A Wff is a placeholder in a sentence that matches any sentence
     '''
 
+    __slots__ = ('_name', '_symbol', '_str', '_symbolId')
+
     def __init__(self, name = 'A', symbol = '', data = None):
         # The name of the Wff, same named variables are considered to be the same Wff
 
@@ -293,16 +455,27 @@ class Wff(Sentence):
         # The symbol used to print
         self._symbol = symbol
 
-        # Used to store extra information
+        # The printed form, built once so comparing with a string does not allocate one
+        self._str = self._symbol + self._name
+
+        # The interned (kind, name) of this Wff
+        self._symbolId = symbolTable.symbolId(type(self), self._name)
+
+        # The integer id of this Wff
+        self._id = sf.nodeId(self)
+
+        self._hash, self._length, self._depth, self._signature = sf.measure(self)
+
+        # Used to store extra information, sentences without any share the same empty data
         self.extraData = data
         if self.extraData is None:
-            self.extraData = {}        
+            self.extraData = util.emptyData
 
     def __repr__(self):
-        return self._symbol + self._name    
+        return self._str
 
     def __str__(self):
-        return self._symbol + self._name
+        return self._str
 
     def __lt__(self, other):
         '''
@@ -321,22 +494,24 @@ class Wff(Sentence):
 
     def __eq__(self, other):
         '''
-        A Wff is equal to other if other is not a Wff or they share the same representation
+        A Wff is equal to other if they are the same kind of atom with the same name and symbol,
+        or other is a string of its representation
         '''
-
-        # Something is a Wff if it is less than or equal to a Wff
-        return other <= self and str(self) == str(other)
+        try:
+            return self._id == other._id
+        except AttributeError:
+            # Allows comparisons such as sen.op() == '|-'
+            return self._str == other
 
     def __ne__(self, other):
         '''
-        A Wff is not equal to other if other is a Wff and they dont share the same representation
+        A Wff is not equal to other if they are not the same atom
         '''     
-
-        # Something is a Wff if it is less than or equal to a Wff
-        return other <= self and str(self) != str(other)
+        return not self == other
 
     def __hash__(self):
-        return hash(self._name)
+        # Consistent with being equal to its representation
+        return self._hash
 
     def __len__(self):
         return 1
@@ -377,6 +552,10 @@ class Wff(Sentence):
         '''
         return [{self: other}]
 
+    def iterMappings(self, other, replaceAll = True):
+        # An atom has at most one mapping, so there is nothing to gain by being lazy
+        return iter(self.mapInto(other, replaceAll))
+
     def subsitute(self, mapping, replaceAll = True):
         if self in mapping:
             return [mapping[self]]
@@ -410,6 +589,9 @@ class Variable(Wff):
     '''
     A variable is a Wff but only for atomic terms
     '''
+
+    __slots__ = ()
+
     def mapInto(self, other, replaceAll = True):
         '''
         A Variable can only map into atomic terms
@@ -423,6 +605,8 @@ class Literal(Variable):
     A literal is the smallest sentence
     '''
 
+    __slots__ = ()
+
     def __lt__(self, other):
         '''
         Vacuously false since a literal cannot be mapped except to itsself
@@ -435,18 +619,6 @@ class Literal(Variable):
         '''
         return self == other
 
-    def __eq__(self, other):
-        '''
-        A Literal is equal if they have the same representation
-        '''
-        return str(self) == str(other)
-
-    def __ne__(self, other):
-        '''
-        A Literal is equal if they have the different representation
-        '''        
-        return str(self) != str(other)	
-
     def mapInto(self, other, replaceAll = True):
         '''
         A literal can only map into itsself 
@@ -458,13 +630,15 @@ class Literal(Variable):
     
 class Operator(Sentence):
 
+    __slots__ = ()
+
     def __len__(self):
         return 1
 
     def __contains__(self, item):
         return self == item
 
-    def mapInto(self, other, replaceAll = True):
+    def _iterMappings(self, other, replaceAll = True):
         '''
         e.g.
         '?P[?x]'.mapInto('if(A(y),B(y))')
@@ -493,8 +667,6 @@ class Operator(Sentence):
         -> {'?P[@]':'if(A(s(a)),B(@))', '@Q':'s', '@x':'b'}
         '''
 
-        results = []
-
         # Example 1 -> '?P[@a]'.mapInto('if(A(s(a)),B(s(b)))')
         # Example 2 -> '?P[@Q(@x)]'.mapInto('if(A(s(a)),B(s(b)))')
 
@@ -517,7 +689,7 @@ class Operator(Sentence):
             #   = 'a'
             #   = 'b'
 
-            for mapping in arg.mapInto(s):
+            for mapping in arg.iterMappings(s):
                 # Example 1->
                 # mapping = {'?x':'if(A(s(a)),B(s(b)))'}
                 # ...
@@ -564,9 +736,7 @@ class Operator(Sentence):
                         continue
                 
                     mapping[op] = structure
-                    results.append(copy.copy(mapping))
-                
-        return results
+                    yield copy.copy(mapping)
 
 class SentenceIterator:
     def __init__(self, sen):
@@ -591,13 +761,274 @@ class SentenceIterator:
 class InvalidSentenceError(Exception):
     pass
 
+def matchesByArgument(sen):
+    '''
+    Checks if a sentence is matched by matching each of its parts, atoms and operators are matched as a whole
+    '''
+    return isinstance(sen, Sentence) and not isinstance(sen, (Wff, Operator))
+
+def parts(sen):
+    '''
+    Gets the operator and arguments of a sentence, the only part of an atom is itsself
+    '''
+    if isinstance(sen, Wff):
+        return (sen,)
+    return sen._data
+
+def pairArguments(sen, other, rest):
+    '''
+    Pairs each part of sen with the same part of other, in front of the pairs in rest
+
+    @param rest - A linked list (pair, rest) of pairs, or None
+    @return - A linked list of the pairs
+    '''
+    for pair in reversed(zip(parts(sen), parts(other))):
+        rest = (pair, rest)
+    return rest
+
+def splitArguments(pending):
+    '''
+    Splits the compound arguments at the front of pending into their own arguments, there is 
+    only one way to do this, until the first pair is an atom or an operator
+
+    @param pending - A linked list (pair, rest) of pairs, or None
+    @return - The linked list of pairs, None if there are none, or False if the aritys of a pair are different
+    '''
+    while pending is not None and matchesByArgument(pending[0][0]):
+        (m, n), rest = pending
+        if m.arity() != n.arity():
+            return False
+        pending = pairArguments(m, n, rest)
+    return pending
+
+def flattenSentence(sen):
+    '''
+    Gets the distinct parts of a sentence, each part is after all of its own parts
+
+    @return - A list of (type, name, symbol, data) for each atom and (type, indexes of the parts, data) for each 
+              compound sentence, the sentence is last
+    '''
+    nodes = []
+    index = {}
+    stack = [(sen, False)]
+    while stack:
+        item, ready = stack.pop()
+        if item._id in index:
+            continue
+
+        if isinstance(item, Wff):
+            node = (type(item), item._name, item._symbol, item.extraData)
+        elif not ready:
+            # The parts are added first
+            stack.append((item, True))
+            stack.extend([(s, False) for s in reversed(item._data)])
+            continue
+        else:
+            node = (type(item), tuple([index[s._id] for s in item._data]), item.extraData)
+
+        index[item._id] = len(nodes)
+        nodes.append(node)
+    return nodes
+
+def rebuildSentence(nodes):
+    '''
+    Makes a sentence again from the result of flattenSentence, through sf so it is the shared sentence
+    '''
+    generators = {Wff: sf.generateWff, Variable: sf.generateVariable, Literal: sf.generateLiteral, 
+                  Sentence: sf.generateSentence, Operator: sf.generateOperator}
+
+    built = []
+    for node in nodes:
+        if len(node) == 4:
+            kind, name, symbol, data = node
+            built.append(generators[kind](name, symbol, data))
+        else:
+            kind, parts, data = node
+            parts = [built[i] for i in parts]
+            built.append(generators[kind](parts[0], parts[1:], data))
+    return built[-1]
+
+# Remembers the results of mapInto, keyed by (pattern id, target id, replaceAll)
+matchCache = util.LRUCache(50000)
+
+def setMatchCacheSize(maxSize):
+    '''
+    Sets the largest number of mapInto results to remember
+
+    @param maxSize - The number of results, 0 to not remember any or None for no limit
+    '''
+    matchCache.resize(maxSize)
+
+def matchCacheInfo():
+    '''
+    Gets the statistics of the mapInto cache
+
+    @return - A dict with the 'hits', 'misses', 'hitRate', 'evictions', 'size' and 'maxSize' of the cache
+    '''
+    return matchCache.info()
+
+class SymbolTable:
+    '''
+    Interns the names of atomic sentences
+
+    Each kind of atom (Literal, Variable or Wff) and name is given a small integer, e.g.
+    (Literal, 'a'), (Variable, 'x') for '?x' and (Wff, 'A') for '@A'
+    '''
+    def __init__(self):
+        # Maps (kind, name) to its integer
+        self._ids = {}
+
+        # The (kind, name) of each integer, the index is the integer
+        self._symbols = []
+
+    def __len__(self):
+        return len(self._symbols)
+
+    def symbolId(self, kind, name):
+        '''
+        Gets the integer for a kind of atom and name, allocating the next integer if it is new
+
+        @param kind - The class of the atom
+        @param name - The name of the atom without its symbol
+        @return - The integer for (kind, name)
+        '''
+        key = (kind, name)
+        try:
+            return self._ids[key]
+        except KeyError:
+            newId = len(self._symbols)
+            self._ids[key] = newId
+            self._symbols.append(key)
+            return newId
+
+    def lookup(self, kind, name):
+        '''
+        Gets the integer for a kind of atom and name without adding it
+
+        @return - The integer for (kind, name) or None if it has not been interned
+        '''
+        return self._ids.get((kind, name))
+
+    def getSymbol(self, symbolId):
+        '''
+        Gets the (kind, name) of an integer returned by symbolId
+        '''
+        return self._symbols[symbolId]
+
+symbolTable = SymbolTable()
+
 class SentenceFactory:
+    '''
+    Creates sentences, making sure that structurally equal sentences are the same object
+
+    Every structurally distinct sentence is given an integer id, so two sentences are equal iff their ids are equal
+
+    The factory only keeps weak references to its sentences, so a sentence that is no longer used anywhere is
+    forgotten.  If an equal sentence is made again later it is given a new id, ids are never used twice.
+
+    Ids are only unique within one factory, sentences of two factories can not be compared.  Sentences are 
+    always made by the module's factory sf, so they should be made with its generate methods.
+    '''
     def __init__(self):
-        self._cache_sen = {}
-        self._cache_wff = {}
-        self._cache_var = {}
-        self._cache_lit = {}
-        self._cache_op = {}
+        # Maps the structure of a sentence to the first sentence made with it
+        self._ids = weakref.WeakValueDictionary()
+
+        # Maps each id to the sentence with it, while the sentence is used
+        self._nodes = weakref.WeakValueDictionary()
+
+        # The next id to give to a new structure
+        self._nextId = 0
+
+        self._cache_sen = weakref.WeakValueDictionary()
+        self._cache_wff = weakref.WeakValueDictionary()
+        self._cache_var = weakref.WeakValueDictionary()
+        self._cache_lit = weakref.WeakValueDictionary()
+        self._cache_op = weakref.WeakValueDictionary()
+
+    def nodeKey(self, sen):
+        '''
+        Gets the structure of a sentence as a hashable key
+
+        Compound sentences are described by their class and the ids of their operator and arguments, so building
+        a key never walks more than one level of the sentence, and a Sentence and an Operator with the same
+        parts are not equal
+
+        @param sen - The sentence to describe
+        @return - A tuple that is equal for two sentences iff they are structurally equal
+        '''
+        if isinstance(sen, Wff):
+            return (sen._symbolId, sen._symbol)
+        return (sen.__class__,) + tuple([s._id for s in sen._data])
+
+    def nodeId(self, sen):
+        '''
+        Gets the id of a sentence, allocating the next id if no sentence with its structure is used now
+
+        @param sen - The sentence to get the id of
+        @return - An integer id shared by all sentences with the same structure
+        '''
+        key = self.nodeKey(sen)
+        try:
+            return self._ids[key]._id
+        except KeyError:
+            # This is a new structure, ids are allocated in order starting at 0
+            newId = self._nextId
+            self._nextId += 1
+            self._ids[key] = sen
+            self._nodes[newId] = sen
+            return newId
+
+    def measure(self, sen):
+        '''
+        Computes the structural hash, length, depth and signature of a new sentence
+
+        Only the values already stored in the operator and arguments are used, so this is constant time for each sentence
+
+        @param sen - The sentence to measure
+        @return - A tuple of (hash, length, depth, signature)
+        '''
+        if isinstance(sen, Wff):
+            # An atom is counted as one symbol of its kind
+            if isinstance(sen, Literal):
+                signature = (1, 0, 0)
+            elif isinstance(sen, Variable):
+                signature = (0, 1, 0)
+            else:
+                signature = (0, 0, 1)
+
+            # An atom hashes like its representation since it is equal to it
+            return hash(sen._str), 1, 1, signature
+
+        parts = sen._data
+        hashes = [sen.__class__.__name__]
+        length = 1
+        depth = 0
+        literals = variables = wffs = 0
+        for n, s in enumerate(parts):
+            hashes.append(s._hash)
+
+            # The length does not count the operator
+            if n > 0:
+                length += s._length
+
+            depth = max(depth, s._depth)
+
+            l, v, w = s._signature
+            literals += l
+            variables += v
+            wffs += w
+
+        return hash(tuple(hashes)), length, depth + 1, (literals, variables, wffs)
+
+    def getNode(self, nodeId):
+        '''
+        Gets the sentence with the given id
+
+        @param nodeId - An id returned by nodeId
+        @return - The sentence with that id
+        @raise KeyError - If no sentence with that id is used any more
+        '''
+        return self._nodes[nodeId]
 
     def generateSentence(self, operator, arguments, data = None):
         '''
@@ -609,13 +1040,15 @@ class SentenceFactory:
         @return - A sentence that is formed from the operator and the arguments
         '''
 
-        arguments = tuple(arguments)
+        # The cache is keyed by the ids of the parts, so the lookup does not walk the arguments
+        key = (operator._id,) + tuple([a._id for a in arguments])
+
         # Check if the sentence is in the cache
-        if (operator, arguments) in self._cache_sen:
-            newSentence = self._cache_sen[(operator, arguments)]
-        else:
+        try:
+            newSentence = self._cache_sen[key]
+        except KeyError:
             newSentence = Sentence(operator, arguments, data)
-            self._cache_sen[(operator, arguments)] = newSentence
+            self._cache_sen[key] = newSentence
 
         return newSentence
 
@@ -624,9 +1057,9 @@ class SentenceFactory:
         Creates a Wff from the given name
         '''
         # Check the cache
-        if name in self._cache_wff:
+        try:
             newWff = self._cache_wff[name]
-        else:
+        except KeyError:
             newWff = Wff(name, symbol, data)
             self._cache_wff[name] = newWff
 
@@ -637,9 +1070,9 @@ class SentenceFactory:
         Creates a Variable from the given name
         '''
         # Check the cache
-        if name in self._cache_var:
+        try:
             newVariable = self._cache_var[name]
-        else:
+        except KeyError:
             newVariable = Variable(name, symbol, data)
             self._cache_var[name] = newVariable
 
@@ -650,9 +1083,9 @@ class SentenceFactory:
         Creates a Literal from the given name
         '''
         # Check the cache
-        if name in self._cache_lit:
+        try:
             newLiteral = self._cache_lit[name]
-        else:
+        except KeyError:
             newLiteral = Literal(name, symbol, data)
             self._cache_lit[name] = newLiteral
 
@@ -668,13 +1101,14 @@ class SentenceFactory:
         @return - A operator that is formed from the operator and the arguments
         '''
 
-        arguments = tuple(arguments)
-        # Check if the sentence is in the cache
-        if (mainOperator, arguments) in self._cache_op:
-            newOp = self._cache_op[(mainOperator, arguments)]
-        else:
+        key = (mainOperator._id,) + tuple([a._id for a in arguments])
+
+        # Check if the operator is in the cache
+        try:
+            newOp = self._cache_op[key]
+        except KeyError:
             newOp = Operator(mainOperator, arguments, data)
-            self._cache_op[(mainOperator, arguments)] = newOp
+            self._cache_op[key] = newOp
 
         return newOp
         
@@ -690,7 +1124,8 @@ if __name__ == '__main__':
     
     printer = lambda sen: printers.prefixSentencePrinter(sen)
 
-    sf = SentenceFactory()
+    # The sentences are made by the module's factory sf, a new factory would give ids that are the same as
+    # the ids of other sentences
 
     op1 = sf.generateLiteral('and')
     op2 = sf.generateVariable('P')
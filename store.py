@@ -0,0 +1,125 @@
+import os
+import json
+import hashlib
+import sqlite3
+
+import inference
+import parsers
+
+# The version of the stored results, results stored by another version are not used
+STORE_VERSION = 1
+
+def sourceKey(filename):
+    '''
+    Gets the key of a proof file, the hash of its text and the text of every file it includes (and the files
+    they include) without comments, blank lines and spaces at the ends of lines
+
+    A file with the same key as another has the same proofs, so it has the same results
+    The key also has the versions of the store, the parsers and the verifier, see inference.VERIFIER_VERSION, 
+    so results stored before a change to what is valid are not used
+
+    @param filename - The name of the proof file
+    @return - The key as a string, or None if the file changes the settings of the parser, since then the
+              files it includes can not be found without parsing it
+    '''
+    digest = hashlib.sha1('%d\n%d\n%d\n' % (STORE_VERSION, parsers.PARSER_VERSION, inference.VERIFIER_VERSION))
+
+    with open(filename) as f:
+        lines = f.read().split('\n')
+
+    path = os.path.dirname(os.path.realpath(filename))
+    imported = set([os.path.join(path, filename)])
+    if not hashLines(digest, lines, path, imported):
+        return None
+    return digest.hexdigest()
+
+def hashLines(digest, lines, path, imported):
+    '''
+    Adds the lines of a file, and the files it includes in place of their include lines, to a hash
+
+    @param digest - The hash
+    @param lines - The lines of the file
+    @param path - The directory of the file
+    @param imported - The files already included, the same as defaultProofParser
+    @return - False if a line changes the settings of the parser, otherwise True
+    '''
+    for line in lines:
+        # Ignore everything after the comment symbol and blank lines, the same as defaultProofParser
+        line = line.split(parsers.includeData['comment'])[0].strip()
+        if len(line) == 0:
+            continue
+
+        if line.startswith(parsers.includeData['assign']):
+            return False
+
+        digest.update(line + '\n')
+        if not line.startswith(parsers.includeData['include']):
+            continue
+
+        filename, keepLines = parsers.includeTarget(line, parsers.includeData, path)
+        if filename in imported and keepLines is None:
+            continue
+
+        with open(filename) as f:
+            included = f.read().split('\n')
+        if keepLines is None:
+            imported.add(filename)
+        else:
+            included = [l for n, l in enumerate(included) if n + 1 in keepLines]
+
+        # Mark where the included file starts and ends, so moving lines in or out of it changes the hash
+        digest.update('{\n')
+        if not hashLines(digest, included, os.path.dirname(os.path.realpath(filename)), imported):
+            return False
+        digest.update('}\n')
+    return True
+
+class ResultStore(object):
+    '''
+    The results of verifying proof files kept in an SQLite database by the key of each file, see sourceKey
+
+    The results of a file are a list of a dict for each proof, e.g.
+    [{'proof': 'MT - Sub 1', 'valid': True, 'line': None}, {'proof': 'MT', 'valid': False, 'line': 3}]
+
+    The same database can be used by many processes at the same time
+    '''
+
+    def __init__(self, filename):
+        '''
+        @param filename - The name of the database file, it is made if it does not exist
+        '''
+        self.filename = filename
+
+        # Wait for other processes writing to the database instead of failing
+        self._connection = sqlite3.connect(filename, timeout = 60)
+        with self._connection:
+            self._connection.execute('CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, results TEXT NOT NULL)')
+
+    def get(self, key):
+        '''
+        Gets the results of a file
+
+        @param key - The key of the file
+        @return - The results, or None if there are none
+        '''
+        row = self._connection.execute('SELECT results FROM results WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0])
+
+    def put(self, key, results):
+        '''
+        Keeps the results of a file
+
+        @param key - The key of the file
+        @param results - The results
+        '''
+        with self._connection:
+            self._connection.execute('INSERT OR REPLACE INTO results (key, results) VALUES (?, ?)',
+                                     (key, json.dumps(results, sort_keys = True)))
+
+    def __len__(self):
+        return self._connection.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+    def close(self):
+        self._connection.close()
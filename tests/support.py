@@ -0,0 +1,79 @@
+'''
+Shared setup of the tests
+
+operator.py at the top of the repository has the name of a standard module, so the tests are run from any
+other directory, e.g.
+python -m unittest discover -s path/to/pyLemma/tests
+'''
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+# The modules are found after the standard library, so operator.py does not hide the standard operator module
+root = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+if root not in sys.path:
+    sys.path.append(root)
+
+# Includes such as '$Lemma/Rules/F Rules.inf' are relative to the examples
+examples = os.path.join(root, 'Examples')
+os.environ['Lemma'] = examples
+
+# Compiled includes are not kept on disk unless a test asks for it
+os.environ.pop('LemmaCache', None)
+
+# inference imports proof, so it has to be imported first
+import inference
+import proof
+import parsers
+
+# The rule file most of the tests include
+rules = os.path.join(examples, 'Rules', 'F Rules.inf')
+
+def proofText(name, lines):
+    '''
+    Writes a proof in the format of a proof file
+
+    @param name - The name of the proof
+    @param lines - A list of (sentence, inference rule, support line numbers) of each line, numbered from 1
+    @return - The text of the proof
+    '''
+    text = 'proof\n%s\n' % name
+    for n, (sen, rule, support) in enumerate(lines):
+        text += '%d\t%s\t%s\t%s\n' % (n + 1, sen, rule, support)
+    return text + 'done\n'
+
+def parseProofs(*proofs):
+    '''
+    Parses proofs that include the rules, see proofText
+
+    @return - A dict of the names of the proofs to the proofs
+    '''
+    return parsers.defaultProofParser('include\t%s\n\n%s' % (rules, '\n'.join(proofs)))
+
+class TempDirTestCase(unittest.TestCase):
+    '''
+    A test with a directory of its own that is deleted after it
+    '''
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, text):
+        '''
+        Writes a file in the directory of the test
+
+        @param name - The name of the file, relative to the directory
+        @param text - The text of the file
+        @return - The absolute name of the file
+        '''
+        filename = os.path.join(self.directory, name)
+        if not os.path.isdir(os.path.dirname(filename)):
+            os.makedirs(os.path.dirname(filename))
+        with open(filename, 'w') as f:
+            f.write(text)
+        return filename
@@ -0,0 +1,72 @@
+import os
+import json
+import unittest
+import StringIO
+
+import support
+import batch
+
+class BatchTest(support.TempDirTestCase):
+
+    def setUp(self):
+        support.TempDirTestCase.setUp(self)
+        self.valid = self.write('proofs/valid.prf', 'include\t%s\n\n' % support.rules +
+                                support.proofText('A', [('and(A,B)', 'Assumption', ''), ('A', 'And Elim Left', '1')]))
+        self.invalid = self.write('proofs/more/invalid.prf', 'include\t%s\n\n' % support.rules +
+                                  support.proofText('B', [('and(A,B)', 'Assumption', ''), ('C', 'And Elim Left', '1')]))
+        self.write('proofs/notes.txt', 'Not a proof')
+
+    def runBatch(self, paths, storeFile = None):
+        out = StringIO.StringIO()
+        status = batch.run(paths, 1, out, storeFile)
+        return status, [json.loads(line) for line in out.getvalue().splitlines()]
+
+    def testFindProofFilesOfADirectory(self):
+        self.assertEqual(batch.findProofFiles([os.path.join(self.directory, 'proofs')]), [self.invalid, self.valid])
+
+    def testGlobSearchesTheDirectoriesItMatches(self):
+        unmatched = []
+        self.assertEqual(batch.findProofFiles([os.path.join(self.directory, 'proofs', 'm*')], unmatched), [self.invalid])
+        self.assertEqual(batch.findProofFiles([os.path.join(self.directory, '*', 'v*')], unmatched), [self.valid])
+        self.assertEqual(batch.findProofFiles([os.path.join(self.directory, 'proofs', '*.inf')], unmatched), [])
+        self.assertEqual(unmatched, [os.path.join(self.directory, 'proofs', '*.inf')])
+
+    def testPathThatIsNotAFileIsAnError(self):
+        for path in (os.path.join(self.directory, 'missing.prf'), os.path.join(self.directory, 'proofs')):
+            results = batch.verifyFile(path)
+            self.assertEqual([(r['proof'], r['valid']) for r in results], [(None, False)])
+            self.assertIn('error', results[0])
+
+        status, results = self.runBatch([os.path.join(self.directory, 'missing.prf')])
+        self.assertEqual(status, batch.ERROR)
+
+    def testStatus(self):
+        status, results = self.runBatch([self.valid])
+        self.assertEqual(status, batch.VALID)
+        self.assertEqual([(r['proof'], r['valid']) for r in results], [('A', True)])
+
+        status, results = self.runBatch([self.valid, self.invalid])
+        self.assertEqual(status, batch.INVALID)
+        self.assertEqual([(r['proof'], r['valid'], r['line']) for r in results], [('A', True, None), ('B', False, 2)])
+
+    def testUnmatchedPathIsAnError(self):
+        status, results = self.runBatch([self.valid, os.path.join(self.directory, 'missing*.prf')])
+        self.assertEqual(status, batch.ERROR)
+        self.assertEqual(results[0]['proof'], None)
+        self.assertIn('No proof files match', results[0]['error'])
+
+    def testParseErrorIsAnError(self):
+        bad = self.write('bad.prf', 'proof\nBad\n1\tand(A\tAssumption\ndone\n')
+        status, results = self.runBatch([bad, self.valid])
+        self.assertEqual(status, batch.ERROR)
+        self.assertEqual([(r['file'], 'error' in r) for r in results], [(bad, True), (self.valid, False)])
+
+    def testStoredResultsAreUsed(self):
+        storeFile = os.path.join(self.directory, 'results.db')
+        first = self.runBatch([self.invalid], storeFile)
+        second = self.runBatch([self.invalid], storeFile)
+        self.assertEqual([r['cached'] for r in first[1] + second[1]], [False, True])
+        self.assertEqual(second[0], first[0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import os
+import sys
+import json
+import unittest
+import subprocess
+
+import support
+import inference
+import parsers
+
+class ValidCacheTest(support.TempDirTestCase):
+
+    def setUp(self):
+        support.TempDirTestCase.setUp(self)
+        inference.validCache.clear()
+
+    def tearDown(self):
+        inference.validCache.clear()
+        support.TempDirTestCase.tearDown(self)
+
+    def proof(self, name = 'P'):
+        return support.parseProofs(support.proofText(name, [('and(A,B)', 'Assumption', ''), ('A', 'And Elim Left', '1'),
+                                                            ('C', 'And Elim Left', '1')]))[name]
+
+    def testSameStepIsOnlyCheckedOnce(self):
+        self.assertEqual(self.proof('P').verify(), 2)
+        misses = inference.validCacheInfo()['misses']
+
+        # The same step in another proof of another parse is a hit
+        self.assertEqual(self.proof('Q').verify(), 2)
+        self.assertEqual(inference.validCacheInfo()['misses'], misses)
+
+    def testSaveAndLoad(self):
+        self.proof().verify()
+        results = dict(inference.validCache.items())
+        filename = os.path.join(self.directory, 'valid.json')
+        inference.saveValidCache(filename)
+
+        inference.validCache.clear()
+        self.assertTrue(inference.loadValidCache(filename))
+        self.assertEqual(dict(inference.validCache.items()), results)
+
+    def testLoadInAnotherProcess(self):
+        text = support.proofText('P', [('A', 'Assumption', ''), ('B', 'Assumption', ''), ('and(A,B)', 'And Intro', '1,2')])
+        support.parseProofs(text)['P'].verify()
+        filename = os.path.join(self.directory, 'valid.json')
+        inference.saveValidCache(filename)
+
+        # The other process makes B before A, so their ids are in the other order
+        script = '''
+import sys, json
+sys.path.insert(0, sys.argv[1])
+import support, inference, parsers
+parsers.prefixSentenceParser('B'), parsers.prefixSentenceParser('A')
+inference.loadValidCache(sys.argv[2])
+valid = support.parseProofs(sys.argv[3])['P'].verify()
+sys.stdout.write(json.dumps([valid, inference.validCacheInfo()['misses']]))
+'''
+        tests = os.path.dirname(os.path.abspath(__file__))
+        output = subprocess.check_output([sys.executable, '-c', script, tests, filename, text], cwd = self.directory)
+        self.assertEqual(json.loads(output), [True, 0])
+
+    def testOtherVersionIsIgnored(self):
+        self.proof().verify()
+        filename = os.path.join(self.directory, 'valid.json')
+        inference.saveValidCache(filename)
+        with open(filename) as f:
+            data = json.load(f)
+        data['verifier'] += 1
+        with open(filename, 'w') as f:
+            json.dump(data, f)
+
+        inference.validCache.clear()
+        self.assertFalse(inference.loadValidCache(filename))
+        self.assertEqual(len(inference.validCache), 0)
+
+    def testMalformedFileIsAnError(self):
+        filename = self.write('valid.json', json.dumps({'verifier': inference.VERIFIER_VERSION,
+                                                        'parser': parsers.PARSER_VERSION, 'sentences': [],
+                                                        'results': [['Inference', 0, [], 0, [], True]]}))
+        with self.assertRaises(ValueError):
+            inference.loadValidCache(filename)
+        self.assertEqual(len(inference.validCache), 0)
+
+if __name__ == '__main__':
+    unittest.main()
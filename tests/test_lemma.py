@@ -0,0 +1,82 @@
+import os
+import sys
+import unittest
+import subprocess
+
+import support
+import parsers
+import lemma
+
+class CompileLemmaTest(support.TempDirTestCase):
+
+    def setUp(self):
+        support.TempDirTestCase.setUp(self)
+        self.proofs = support.parseProofs(
+            support.proofText('L', [('and(A,B)', 'Assumption', ''), ('A', 'And Elim Left', '1')]),
+            support.proofText('Bad', [('and(A,B)', 'Assumption', ''), ('C', 'And Elim Left', '1')]))
+
+    def testLemmaProvesWhatTheProofDoes(self):
+        lem = lemma.compileLemma(self.proofs['L'])
+        self.assertEqual(lem.name, 'L')
+        self.assertEqual(lem.getConclusion(), [parsers.prefixSentenceParser('@A')])
+
+        prf = support.parseProofs(support.proofText('P', [('and(C,D)', 'Assumption', ''), ('C', '???', '1')]))['P']
+        self.assertTrue(lem.isValid(parsers.prefixSentenceParser('C'), [lambda: prf[0]]))
+        self.assertFalse(lem.isValid(parsers.prefixSentenceParser('D'), [lambda: prf[0]]))
+
+    def testInvalidProofIsNotALemma(self):
+        self.assertIsNone(lemma.compileLemma(self.proofs['Bad']))
+
+    def testWriteAndRead(self):
+        lem = lemma.compileLemma(self.proofs['L'])
+        filename = os.path.join(self.directory, 'lemmas.inf')
+        lemma.writeLemmas([lem], filename)
+
+        read = lemma.readLemmas(filename)
+        self.assertEqual([l.name for l in read], ['L'])
+        self.assertEqual((read[0].getConclusion(), read[0].getPremises()), (lem.getConclusion(), lem.getPremises()))
+
+    def testReadingAProofFileFails(self):
+        filename = self.write('a.prf', support.proofText('A', [('A', 'Assumption', '')]))
+        with self.assertRaises(parsers.LineError):
+            lemma.readLemmas(filename)
+
+class CommandTest(support.TempDirTestCase):
+
+    def lemma(self, *args):
+        '''
+        Runs lemma.py in another process
+
+        @return - (exit status, output, errors)
+        '''
+        # The repository is not put first on the path, so operator.py does not hide the standard module
+        script = 'import sys, runpy\nsys.path.append(%r)\nsys.argv = sys.argv[1:]\nrunpy.run_path(sys.argv[0], run_name = "__main__")'
+        command = [sys.executable, '-c', script % support.root, os.path.join(support.root, 'lemma.py')] + list(args)
+        process = subprocess.Popen(command, stdout = subprocess.PIPE, stderr = subprocess.PIPE, cwd = self.directory)
+        out, err = process.communicate()
+        return process.returncode, out, err
+
+    def testValid(self):
+        filename = self.write('a.prf', 'include\t%s\n\n' % support.rules +
+                              support.proofText('L', [('and(A,B)', 'Assumption', ''), ('A', 'And Elim Left', '1')]))
+        status, out, err = self.lemma(filename)
+        self.assertEqual((status, err), (0, ''))
+        self.assertIn('L', out)
+
+        self.assertEqual(self.lemma(filename, os.path.join(self.directory, 'a.inf'))[0], 0)
+        self.assertEqual([l.name for l in lemma.readLemmas(os.path.join(self.directory, 'a.inf'))], ['L'])
+
+    def testInvalidProof(self):
+        filename = self.write('a.prf', 'include\t%s\n\n' % support.rules +
+                              support.proofText('Bad', [('and(A,B)', 'Assumption', ''), ('C', 'And Elim Left', '1')]))
+        status, out, err = self.lemma(filename)
+        self.assertEqual((status, err), (1, 'Bad is not valid\n'))
+
+    def testErrors(self):
+        self.assertEqual(self.lemma()[0], 2)
+        status, out, err = self.lemma(os.path.join(self.directory, 'missing.prf'))
+        self.assertEqual(status, 2)
+        self.assertIn('missing.prf', err)
+
+if __name__ == '__main__':
+    unittest.main()
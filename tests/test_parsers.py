@@ -0,0 +1,106 @@
+import os
+import unittest
+import StringIO
+
+import support
+import parsers
+
+class ProofParserTest(support.TempDirTestCase):
+
+    def testParseFile(self):
+        filename = self.write('mt.prf', open(os.path.join(support.examples, 'F Lemmas', 'Modus Tollens.prf')).read())
+        proofs = parsers.defaultProofParser(filename)
+        self.assertEqual(sorted(proofs), ['MT', 'MT - Sub 1'])
+        self.assertEqual(proofs['MT'].verify(), True)
+
+    def testIncludeRelativeToFile(self):
+        self.write('rules/a.inf', 'include\t%s\n' % support.rules)
+        filename = self.write('a.prf', 'include\trules/a.inf\n\n' +
+                              support.proofText('A', [('and(A,B)', 'Assumption', ''), ('A', 'And Elim Left', '1')]))
+        self.assertEqual(parsers.defaultProofParser(filename)['A'].verify(), True)
+
+    def testParseStringAndFileWithoutAName(self):
+        text = 'include\t%s\n\n%s\n%s' % (support.rules, support.proofText('A', [('A', 'Assumption', '')]),
+                                         support.proofText('B', [('and(A,B)', 'Assumption', ''), ('B', 'And Elim Right', '1')]))
+        for source in (text, StringIO.StringIO(text)):
+            proofs = parsers.defaultProofParser(source)
+            self.assertEqual(dict((name, p.verify()) for name, p in proofs.items()), {'A': True, 'B': True})
+
+        with self.assertRaises(parsers.LineError) as raised:
+            parsers.defaultProofParser(StringIO.StringIO('proof\nBad\n1\tand(A\tAssumption\ndone\n'))
+        self.assertIn('<stream>', str(raised.exception))
+
+    def testIterProofParserGivesEachProofWhenDone(self):
+        lines = iter(['include\t%s\n' % support.rules,
+                      'proof\n', 'A\n', '1\tA\tAssumption\n', 'done\n',
+                      'proof\n', 'B\n', '1\tB\tAssumption\n', 'done\n'])
+        proofs = parsers.iterProofParser(FileLines(lines))
+        self.assertEqual(next(proofs)[0], 'A')
+
+        # Only the lines of the first proof were read
+        self.assertEqual(next(lines), 'proof\n')
+
+    def testLineError(self):
+        filename = self.write('bad.prf', 'proof\nBad\n1\tand(A\tAssumption\ndone\n')
+        with self.assertRaises(parsers.LineError) as raised:
+            parsers.defaultProofParser(filename)
+        self.assertIn('bad.prf', str(raised.exception))
+        self.assertIn('line 3', str(raised.exception))
+
+class FileLines(object):
+    '''
+    A file object without a name, that reads the lines of an iterator
+    '''
+
+    def __init__(self, lines):
+        self._lines = lines
+
+    def read(self):
+        return ''.join(self._lines)
+
+    def __iter__(self):
+        return self._lines
+
+class IncludeCacheTest(support.TempDirTestCase):
+
+    def setUp(self):
+        support.TempDirTestCase.setUp(self)
+        self.cache = os.path.join(self.directory, 'cache')
+        parsers.setIncludeCache(True, self.cache)
+
+    def tearDown(self):
+        parsers.setIncludeCache(True, None)
+        support.TempDirTestCase.tearDown(self)
+
+    def parse(self):
+        return parsers.defaultProofParser(os.path.join(support.examples, 'F Lemmas', 'Modus Tollens.prf'))
+
+    def testCompiledIncludeGivesTheSameRules(self):
+        text = open(support.rules).read()
+        steps = parsers.compileInclude(text)
+        loaded = parsers.decodeSteps(parsers.encodeSteps(steps))
+        self.assertEqual([kind for kind, value in loaded], [kind for kind, value in steps])
+        for (kind, a), (kind, b) in zip(steps, loaded):
+            if kind == 'inference':
+                self.assertEqual((a.name, a.getConclusion(), a.getPremises()), (b.name, b.getConclusion(), b.getPremises()))
+
+    def testCacheIsUsed(self):
+        self.assertEqual(self.parse()['MT'].verify(), True)
+        self.assertTrue(len(os.listdir(self.cache)) > 0)
+        self.assertEqual(self.parse()['MT'].verify(), True)
+
+    def testBadCacheFileIsIgnored(self):
+        self.parse()
+        for name in os.listdir(self.cache):
+            with open(os.path.join(self.cache, name), 'w') as f:
+                f.write('{"version": %d, "steps": [["inference", "x", [["Evil", 1, 2, null]], []]]}' % parsers.PARSER_VERSION)
+        self.assertEqual(self.parse()['MT'].verify(), True)
+
+    def testNothingIsWrittenWithoutADirectory(self):
+        parsers.setIncludeCache(True, None)
+        filename = self.write('a.prf', 'include\t%s\n' % support.rules)
+        parsers.defaultProofParser(filename)
+        self.assertEqual(os.listdir(self.directory), ['a.prf'])
+
+if __name__ == '__main__':
+    unittest.main()
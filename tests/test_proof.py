@@ -0,0 +1,143 @@
+import unittest
+
+import support
+import parsers
+import proof
+
+parse = parsers.prefixSentenceParser
+
+class VerifyTest(unittest.TestCase):
+
+    def testValid(self):
+        p = support.parseProofs(support.proofText('P', [('and(A,B)', 'Assumption', ''), ('A', 'And Elim Left', '1'),
+                                                        ('B', 'And Elim Right', '1')]))['P']
+        self.assertEqual(p.verify(), True)
+        self.assertEqual(p.getErrors(), [])
+
+    def testInvalidLines(self):
+        p = support.parseProofs(support.proofText('P', [('and(A,B)', 'Assumption', ''), ('C', 'And Elim Left', '1'),
+                                                        ('B', 'And Elim Right', '1'), ('D', 'And Elim Right', '1')]))['P']
+        self.assertEqual(p.verify(), 1)
+        self.assertEqual(p.getErrors(), [1, 3])
+
+    def testCitingALaterLine(self):
+        with self.assertRaises(parsers.LineError) as raised:
+            support.parseProofs(support.proofText('P', [('A', 'And Elim Left', '2'), ('and(A,B)', 'Assumption', '')]))
+        self.assertIn('2 is not a line', str(raised.exception))
+
+    def testParallelLinesGiveTheSameErrors(self):
+        lines = [('and(A,B)', 'Assumption', '')] + [('C' if n % 3 == 0 else 'A', 'And Elim Left', '1') for n in range(12)]
+        one, parallel = [support.parseProofs(support.proofText('P', lines))['P'] for n in range(2)]
+        parallel.setProcesses(2)
+        self.assertEqual(parallel.verify(), one.verify())
+        self.assertEqual(parallel.getErrors(), one.getErrors())
+
+class ProofAsRuleTest(unittest.TestCase):
+
+    def setUp(self):
+        self.proofs = support.parseProofs(
+            support.proofText('L', [('and(A,B)', 'Assumption', ''), ('A', 'And Elim Left', '1')]),
+            support.proofText('P', [('and(C,D)', 'Assumption', ''), ('C', 'L', '1')]))
+
+    def testUsesProof(self):
+        self.assertEqual(self.proofs['P'].verify(), True)
+
+    def testResultIsRememberedUntilTheRuleChanges(self):
+        l, p = self.proofs['L'], self.proofs['P']
+        self.assertEqual(p.verify(), True)
+        self.assertTrue(p.isVerified())
+
+        # The line of L is not valid any more, so neither is P
+        l[1].setSentence(parse('B'))
+        self.assertFalse(p.isVerified())
+        self.assertEqual(p.verify(), 1)
+
+        l[1].setSentence(parse('A'))
+        self.assertEqual(p.verify(), True)
+
+    def testJustifiedLineIsCheckedAgainWhenACandidateProofChanges(self):
+        proofs = support.parseProofs(
+            support.proofText('L', [('and(A,B)', 'Assumption', ''), ('C', 'And Elim Left', '1'),
+                                    ('B', 'And Elim Right', '1'), ('and(B,A)', 'And Intro', '2,3')]),
+            support.proofText('P', [('and(C,D)', 'Assumption', ''), ('and(D,C)', '???', '1')]))
+        l, p = proofs['L'], proofs['P']
+
+        # No rule justifies the line while L is not valid
+        self.assertEqual(p.verify(), 1)
+
+        l[1].setSentence(parse('A'))
+        self.assertFalse(p.isVerified())
+        self.assertEqual(p.verify(), True)
+        self.assertIs(p[1].getJustification(), l)
+
+    def testPremisesAreOnlyMappedOncePerStep(self):
+        proofs = support.parseProofs(
+            support.proofText('L', [('and(A,B)', 'Assumption', ''), ('A', 'And Elim Left', '1'), ('B', 'And Elim Right', '1')]),
+            support.proofText('P', [('and(C,D)', 'Assumption', ''), ('E', 'L', '1')]))
+        mapped = []
+        iterPremiseMappings = proof.Proof.iterPremiseMappings
+        def countMappings(self, premise, references):
+            mapped.append(premise)
+            return iterPremiseMappings(self, premise, references)
+
+        proof.Proof.iterPremiseMappings = countMappings
+        try:
+            # Both lines of L after the first map into E, but its premise is only mapped into the references once
+            self.assertEqual(proofs['P'].verify(), 1)
+        finally:
+            proof.Proof.iterPremiseMappings = iterPremiseMappings
+        self.assertEqual(mapped, [parse('and(@A,@B)')])
+
+class MakeMappingTest(unittest.TestCase):
+
+    def testOnlyTheMappingsNeededAreFound(self):
+        references = support.parseProofs(support.proofText('R', [('and(A,B)', 'Assumption', '')] * 20))['R']
+        premises = [parse('and(@A,@B)'), parse('and(@A,@B)')]
+        options = proof.Proof('P').premiseOptions(premises, list(references))
+
+        mapping = proof.Proof('P').makeMapping({}, premises, list(references), False, options)
+        self.assertEqual(mapping, {parse('@A'): parse('A'), parse('@B'): parse('B'), parse('and'): parse('and')})
+        self.assertEqual([len(o._items) for o in options], [1, 1])
+
+    def testNoMapping(self):
+        references = support.parseProofs(support.proofText('R', [('and(A,B)', 'Assumption', ''), ('or(A,B)', 'Assumption', '')]))['R']
+        premises = [parse('and(@A,@B)'), parse('or(@B,@A)')]
+        self.assertEqual(proof.Proof('P').makeMapping({}, premises, list(references)), {})
+
+class JustifyTest(unittest.TestCase):
+
+    def justified(self, lines):
+        p = support.parseProofs(support.proofText('P', lines))['P']
+        return p, p.verify()
+
+    def testRuleIsFound(self):
+        p, valid = self.justified([('and(A,B)', 'Assumption', ''), ('B', '???', '1')])
+        self.assertEqual(valid, True)
+        self.assertEqual(p[1].getJustification().name, 'And Elim Right')
+
+    def testNoRuleWorks(self):
+        p, valid = self.justified([('and(A,B)', 'Assumption', ''), ('C', '???', '1')])
+        self.assertEqual(valid, 1)
+        self.assertIsNone(p[1].getJustification())
+
+class IncrementalTest(unittest.TestCase):
+
+    def testOnlyTheEditedLineAndItsDependentsAreChecked(self):
+        p = support.parseProofs(support.proofText('P', [('and(A,B)', 'Assumption', ''), ('A', 'And Elim Left', '1'),
+                                                        ('or(A,C)', 'Or Intro Left', '2'), ('B', 'And Elim Right', '1')]))['P']
+        self.assertEqual(p.verify(), True)
+
+        p[1].setSentence(parse('B'))
+        self.assertEqual([l._valid for l in p], [True, None, None, True])
+        self.assertEqual(p.verify(), 1)
+
+        p[1].setSentence(parse('A'))
+        self.assertEqual(p.verify(), True)
+
+    def testEmptyLineIsValid(self):
+        p = proof.Proof('P')
+        p.addLine()
+        self.assertEqual(p.verify(), True)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+import gc
+import sys
+import weakref
+import cPickle as pickle
+import unittest
+
+import support
+import parsers
+import sentence2 as sentence
+
+parse = parsers.prefixSentenceParser
+
+class HashConsingTest(unittest.TestCase):
+
+    def testEqualSentencesAreShared(self):
+        a = parse('and(or(A, B), not(C))')
+        b = parse('and( or(A,B), not(C) )')
+        self.assertIs(a, b)
+        self.assertEqual(a._id, b._id)
+
+    def testDifferentSentencesHaveDifferentIds(self):
+        self.assertNotEqual(parse('and(A,B)')._id, parse('and(B,A)')._id)
+        self.assertNotEqual(parse('A')._id, parse('@A')._id)
+        self.assertNotEqual(parse('@A')._id, parse('?A')._id)
+
+    def testSentenceAndOperatorWithTheSamePartsAreDifferent(self):
+        op, args = parse('P'), [parse('A'), parse('B')]
+        sen = sentence.sf.generateSentence(op, args)
+        operator = sentence.sf.generateOperator(op, args)
+        self.assertIsNot(sen, operator)
+        self.assertNotEqual(sen._id, operator._id)
+        self.assertEqual((type(sen), type(operator)), (sentence.Sentence, sentence.Operator))
+
+    def testSymbolConfigIsShared(self):
+        self.assertIs(parse('not(A)').extraData, parse('not(B)').extraData)
+
+    def testMeasures(self):
+        sen = parse('and(or(A,B),not(C))')
+        self.assertEqual(sen.depth(), 3)
+        self.assertEqual(hash(sen), hash(parse('and(or(A,B),not(C))')))
+
+    def testPickleGivesTheSharedSentence(self):
+        sen = parse('if(and(@A,@B),?x)')
+        self.assertIs(pickle.loads(pickle.dumps(sen, pickle.HIGHEST_PROTOCOL)), sen)
+
+class FactoryTest(unittest.TestCase):
+
+    def testUnusedSentenceIsForgotten(self):
+        sf = sentence.sf
+        sen = sf.generateSentence(sf.generateLiteral('f'), [sf.generateLiteral('Forgotten')])
+        ref, senId = weakref.ref(sen), sen._id
+        self.assertIs(sf.getNode(senId), sen)
+
+        del sen
+        gc.collect()
+        self.assertIsNone(ref())
+        self.assertRaises(KeyError, sf.getNode, senId)
+
+        # An equal sentence made again gets a new id
+        again = sf.generateSentence(sf.generateLiteral('f'), [sf.generateLiteral('Forgotten')])
+        self.assertNotEqual(again._id, senId)
+
+    def testUsedSentenceIsShared(self):
+        sf = sentence.sf
+        sen = sf.generateSentence(sf.generateLiteral('f'), [sf.generateLiteral('Kept')])
+        gc.collect()
+
+        # The parts of a sentence are kept while it is used
+        self.assertIs(sf.generateLiteral('Kept'), sen[1])
+        self.assertIs(sf.generateSentence(sf.generateLiteral('f'), [sf.generateLiteral('Kept')]), sen)
+        self.assertEqual(parse('f(Kept)'), sen)
+
+class DeepSentenceTest(unittest.TestCase):
+    '''
+    Sentences much deeper than the recursion limit, e.g. s(s(...s(0)...))
+    '''
+
+    def setUp(self):
+        self.depth = sys.getrecursionlimit() * 2
+        self.string = 's(' * self.depth + '0' + ')' * self.depth
+        self.sen = parse(self.string)
+
+    def testParseAndPrint(self):
+        self.assertEqual(self.sen.depth(), self.depth + 1)
+        self.assertEqual(str(self.sen), self.string)
+
+    def testMatch(self):
+        pattern = self.sen.generalize()
+        self.assertNotEqual(pattern, self.sen)
+        self.assertEqual(len(pattern.mapInto(self.sen)), 1)
+
+    def testParts(self):
+        self.assertIn(parse('0'), self.sen)
+        self.assertEqual(len(self.sen.subSentences()), self.depth + 1)
+        self.assertEqual(self.sen.terms(), set([self.sen.op(), parse('0')]))
+
+    def testMatchShared(self):
+        twice = parse('=(%s,%s)' % (self.string, self.string))
+        same = parse('=(@a,@a)')
+        self.assertEqual(same.mapInto(twice), [{same.op(): twice.op(), same[1]: self.sen}])
+        self.assertEqual(len(parse('@P[0]').mapInto(self.sen)), 1)
+
+    def testSubsitute(self):
+        one = parse('1')
+        self.assertEqual(self.sen.subsitute({parse('0'): one})[0].terms(), set([self.sen.op(), one]))
+        self.assertEqual(len(self.sen.subsitute({parse('0'): one}, False)), 2)
+
+class MatchTest(unittest.TestCase):
+
+    def testMapInto(self):
+        pattern = parse('and(@A,@A)')
+        self.assertEqual(pattern.mapInto(parse('and(B,B)')), [{pattern.op(): parse('and'), pattern[1]: parse('B')}])
+        self.assertEqual(pattern.mapInto(parse('and(B,C)')), [])
+
+    def testIterMappingsIsLazy(self):
+        mappings = parse('@A').iterMappings(parse('and(B,C)'))
+        self.assertEqual(next(mappings), {parse('@A'): parse('and(B,C)')})
+
+    def testMatchCacheSize(self):
+        info = sentence.matchCacheInfo()
+        try:
+            sentence.setMatchCacheSize(1)
+            parse('@A').mapInto(parse('B'))
+            parse('@A').mapInto(parse('C'))
+            self.assertEqual(sentence.matchCacheInfo()['size'], 1)
+        finally:
+            sentence.setMatchCacheSize(info['maxSize'])
+
+if __name__ == '__main__':
+    unittest.main()
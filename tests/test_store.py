@@ -0,0 +1,52 @@
+import os
+import unittest
+
+import support
+import store
+import inference
+
+class SourceKeyTest(support.TempDirTestCase):
+
+    def testKeyIgnoresCommentsAndBlankLines(self):
+        a = self.write('a.prf', support.proofText('A', [('A', 'Assumption', '')]))
+        b = self.write('b.prf', '\n' + support.proofText('A', [('A', 'Assumption', '')]).replace('done', 'done\t# The end'))
+        self.assertEqual(store.sourceKey(a), store.sourceKey(b))
+
+    def testKeyChangesWithAnIncludedFile(self):
+        self.write('rules.inf', 'include\t%s\n' % support.rules)
+        a = self.write('a.prf', 'include\trules.inf\n\n' + support.proofText('A', [('A', 'Assumption', '')]))
+        key = store.sourceKey(a)
+        self.write('rules.inf', '# Nothing')
+        self.assertNotEqual(store.sourceKey(a), key)
+
+    def testKeyChangesWithTheVerifierVersion(self):
+        a = self.write('a.prf', support.proofText('A', [('A', 'Assumption', '')]))
+        key = store.sourceKey(a)
+        version = inference.VERIFIER_VERSION
+        try:
+            inference.VERIFIER_VERSION += 1
+            self.assertNotEqual(store.sourceKey(a), key)
+        finally:
+            inference.VERIFIER_VERSION = version
+
+    def testNoKeyIfTheParserSettingsChange(self):
+        a = self.write('a.prf', 'set\tcomment\t%\n' + support.proofText('A', [('A', 'Assumption', '')]))
+        self.assertIsNone(store.sourceKey(a))
+
+class ResultStoreTest(support.TempDirTestCase):
+
+    def testPutAndGet(self):
+        results = [{'proof': 'A', 'valid': True, 'line': None}]
+        resultStore = store.ResultStore(os.path.join(self.directory, 'results.db'))
+        resultStore.put('key', results)
+        self.assertEqual(resultStore.get('key'), results)
+        self.assertIsNone(resultStore.get('other'))
+        resultStore.close()
+
+        # The results are kept in the file
+        resultStore = store.ResultStore(os.path.join(self.directory, 'results.db'))
+        self.assertEqual((len(resultStore), resultStore.get('key')), (1, results))
+        resultStore.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+
+import support
+import verifier
+
+class DependencyTest(unittest.TestCase):
+
+    def testLevels(self):
+        graph = {'A': set([]), 'B': set(['A']), 'C': set([]), 'D': set(['B', 'C'])}
+        self.assertEqual(verifier.dependencyLevels(graph), [['A', 'C'], ['B'], ['D']])
+
+    def testCycleIsAnError(self):
+        with self.assertRaises(ValueError) as raised:
+            verifier.dependencyLevels({'A': set(['B']), 'B': set(['A']), 'C': set([])})
+        self.assertIn('A, B', str(raised.exception))
+
+    def testGraphOfProofs(self):
+        proofs = support.parseProofs(
+            support.proofText('L', [('and(A,B)', 'Assumption', ''), ('A', 'And Elim Left', '1')]),
+            support.proofText('P', [('and(C,D)', 'Assumption', ''), ('C', 'L', '1')]))
+        self.assertEqual(verifier.dependencyGraph(proofs), {'L': set([]), 'P': set(['L'])})
+
+class VerifyAllTest(unittest.TestCase):
+
+    def proofs(self):
+        return support.parseProofs(
+            support.proofText('L', [('and(A,B)', 'Assumption', ''), ('A', 'And Elim Left', '1')]),
+            support.proofText('M', [('and(A,B)', 'Assumption', ''), ('C', 'And Elim Left', '1')]),
+            support.proofText('P', [('and(C,D)', 'Assumption', ''), ('C', 'L', '1'), ('D', 'M', '1')]))
+
+    def testResults(self):
+        self.assertEqual(verifier.verifyAll(self.proofs(), 1), {'L': True, 'M': 1, 'P': 2})
+
+    def testParallelGivesTheSameResults(self):
+        parallelLines = verifier.parallelLines
+        try:
+            verifier.parallelLines = 0
+            self.assertEqual(verifier.verifyAll(self.proofs(), 2), verifier.verifyAll(self.proofs(), 1))
+        finally:
+            verifier.parallelLines = parallelLines
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,6 @@
 
+from collections import OrderedDict
+
 def mapMerge(mappingA, mappingB):
     '''
     Merge two dictionaries such that the result is a superset of both, or {} if there is a conflict
@@ -38,3 +40,273 @@ def mapMerge(mappingA, mappingB):
 
     return merge
 
+# Marks a key that had no value on the trail of Bindings
+_unbound = object()
+
+class Bindings(object):
+    '''
+    A mapping of variables to sentences that a search can change and then change back
+
+    Every binding is recorded on a trail, so trying an alternative only needs a mark of the trail 
+    and an undo back to it, instead of a new dict for every merge like mapMerge
+
+    Example:
+    b = Bindings({A:P})
+    m = b.mark()
+    b.merge({B:P|Q}) -> True, b is {A:P, B:P|Q}
+    b.merge({A:P&Q}) -> False, b is unchanged
+    b.undo(m) -> b is {A:P}
+    '''
+
+    def __init__(self, mapping = None):
+        '''
+        @param mapping - A dict of the first bindings
+        '''
+        self._map = {}
+        self._trail = []
+        if mapping:
+            self.merge(mapping)
+
+    def __len__(self):
+        return len(self._map)
+
+    def __contains__(self, key):
+        return key in self._map
+
+    def __getitem__(self, key):
+        return self._map[key]
+
+    def get(self, key, default = None):
+        return self._map.get(key, default)
+
+    def mark(self):
+        '''
+        @return - A mark of the current bindings that undo can go back to
+        '''
+        return len(self._trail)
+
+    def undo(self, mark):
+        '''
+        Undoes every binding made since mark
+        '''
+        trail = self._trail
+        while len(trail) > mark:
+            key, value = trail.pop()
+            if value is _unbound:
+                del self._map[key]
+            else:
+                self._map[key] = value
+
+    def bind(self, key, value):
+        '''
+        Binds key to value the same way mapMerge does, if key already has a value the more general value is kept
+
+        @return - False if key already has a value that conflicts with value, otherwise True
+        '''
+        current = self._map.get(key, _unbound)
+        if current is not _unbound and value != current:
+            if value <= current:
+                pass
+            elif current <= value:
+                return True
+            else:
+                return False
+        elif current is not _unbound:
+            # Already bound to the same value
+            return True
+
+        self._trail.append((key, current))
+        self._map[key] = value
+        return True
+
+    def merge(self, mapping):
+        '''
+        Binds every entry of mapping, like mapMerge
+
+        @return - True if they were all bound, or False if there is a conflict and nothing was bound
+        '''
+        mark = self.mark()
+        for key in mapping:
+            if not self.bind(key, mapping[key]):
+                self.undo(mark)
+                return False
+        return True
+
+    def compatible(self, mapping):
+        '''
+        Checks if every entry of mapping could be bound, without binding any of them
+
+        @return - True if merge(mapping) would succeed
+        '''
+        mark = self.mark()
+        if not self.merge(mapping):
+            return False
+        self.undo(mark)
+        return True
+
+    def toDict(self):
+        '''
+        @return - A new dict of the current bindings
+        '''
+        return dict(self._map)
+
+
+class LazyList(object):
+    '''
+    The items of an iterator, only taken from it when they are first needed and kept so they can be 
+    gone through again, e.g. by another search of the same items
+
+    Example:
+    l = LazyList(x * x for x in itertools.count())
+    for x in l: if x > 5: break -> only 0, 1, 4 and 9 were made
+    list(itertools.islice(l, 3)) -> [0, 1, 4], without making any more
+    '''
+
+    def __init__(self, iterable):
+        self._items = []
+        self._iterator = iter(iterable)
+
+    def __iter__(self):
+        # Each iteration keeps its own index, so iterations of the same LazyList can be nested
+        index = 0
+        while True:
+            if index == len(self._items):
+                if self._iterator is None:
+                    return
+                try:
+                    self._items.append(next(self._iterator))
+                except StopIteration:
+                    self._iterator = None
+                    return
+            yield self._items[index]
+            index += 1
+
+    def __nonzero__(self):
+        for item in self:
+            return True
+        return False
+
+class FrozenDict(dict):
+    '''
+    A dict that cannot be changed once it is created, so it can be shared safely
+
+    Example:
+    d = FrozenDict({'openParen': '('})
+    d['openParen'] -> '('
+    d['openParen'] = '[' -> TypeError
+    '''
+
+    def _immutable(self, *args, **kwargs):
+        raise TypeError('%s is immutable' % type(self).__name__)
+
+    __setitem__ = _immutable
+    __delitem__ = _immutable
+    clear = _immutable
+    pop = _immutable
+    popitem = _immutable
+    setdefault = _immutable
+    update = _immutable
+
+    def __hash__(self):
+        return hash(frozenset(self.items()))
+
+    def __copy__(self):
+        # Since it is immutable a copy is itsself
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        # The entries can't be set one at a time, so it is unpickled from a dict
+        return (type(self), (dict(self),))
+
+# The extra data of every sentence that has none
+emptyData = FrozenDict()
+
+class LRUCache(object):
+    '''
+    A dict with a maximum size that forgets the least recently used entries first
+
+    Counts the hits and misses of get so the size can be tuned
+    '''
+
+    def __init__(self, maxSize = 1024):
+        '''
+        @param maxSize - The largest number of entries to keep, 0 to keep none or None for no limit
+        '''
+        self._data = OrderedDict()
+        self.maxSize = maxSize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default = None):
+        '''
+        Gets the value of key and marks it as recently used
+
+        @return - The value, or default if key is not in the cache
+        '''
+        try:
+            value = self._data.pop(key)
+        except KeyError:
+            self.misses += 1
+            return default
+
+        # Move the entry to the most recently used end
+        self._data[key] = value
+        self.hits += 1
+        return value
+
+    def __setitem__(self, key, value):
+        if self.maxSize == 0:
+            return
+
+        self._data.pop(key, None)
+        self._data[key] = value
+        self._trim()
+
+    def _trim(self):
+        # Forget the least recently used entries until the cache fits
+        if self.maxSize is None:
+            return
+        while len(self._data) > self.maxSize:
+            self._data.popitem(last = False)
+            self.evictions += 1
+
+    def resize(self, maxSize):
+        '''
+        Changes the maximum size, forgetting entries if the cache is too big
+        '''
+        self.maxSize = maxSize
+        self._trim()
+
+    def items(self):
+        '''
+        @return - A list of the (key, value) of each entry, the least recently used first
+        '''
+        return self._data.items()
+
+    def clear(self):
+        '''
+        Forgets every entry and resets the statistics
+        '''
+        self._data.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def info(self):
+        '''
+        @return - A dict with the 'hits', 'misses', 'hitRate', 'evictions', 'size' and 'maxSize' of the cache
+        '''
+        lookups = self.hits + self.misses
+        hitRate = float(self.hits) / lookups if lookups else 0.0
+        return {'hits': self.hits, 'misses': self.misses, 'hitRate': hitRate, 'evictions': self.evictions, 
+                'size': len(self._data), 'maxSize': self.maxSize}
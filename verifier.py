@@ -0,0 +1,246 @@
+import os
+import multiprocessing
+
+# inference imports proof, so it has to be imported first
+import inference
+import proof
+
+# Starting the worker processes takes longer than verifying proofs with fewer lines than this
+parallelLines = 500
+
+def dependencyGraph(proofs):
+    '''
+    Finds which proofs use which other proofs as inference rules
+
+    A proof that is not in proofs is not in the graph, it is verified the first time it is used
+
+    @param proofs - A dict of names to proofs, e.g. from defaultProofParser
+    @return - A dict of the name of each proof to the set of names of the proofs it uses
+    '''
+    graph = {}
+    for name, prf in proofs.items():
+        graph[name] = set([p.name for p in prf.getProofs() if proofs.get(p.name) is p])
+    return graph
+
+def dependencyLevels(graph):
+    '''
+    Orders the proofs of a dependency graph so each proof is after the proofs it uses
+
+    e.g.
+    dependencyLevels({'A': set([]), 'B': set(['A']), 'C': set([]), 'D': set(['B', 'C'])}) -> [['A', 'C'], ['B'], ['D']]
+
+    @param graph - A dependency graph, see dependencyGraph
+    @return - A list of levels, each a sorted list of the names of the proofs that only use proofs in earlier levels
+    '''
+    # The number of proofs each proof uses that are not in a level yet, and the proofs that use each proof
+    waiting = dict((name, len(deps)) for name, deps in graph.items())
+    users = dict((name, []) for name in graph)
+    for name, deps in graph.items():
+        for dep in deps:
+            users[dep].append(name)
+
+    levels = []
+    level = sorted(name for name, count in waiting.items() if count == 0)
+    while level:
+        levels.append(level)
+        nextLevel = []
+        for name in level:
+            for user in users[name]:
+                waiting[user] -= 1
+                if waiting[user] == 0:
+                    nextLevel.append(user)
+        level = sorted(nextLevel)
+
+    if sum(len(level) for level in levels) != len(graph):
+        raise ValueError('The proofs use each other as inference rules: %s' %
+                         ', '.join(sorted(name for name, count in waiting.items() if count > 0)))
+    return levels
+
+def verifyAll(proofs, processes = None):
+    '''
+    Verifies every proof once, after the proofs it uses as inference rules so they are never verified again
+
+    The proofs of each level of the dependency graph do not use each other, so they are verified at the
+    same time in processes forked from this one.  Where processes can not be forked, or the proofs have 
+    fewer than parallelLines lines, they are verified one at a time.
+
+    @param proofs - A dict of names to proofs, e.g. from defaultProofParser
+    @param processes - The number of processes to use, defaults to the number of cpus
+    @return - A dict of the name of each proof to the result of its verify
+    '''
+    graph = dependencyGraph(proofs)
+    levels = dependencyLevels(graph)
+
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+
+    if processes > 1 and hasattr(os, 'fork') and any(len(level) > 1 for level in levels) and \
+       sum(len(prf) for prf in proofs.values()) >= parallelLines:
+        verifyParallel(proofs, graph, levels, processes)
+
+    # The proofs verified in parallel already have their results, the rest are verified in order
+    results = {}
+    for level in levels:
+        for name in level:
+            results[name] = proofs[name].verify()
+    return results
+
+# The proofs the worker processes were forked with
+_workerProofs = None
+
+def verifyParallel(proofs, graph, levels, processes):
+    '''
+    Verifies each level of proofs in worker processes, the result of each proof is given to the workers
+    that verify a proof using it and to the proof in this process
+
+    @param proofs - A dict of names to proofs
+    @param graph - The dependency graph of the proofs
+    @param levels - The levels of the graph
+    @param processes - The number of worker processes
+    '''
+    global _workerProofs
+
+    # The position of each proof in the order they are verified, and the results of the verified proofs
+    order = dict((name, n) for n, name in enumerate(name for level in levels for name in level))
+    results = {}
+
+    # The workers are forked with the proofs, so only names and results are sent to them
+    _workerProofs = proofs
+    pool = multiprocessing.Pool(processes)
+    try:
+        for level in levels:
+            if len(level) == 1:
+                # There is nothing to run at the same time, so the proof is verified here
+                results[level[0]] = verifyResult(proofs[level[0]])
+                continue
+
+            tasks = []
+            for name in level:
+                # Every proof used by this proof, and the proofs they use, in the order they are verified
+                used = set()
+                stack = list(graph[name])
+                while stack:
+                    dep = stack.pop()
+                    if dep not in used:
+                        used.add(dep)
+                        stack.extend(graph[dep])
+                tasks.append((name, [(dep, results[dep]) for dep in sorted(used, key = order.get)]))
+
+            for name, result in zip(level, pool.map(verifyTask, tasks)):
+                results[name] = result
+                applyResult(proofs[name], result)
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+        _workerProofs = None
+
+def verifyTask(task):
+    '''
+    Verifies a proof in a worker process
+
+    @param task - (name of the proof, [(name, result) of each proof it uses, in the order they were verified])
+    @return - The result of the proof, see verifyResult
+    '''
+    name, used = task
+    for dep, result in used:
+        applyResult(_workerProofs[dep], result)
+    return verifyResult(_workerProofs[name])
+
+def verifyResult(prf):
+    '''
+    Verifies a proof and gets the result in a form that can be sent to another process
+
+    @param prf - The proof to verify
+    @return - (index of the first invalid line or None, [(index of a line without an inference rule,
+              position of the rule found for it in the rule index)])
+    '''
+    prf.verify()
+
+    justified = []
+    for n, l in enumerate(prf):
+        if l.getInference() is None and l._justifiedBy is not None:
+            justified.append((n, prf._ruleIndex.position(l._justifiedBy)))
+    return prf._verified[1], justified
+
+def applyResult(prf, result):
+    '''
+    Changes a proof the way verifying it did in another process, and remembers the result
+
+    @param prf - The proof that was verified
+    @param result - The result of verifyResult
+    '''
+    if prf.isVerified():
+        return
+
+    err_line, justified = result
+    for n, position in justified:
+        prf[n]._justifiedBy = prf._ruleIndex.getRule(position)
+
+    # verifyLines numbers the lines of a valid proof
+    for n, l in enumerate(prf):
+        l._num = n if err_line is None else None
+
+    prf.remember(err_line)
+
+# The proof and the index of each of its lines the line checking worker processes were forked with
+_workerProof = None
+_workerPositions = None
+
+def checkLines(prf, indexes, positions, processes):
+    '''
+    Checks lines of a proof at the same time in processes forked from this one, see Proof.checkLine
+
+    Processes can not be forked on some systems or from a worker process, then no lines are checked
+
+    @param prf - The proof
+    @param indexes - The indexes of the lines to check
+    @param positions - A dict of the id of each line of the proof to its index
+    @param processes - The number of worker processes
+    @return - A dict of the index of each line checked to (True if it is valid, the position in the rule index 
+              of the rule found for it if it has no rule or None)
+    '''
+    global _workerProof, _workerPositions
+
+    if not hasattr(os, 'fork') or multiprocessing.current_process().daemon:
+        return {}
+
+    # The proofs used by the lines are verified once here, instead of by every worker
+    for l in prf:
+        inf = l.getInference()
+        if inf is not None and not isinstance(inf, inference.Inference):
+            inf.verify()
+
+    _workerProof = prf
+    _workerPositions = positions
+    pool = multiprocessing.Pool(processes)
+    try:
+        # A few chunks for each process, so a process with slow lines does not hold up the rest
+        chunkSize = max(1, len(indexes) // (processes * 4))
+        results = pool.map(checkTask, indexes, chunkSize)
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+        _workerProof = None
+        _workerPositions = None
+
+    return dict(zip(indexes, results))
+
+def checkTask(index):
+    '''
+    Checks a line of the proof in a worker process
+
+    @param index - The index of the line
+    @return - (True if it is valid, the position in the rule index of the rule found for it or None)
+    '''
+    l = _workerProof[index]
+    valid = _workerProof.checkLine(l, index, _workerPositions)
+
+    if valid and l.getInference() is None and l._justifiedBy is not None:
+        return valid, _workerProof._ruleIndex.position(l._justifiedBy)
+    return valid, None